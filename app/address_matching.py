@@ -0,0 +1,201 @@
+import re
+from typing import Dict, FrozenSet, NamedTuple, Optional, Pattern, Sequence, Tuple
+
+from app.api import CheckedDocumentFieldResult, DatedAddress, StructuredAddress
+from app.cache import LRUCache
+from app.matching import max_edits, split_words, within_edits
+
+# Similarity from which addresses match, and below which they don't
+MATCH_SCORE = 0.8
+UNCERTAIN_SCORE = 0.5
+
+
+class CountryRules(NamedTuple):
+    # Words replaced by the form they are compared in
+    abbreviations: Dict[str, str]
+    # Word endings replaced in the same way, for compound street names
+    suffixes: Tuple[Tuple[str, str], ...]
+    # Postcode within an address, whose groups joined together are the part
+    # of the postcode which is compared
+    postcode: Optional[Pattern]
+
+
+_ENGLISH = {
+    'apt': 'apartment', 'ave': 'avenue', 'av': 'avenue', 'bldg': 'building', 'blvd': 'boulevard',
+    'cl': 'close', 'cres': 'crescent', 'ct': 'court', 'dr': 'drive', 'e': 'east', 'gdns': 'gardens',
+    'gr': 'grove', 'hwy': 'highway', 'ho': 'house', 'ln': 'lane', 'mt': 'mount', 'n': 'north',
+    'ne': 'northeast', 'nw': 'northwest', 'pde': 'parade', 'pkwy': 'parkway', 'pl': 'place', 'rd': 'road',
+    's': 'south', 'se': 'southeast', 'sq': 'square', 'st': 'street', 'ste': 'suite', 'sw': 'southwest',
+    'ter': 'terrace', 'terr': 'terrace', 'w': 'west',
+}
+_GERMAN = {'str': 'strasse', 'pl': 'platz', 'weg': 'weg'}
+_FRENCH = {'av': 'avenue', 'bd': 'boulevard', 'ch': 'chemin', 'imp': 'impasse', 'pl': 'place', 'r': 'rue'}
+_SPANISH = {'av': 'avenida', 'avda': 'avenida', 'c': 'calle', 'pl': 'plaza', 'pza': 'plaza'}
+_DUTCH = {'ln': 'laan', 'str': 'straat'}
+
+_FIVE_DIGITS = r'\b(\d{5})\b'
+_FOUR_DIGITS = r'\b(\d{4})\b'
+
+_RULES = {
+    'AUS': (_ENGLISH, (), _FOUR_DIGITS),
+    'AUT': (_GERMAN, (('str', 'strasse'),), _FOUR_DIGITS),
+    'BEL': ({**_FRENCH, **_DUTCH}, (('str', 'straat'),), _FOUR_DIGITS),
+    'CAN': ({**_ENGLISH, **_FRENCH}, (), r'\b([A-Z]\d[A-Z]) ?(\d[A-Z]\d)\b'),
+    'CHE': ({**_GERMAN, **_FRENCH}, (('str', 'strasse'),), _FOUR_DIGITS),
+    'DEU': (_GERMAN, (('str', 'strasse'),), _FIVE_DIGITS),
+    'ESP': (_SPANISH, (), _FIVE_DIGITS),
+    'FRA': (_FRENCH, (), _FIVE_DIGITS),
+    'GBR': (_ENGLISH, (), r'\b([A-Z]{1,2}\d[A-Z\d]?) ?(\d[A-Z]{2})\b'),
+    'IRL': (_ENGLISH, (), r'\b([AC-FHKNPRTV-Y]\d{2}|D6W) ?([0-9AC-FHKNPRTV-Y]{4})\b'),
+    'ITA': ({'p': 'piazza', 'pza': 'piazza', 'v': 'via', 'vle': 'viale'}, (), _FIVE_DIGITS),
+    'NLD': (_DUTCH, (('str', 'straat'),), r'\b(\d{4}) ?([A-Z]{2})\b'),
+    'NZL': (_ENGLISH, (), _FOUR_DIGITS),
+    'USA': (_ENGLISH, (), r'\b(\d{5})(?:-\d{4})?\b'),
+}
+
+# Built once, as every address is normalized with them
+COUNTRY_RULES: Dict[str, CountryRules] = {
+    country: CountryRules(abbreviations, suffixes, re.compile(postcode))
+    for country, (abbreviations, suffixes, postcode) in _RULES.items()
+}
+DEFAULT_RULES = CountryRules(_ENGLISH, (), None)
+
+
+class NormalizedAddress(NamedTuple):
+    country: Optional[str]
+    postcode: Optional[str]
+    # House, flat and other numbers, which must agree exactly
+    numbers: FrozenSet[str]
+    words: FrozenSet[str]
+
+
+_normalized_addresses = LRUCache(maxsize=4096)
+
+# Fields whose words are compared. The county and state are left out, as
+# they are often omitted from an address.
+_WORD_FIELDS = ('premise', 'subpremise', 'street_number', 'route', 'locality', 'postal_town')
+
+
+def _normalize_word(word: str, rules: CountryRules) -> str:
+    word = rules.abbreviations.get(word, word)
+    for suffix, replacement in rules.suffixes:
+        if word.endswith(suffix) and len(word) > len(suffix):
+            return word[:-len(suffix)] + replacement
+    return word
+
+
+def _normalize_postcode(postcode: str, rules: CountryRules) -> str:
+    postcode = postcode.upper()
+    match = rules.postcode.search(postcode) if rules.postcode else None
+    if match:
+        return ''.join(group for group in match.groups() if group)
+    return re.sub(r'[^A-Z0-9]', '', postcode)
+
+
+def _normalize(country: Optional[str], postcode: Optional[str], lines: Tuple[str, ...], *texts: Optional[str]) \
+        -> NormalizedAddress:
+    rules = COUNTRY_RULES.get(country, DEFAULT_RULES)
+
+    # Free form lines may contain the postcode, which isn't compared as words
+    text = ' '.join(lines)
+    if text and rules.postcode:
+        matches = list(rules.postcode.finditer(text.upper()))
+        if matches:
+            start, end = matches[-1].span()
+            postcode = postcode or text[start:end]
+            text = text[:start] + ' ' + text[end:]
+    text = ' '.join(filter(None, (*texts, text)))
+
+    # Full stops are dropped, so N.W. is the same word as NW
+    words = frozenset(_normalize_word(word, rules) for word in split_words(text.replace('.', '')))
+    numbers = frozenset(word for word in words if not word.isalpha())
+    return NormalizedAddress(
+        country=country,
+        postcode=_normalize_postcode(postcode, rules) if postcode else None,
+        numbers=numbers,
+        words=words - numbers,
+    )
+
+
+def normalize_address(address: StructuredAddress, country: Optional[str] = None) -> NormalizedAddress:
+    """
+    Postcode, numbers and words of an address, normalized by the rules of
+    its country, or `country` if it has none. Cached, as the same addresses
+    are compared across many documents.
+    """
+    key = (address.country or country, address.postal_code, tuple(address.address_lines or ()),
+           *(getattr(address, field) for field in _WORD_FIELDS))
+    normalized = _normalized_addresses.get(key)
+    if normalized is None:
+        normalized = _normalize(*key)
+        _normalized_addresses.put(key, normalized)
+    return normalized
+
+
+def _common_words(a: FrozenSet[str], b: FrozenSet[str]) -> int:
+    common = a & b
+    count = len(common)
+    # Only the words without an exact match are compared for typos
+    unmatched = list(b - common)
+    for word in a - common:
+        match = next((
+            other for other in unmatched
+            if within_edits(word, other, max_edits(max(word, other, key=len)))
+        ), None)
+        if match is not None:
+            count += 1
+            unmatched.remove(match)
+    return count
+
+
+def similarity(a: NormalizedAddress, b: NormalizedAddress) -> float:
+    """
+    Token set similarity of two addresses, from 0 when they are different
+    addresses to 1 when every word matches
+    """
+    if a.country and b.country and a.country != b.country:
+        return 0.0
+    if a.postcode and b.postcode and a.postcode != b.postcode:
+        return 0.0
+    # One address may leave out a flat number, but mustn't have another
+    if a.numbers and b.numbers and not (a.numbers <= b.numbers or b.numbers <= a.numbers):
+        return 0.0
+
+    common = len(a.numbers & b.numbers) + _common_words(a.words, b.words)
+    total = len(a.numbers) + len(a.words) + len(b.numbers) + len(b.words)
+    # A matching postcode counts as a word of both
+    if a.postcode and a.postcode == b.postcode:
+        common += 1
+        total += 2
+    return 2 * common / total if total else 0.0
+
+
+def match_address(expected: StructuredAddress, extracted: Sequence[DatedAddress]) -> Optional[str]:
+    """
+    Checks the entity's address against the closest of the addresses
+    extracted from a document, or None if it has nothing but a country
+    """
+    normalized = normalize_address(expected)
+    if not (normalized.postcode or normalized.numbers or normalized.words):
+        return None
+    if not extracted:
+        return CheckedDocumentFieldResult.CHECK_UNCERTAIN
+
+    rules = COUNTRY_RULES.get(normalized.country, DEFAULT_RULES)
+    best = 0.0
+    for dated in extracted:
+        address = dated.address
+        # Addresses in another country or postcode are ruled out before
+        # reading the rest of the address
+        if address.country and address.country != normalized.country:
+            continue
+        postcode = address.postal_code
+        if postcode and normalized.postcode and _normalize_postcode(postcode, rules) != normalized.postcode:
+            continue
+
+        best = max(best, similarity(normalized, normalize_address(address, normalized.country)))
+        if best >= MATCH_SCORE:
+            return CheckedDocumentFieldResult.CHECK_VALID
+    if best >= UNCERTAIN_SCORE:
+        return CheckedDocumentFieldResult.CHECK_UNCERTAIN
+    return CheckedDocumentFieldResult.CHECK_INVALID
@@ -0,0 +1,104 @@
+import asyncio
+import os
+from concurrent.futures import Future
+from threading import Lock, Thread
+from typing import Any, Callable, NamedTuple, Optional
+
+import requests
+
+from app.startup import http_pool_size, http_connect_timeout, http_read_timeout
+
+# aiohttp is optional, without it all requests are made with `app.http_client`
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+CHUNK_SIZE = 64 * 1024
+
+
+class AsyncResponse(NamedTuple):
+    status_code: int
+    content: bytes
+
+
+class AsyncClient:
+    """
+    Runs an event loop on a dedicated thread, sending requests to PassFort
+    over a small pool of aiohttp connections. Requests are submitted from any
+    thread and return a `concurrent.futures.Future`, so any number can be in
+    flight without a thread each.
+
+    Requests are built and signed as a `requests.PreparedRequest` and only the
+    resulting bytes are sent with aiohttp.
+    """
+
+    def __init__(self):
+        if aiohttp is None:
+            raise RuntimeError('aiohttp is required for the asyncio HTTP client')
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional['aiohttp.ClientSession'] = None
+        self._lock = Lock()
+        self._pid = None
+
+    def _start(self):
+        loop = asyncio.new_event_loop()
+        started = Future()
+
+        async def create_session():
+            return aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=http_pool_size),
+                timeout=aiohttp.ClientTimeout(sock_connect=http_connect_timeout, sock_read=http_read_timeout),
+            )
+
+        def run():
+            asyncio.set_event_loop(loop)
+            started.set_result(loop.run_until_complete(create_session()))
+            loop.run_forever()
+
+        Thread(target=run, name='http-event-loop', daemon=True).start()
+        self._session = started.result()
+        self._loop = loop
+        self._pid = os.getpid()
+
+    async def _send(self, prepared: requests.PreparedRequest,
+                    on_chunk: Optional[Callable[[bytes], None]]) -> AsyncResponse:
+        async with self._session.request(prepared.method, prepared.url, headers=dict(prepared.headers),
+                                         data=prepared.body) as res:
+            if res.status >= 400:
+                response = requests.Response()
+                response.status_code = res.status
+                raise requests.HTTPError(f'{res.status} {res.reason} for url: {prepared.url}', response=response)
+
+            if on_chunk is None:
+                return AsyncResponse(res.status, await res.read())
+
+            async for chunk in res.content.iter_chunked(CHUNK_SIZE):
+                on_chunk(chunk)
+            return AsyncResponse(res.status, b'')
+
+    def request(self, method: str, url: str, on_chunk: Optional[Callable[[bytes], None]] = None,
+                **kwargs: Any) -> 'Future[AsyncResponse]':
+        """
+        Sends a request, taking the same arguments as `requests.request`. The
+        future fails if the response has an error status.
+
+        If `on_chunk` is given, the body is streamed to it rather than read
+        into the response, and an error it raises aborts the request.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+
+        prepared = requests.Request(method, url, **kwargs).prepare()
+        return asyncio.run_coroutine_threadsafe(self._send(prepared, on_chunk), self._loop)
+
+    def close(self):
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                return
+            asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+            self._pid = None
@@ -1,23 +1,60 @@
 # pylint: skip-file
+import hashlib
 import inspect
+import json
+import sys
+from copy import deepcopy
 from functools import wraps
-from typing import Iterable, TypeVar, Optional, Type, List, Dict, Any
+from typing import Iterable, TypeVar, Optional, Type, List, Dict, Any, FrozenSet, NamedTuple, Tuple
 from uuid import UUID
 
 from schematics import Model
 from schematics.common import NOT_NONE
+from schematics.models import FieldDescriptor
+from schematics.transforms import get_import_context
+from schematics.validate import get_validation_context
 from schematics.types import UUIDType, StringType, ModelType, ListType, DateType, BaseType, DictType, BooleanType, \
     UTCDateTimeType, PolyModelType
-from schematics.exceptions import DataError
+from schematics.exceptions import DataError, BaseError
 from schematics.types.base import TypeMeta
 from flask import abort, request, Response, jsonify
 
+from app.cache import LRUCache
+
+
+def _enum_values(attrs) -> FrozenSet[str]:
+    """
+    Interns the upper-case constants of an enum class body in place and
+    returns them as a frozenset, for constant-time membership checks
+    """
+    values = []
+    for k, v in attrs.items():
+        if not k.startswith('_') and k.isupper():
+            attrs[k] = sys.intern(v)
+            values.append(attrs[k])
+    return frozenset(values)
+
+
+def _make_canonical(cls, values: FrozenSet[str]):
+    """
+    Makes the enum return the interned constant for known values when
+    converting input, so identity comparisons with the constants hold
+    """
+    canonical = {v: v for v in values}
+
+    def to_native(self, value, context=None):
+        value = super(cls, self).to_native(value, context)
+        return canonical.get(value, value)
+
+    cls.to_native = to_native
+    return cls
+
 
 # Inheriting this class will make an enum exhaustive
 class EnumMeta(TypeMeta):
     def __new__(mcs, name, bases, attrs):
-        attrs['choices'] = [v for k, v in attrs.items() if not k.startswith('_') and k.isupper()]
-        return TypeMeta.__new__(mcs, name, bases, attrs)
+        attrs['choices'] = _enum_values(attrs)
+        return _make_canonical(TypeMeta.__new__(mcs, name, bases, attrs), attrs['choices'])
 
 
 class ApproxDateType(DateType):
@@ -27,8 +64,8 @@ class ApproxDateType(DateType):
 # Inheriting this class lets us check if variant is known
 class OpenEnumMeta(TypeMeta):
     def __new__(mcs, name, bases, attrs):
-        attrs['variants'] = [v for k, v in attrs.items() if not k.startswith('_') and k.isupper()]
-        return TypeMeta.__new__(mcs, name, bases, attrs)
+        attrs['variants'] = _enum_values(attrs)
+        return _make_canonical(TypeMeta.__new__(mcs, name, bases, attrs), attrs['variants'])
 
 
 # Intentionally non-exhaustive
@@ -149,6 +186,76 @@ class DocumentCategory(StringType, metaclass=EnumMeta):
     PROOF_OF_TAX_STATUS = 'PROOF_OF_TAX_STATUS'
 
 
+class DemoScope(StringType, metaclass=EnumMeta):
+    SINGLE_CATEGORY = 'SINGLE_CATEGORY'
+    ALL_CATEGORIES = 'ALL_CATEGORIES'
+
+
+class DemoFailure(StringType, metaclass=EnumMeta):
+    ALL_PASS = 'ALL_PASS'
+    ERROR = 'ERROR'
+    UNSUPPORTED_DOCUMENT_TYPE = 'UNSUPPORTED_DOCUMENT_TYPE'
+    IMAGE_CHECK_FAILURE = 'IMAGE_CHECK_FAILURE'
+    FORGERY_CHECK_FAILURE = 'FORGERY_CHECK_FAILURE'
+    NAME_FIELD_DIFFERENT = 'NAME_FIELD_DIFFERENT'
+    NAME_FIELD_UNREADABLE = 'NAME_FIELD_UNREADABLE'
+    DOB_FIELD_DIFFERENT = 'DOB_FIELD_DIFFERENT'
+    DOB_FIELD_UNREADABLE = 'DOB_FIELD_UNREADABLE'
+
+
+class DemoResultDescriptor(NamedTuple):
+    """
+    Structured form of a DemoResultType. `scope` and `category` are only set
+    for the document capture variants, `category` names the document that
+    the failure applies to
+    """
+    scope: Optional[str]
+    category: Optional[str]
+    failure: str
+
+
+# Demo results name categories without the 'PROOF_OF_' prefix
+_DEMO_CATEGORY_NAMES = {category[len('PROOF_OF_'):]: category for category in DocumentCategory.choices}
+
+
+def _decode_demo_result(demo_result: str) -> DemoResultDescriptor:
+    if demo_result == DemoResultType.ANY:
+        return DemoResultDescriptor(None, None, DemoFailure.ALL_PASS)
+
+    if demo_result == DemoResultType.ERROR_UNSUPPORTED_DOCUMENT_TYPE:
+        return DemoResultDescriptor(None, None, DemoFailure.UNSUPPORTED_DOCUMENT_TYPE)
+
+    if demo_result.startswith('ERROR_'):
+        return DemoResultDescriptor(None, None, DemoFailure.ERROR)
+
+    rest = demo_result[len('DOCUMENT_'):]
+    scope = next((s for s in DemoScope.choices if rest.startswith(s + '_')), None)
+    if scope is not None:
+        rest = rest[len(scope) + 1:]
+
+    category = None
+    for name, value in _DEMO_CATEGORY_NAMES.items():
+        if rest.startswith(name + '_'):
+            category = value
+            rest = rest[len(name) + 1:]
+
+    assert rest in DemoFailure.choices, f'Cannot decode demo result {demo_result}'
+    return DemoResultDescriptor(scope, category, sys.intern(rest))
+
+
+# Decoded once at import so handlers never need to inspect the raw string
+DEMO_RESULT_DESCRIPTORS: Dict[str, DemoResultDescriptor] = {
+    v: _decode_demo_result(v) for v in DemoResultType.variants
+}
+
+
+def describe_demo_result(demo_result: Optional[str]) -> Optional[DemoResultDescriptor]:
+    """
+    Returns the descriptor for a known demo result, or None if it's not supported
+    """
+    return DEMO_RESULT_DESCRIPTORS.get(demo_result)
+
+
 class DocumentType(StringType, metaclass=EnumMeta):
     BIOMETRIC_STATE_ID = 'BIOMETRIC_STATE_ID'
     DRIVING_LICENCE = 'DRIVING_LICENCE'
@@ -193,7 +300,75 @@ class DecisionClass(StringType, metaclass=EnumMeta):
     WARN = 'WARN'
 
 
-class ProviderConfig(Model):
+class InternedModel(Model):
+    """
+    Model whose validated instances are shared between requests by
+    `InternedModelType`, so they are read-only once interned
+    """
+    _frozen = False
+    _exported = None
+
+    def __setattr__(self, name, value):
+        if self._frozen:
+            raise TypeError(f'Interned {type(self).__name__} instances cannot be modified')
+        super().__setattr__(name, value)
+
+    def freeze(self):
+        """
+        Validates the model and makes it read-only, so it can be shared
+        """
+        self.validate()
+        self._exported = {}
+        self._frozen = True
+        return self
+
+
+_interned_models = LRUCache(maxsize=256)
+
+
+class InternedModelType(ModelType):
+    """
+    ModelType which returns a shared, validated instance when the same raw
+    sub-document has been seen before, instead of converting it again
+    """
+
+    def _convert(self, value, context):
+        if isinstance(value, InternedModel) and value._frozen:
+            return value
+
+        if not isinstance(value, dict):
+            return super()._convert(value, context)
+
+        digest = hashlib.blake2b(json.dumps(value, sort_keys=True, default=str).encode('utf8'), digest_size=16)
+        key = (self.model_class, digest.digest())
+        interned = _interned_models.get(key)
+        if interned is not None:
+            return interned
+
+        model = super()._convert(value, context)
+        try:
+            model.freeze()
+        except DataError:
+            # Leave it to the enclosing model's validation to report
+            return model
+
+        _interned_models.put(key, model)
+        return model
+
+    def _export(self, value, format, context):
+        if not isinstance(value, InternedModel) or not value._frozen or context.app_data:
+            return super()._export(value, format, context)
+
+        # Frozen models always export the same way, so keep the exported
+        # form and hand out copies of it
+        key = (format, context.role, context.export_level)
+        exported = value._exported.get(key)
+        if exported is None:
+            exported = value._exported[key] = super()._export(value, format, context)
+        return deepcopy(exported)
+
+
+class ProviderConfig(InternedModel):
     require_dob = BooleanType(required=True)
     require_address = BooleanType(required=True)
 
@@ -201,7 +376,7 @@ class ProviderConfig(Model):
         export_level = NOT_NONE
 
 
-class ProviderCredentials(Model):
+class ProviderCredentials(InternedModel):
     username = StringType(required=True)
     password = StringType(required=True)
     url = StringType(required=True)
@@ -264,6 +439,13 @@ class Error(Model):
             'message': f'Missing required field ({field})',
         })
 
+    @staticmethod
+    def invalid_image(message):
+        return Error({
+            'type': ErrorType.INVALID_CHECK_INPUT,
+            'message': message,
+        })
+
     @staticmethod
     def missing_documents():
         return Error({
@@ -360,7 +542,7 @@ class DocumentCheck(Model):
         export_level = NOT_NONE
 
 
-class DocumentResult(Model):
+class DocumentResult(InternedModel):
     all_passed = BooleanType(default=None)
     document_type_passed = BooleanType(default=None)
     error_reason = StringType(default=None)
@@ -389,7 +571,7 @@ class DocumentData(Model):
     mrz3 = StringType(default=None)
     number = StringType(default=None)
     personal_details: Optional[PersonalDetails] = ModelType(PersonalDetails, default=None)
-    result: Optional[DocumentResult] = ModelType(DocumentResult, default=None)
+    result: Optional[DocumentResult] = InternedModelType(DocumentResult, default=None)
 
     class Options:
         export_level = NOT_NONE
@@ -425,7 +607,7 @@ class Document(Model):
     id = UUIDType(default=None)
     images: List[DocumentImageResource] = ListType(ModelType(DocumentImageResource))
     files: List[FileResource] = ListType(ModelType(FileResource))
-    verification_result: Optional[DocumentResult] = ModelType(DocumentResult, default=None)
+    verification_result: Optional[DocumentResult] = InternedModelType(DocumentResult, default=None)
 
     class Options:
         export_level = NOT_NONE
@@ -441,7 +623,72 @@ class ExternalRefs(Model):
         export_level = NOT_NONE
 
 
-class IndividualData(Model):
+class _DeferredFieldDescriptor(FieldDescriptor):
+    def __get__(self, instance, cls):
+        if instance is not None and self.name in instance._deferred:
+            instance._resolve(self.name)
+        return super().__get__(instance, cls)
+
+    def __set__(self, instance, value):
+        instance._deferred.pop(self.name, None)
+        super().__set__(instance, value)
+
+
+class LazyModel(Model):
+    """
+    Keeps the raw data of the fields named in `_lazy_fields` on import, and
+    only converts and validates each one the first time it's accessed.
+
+    An explicit `validate()` (which `serialize()` also performs) resolves
+    everything that is still deferred. Invalid deferred data raises a
+    `DataError` from the attribute access.
+    """
+    _lazy_fields: Tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in cls._lazy_fields:
+            setattr(cls, name, _DeferredFieldDescriptor(name))
+
+    def __init__(self, raw_data=None, *args, **kwargs):
+        self._deferred = {}
+        super().__init__(raw_data, *args, **kwargs)
+
+    def _convert(self, raw_data=None, context=None, **kwargs):
+        if isinstance(raw_data, LazyModel):
+            # Copy another instance without forcing its deferred fields
+            self._deferred.update(raw_data._deferred)
+            raw_data = {k: v for k, v in raw_data._data.items() if k not in raw_data._deferred}
+        elif raw_data:
+            raw_data = dict(raw_data)
+            for name in self._lazy_fields:
+                if name in raw_data:
+                    self._deferred[name] = raw_data.pop(name)
+
+        return super()._convert(raw_data, context=context, **kwargs)
+
+    def _resolve(self, name: str):
+        field = self._schema.fields[name]
+        raw = self._deferred.pop(name)
+        try:
+            self._data.converted[name] = field.validate(raw, get_validation_context(oo=True))
+        except BaseError as e:
+            # Keep what converts, as an eager import would have
+            try:
+                self._data.converted[name] = field.convert(raw, get_import_context(oo=True, partial=True))
+            except BaseError:
+                pass
+            raise DataError({name: e})
+
+    def validate(self, *args, **kwargs):
+        for name in list(self._deferred):
+            self._resolve(name)
+        return super().validate(*args, **kwargs)
+
+
+class IndividualData(LazyModel):
+    _lazy_fields = ('personal_details', 'address_history', 'documents', 'external_refs')
+
     entity_type = EntityType(required=True, default=EntityType.INDIVIDUAL)
     personal_details: Optional[PersonalDetails] = ModelType(PersonalDetails, default=None)
     address_history: Optional[List[DatedAddress]] = ListType(ModelType(DatedAddress), default=None)
@@ -482,8 +729,8 @@ class RunCheckRequest(Model):
     demo_result = DemoResultType(default=None)
     commercial_relationship = CommercialRelationshipType(required=True)
     check_input: IndividualData = ModelType(IndividualData, required=True)
-    provider_config: ProviderConfig = ModelType(ProviderConfig, required=True)
-    provider_credentials: Optional[ProviderCredentials] = ModelType(ProviderCredentials, default=None)
+    provider_config: ProviderConfig = InternedModelType(ProviderConfig, required=True)
+    provider_credentials: Optional[ProviderCredentials] = InternedModelType(ProviderCredentials, default=None)
 
     class Options:
         export_level = NOT_NONE
@@ -522,8 +769,8 @@ class FinishRequest(Model):
     reference = StringType(required=True)
 
     commercial_relationship = CommercialRelationshipType(required=True)
-    provider_config: ProviderConfig = ModelType(ProviderConfig, required=True)
-    provider_credentials: Optional[ProviderCredentials] = ModelType(ProviderCredentials, default=None)
+    provider_config: ProviderConfig = InternedModelType(ProviderConfig, required=True)
+    provider_credentials: Optional[ProviderCredentials] = InternedModelType(ProviderCredentials, default=None)
 
     custom_data = DictType(BaseType, required=True)
 
@@ -572,8 +819,8 @@ class DownloadFileRequest(Model):
     download_info = PolyModelType(Download, required=True)
 
     commercial_relationship = CommercialRelationshipType(required=True)
-    provider_config: ProviderConfig = ModelType(ProviderConfig, required=True)
-    provider_credentials: Optional[ProviderCredentials] = ModelType(ProviderCredentials, default=None)
+    provider_config: ProviderConfig = InternedModelType(ProviderConfig, required=True)
+    provider_credentials: Optional[ProviderCredentials] = InternedModelType(ProviderCredentials, default=None)
 
     custom_data = DictType(BaseType, required=True)
 
@@ -600,6 +847,17 @@ def _get_input_annotation(signature: inspect.Signature) -> Optional[Type[Model]]
     return first_param.annotation
 
 
+def _validate_deferred(model: Model):
+    """
+    Validates the deferred fields of the lazy models in a request, so invalid
+    input is rejected before the view runs even if it never reads them
+    """
+    for name in model._schema.fields:
+        value = getattr(model, name)
+        if isinstance(value, LazyModel):
+            value.validate()
+
+
 def validate_models(fn):
     """
     Creates a Schematics Model from the request data and validates it.
@@ -632,6 +890,7 @@ def validate_models(fn):
             try:
                 model = input_model().import_data(request.json, apply_defaults=True)
                 model.validate()
+                _validate_deferred(model)
             except DataError as e:
                 abort(Response(str(e), status=400))
 
@@ -1,7 +1,13 @@
 
-from flask import Flask, request
+from flask import Flask, jsonify, request
 from flask.logging import create_logger
 
+from app import http_client, shutdown
+from app.auth import auth
+from app.docver import DISK_CACHE, DOWNLOAD_ATTEMPTS, IMAGE_ANALYSIS, IMAGE_CACHE
+from app.shared import callbacks, outbox, replay_callbacks, scheduler
+from app.startup import http_warm_up, shutdown_drain_timeout
+
 from app.docver import blueprint as docver_blueprint
 from app.docfetch import blueprint as docfetch_blueprint
 from app.doccapture import blueprint as doccapture_blueprint
@@ -11,6 +17,12 @@ from app.doccapture import blueprint as doccapture_blueprint
 app = Flask(__name__)
 logger = create_logger(app)
 
+if http_warm_up:
+    http_client.warm_up()
+
+replay_callbacks()
+shutdown.install(shutdown_drain_timeout)
+
 @app.before_request
 def pre_request_logging():
     request_data = '\n' + request.data.decode('utf8')
@@ -33,3 +45,25 @@ def post_request_logging(response):
 app.register_blueprint(docver_blueprint)
 app.register_blueprint(docfetch_blueprint)
 app.register_blueprint(doccapture_blueprint)
+
+
+@app.route('/metrics/callbacks')
+@auth.login_required
+def callback_metrics():
+    stats = {**callbacks.stats(), **scheduler.stats()}
+    if outbox is not None:
+        stats.update(outbox.stats())
+    return jsonify(stats)
+
+
+@app.route('/metrics/images')
+@auth.login_required
+def image_metrics():
+    stats = {f'download_{key}': value for key, value in DOWNLOAD_ATTEMPTS.stats().items()}
+    if IMAGE_CACHE is not None:
+        stats.update(IMAGE_CACHE.stats())
+    if DISK_CACHE is not None:
+        stats.update(DISK_CACHE.stats())
+    if IMAGE_ANALYSIS is not None:
+        stats.update(IMAGE_ANALYSIS.stats())
+    return jsonify(stats)
@@ -0,0 +1,81 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Thread-safe mapping bounded by entry count, and optionally by the total
+    weight of its values, evicting the least recently used entries when full.
+    Entries can also expire a fixed time after they were added.
+    """
+
+    def __init__(self, maxsize: Optional[int] = None, max_weight: Optional[int] = None,
+                 weigh: Callable[[Any], int] = lambda value: 1, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.max_weight = max_weight
+        self.weigh = weigh
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.weight = 0
+        # Values are stored with their weight and expiry time
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Optional[Any]:
+        with self._lock:
+            try:
+                value, weight, expires = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            if expires is not None and expires <= monotonic():
+                del self._entries[key]
+                self.weight -= weight
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        weight = self.weigh(value)
+        if self.max_weight is not None and weight > self.max_weight:
+            return
+
+        expires = None if self.ttl is None else monotonic() + self.ttl
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.weight -= previous[1]
+
+            self._entries[key] = (value, weight, expires)
+            self.weight += weight
+            while (self.maxsize is not None and len(self._entries) > self.maxsize) or \
+                    (self.max_weight is not None and self.weight > self.max_weight):
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self.weight -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.weight = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'weight': self.weight,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,46 @@
+import json
+import sqlite3
+from contextlib import closing
+from time import time
+from typing import Any, Dict, List, Optional
+
+
+class CheckState:
+    """
+    Errors found while finishing checks in the background, kept in a SQLite
+    database so that whichever worker receives the finish request can see
+    them. Entries are removed `ttl` seconds after they were recorded.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+
+        with closing(self._connect()) as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS check_errors (
+                    reference TEXT PRIMARY KEY,
+                    errors TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    def record(self, reference: str, errors: List[Dict[str, Any]]):
+        with closing(self._connect()) as connection:
+            connection.execute('DELETE FROM check_errors WHERE created_at < ?', (time() - self.ttl,))
+            connection.execute(
+                'INSERT OR REPLACE INTO check_errors (reference, errors, created_at) VALUES (?, ?, ?)',
+                (reference, json.dumps(errors), time()),
+            )
+
+    def get(self, reference: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        The errors recorded for a check, or None if nothing was recorded
+        """
+        with closing(self._connect()) as connection:
+            row = connection.execute('SELECT errors FROM check_errors WHERE reference = ?', (reference,)).fetchone()
+        return None if row is None else json.loads(row[0])
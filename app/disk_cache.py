@@ -0,0 +1,149 @@
+import hashlib
+import mmap
+import os
+import tempfile
+from threading import Lock
+from typing import Any, BinaryIO, Callable, Dict, Optional, Set
+from uuid import UUID
+
+from app.images import DownloadedImage, sniff_media_type
+
+_COPY_SIZE = 64 * 1024
+
+
+class DiskImageCache:
+    """
+    Image cache in a local directory, shared by every worker on the machine.
+
+    Images are stored once under `objects/` by the SHA-256 of their content,
+    and `ids/` maps each image id to the digest of its content. Both are
+    written to a temporary file and renamed into place, so readers never see
+    a partial file, and both survive restarts.
+
+    Images are read through `mmap`, so all workers share the same pages of
+    the OS page cache. When the objects grow past `max_bytes`, the least
+    recently read ones are evicted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+
+        self._objects = os.path.join(directory, 'objects')
+        self._ids = os.path.join(directory, 'ids')
+        os.makedirs(self._objects, exist_ok=True)
+        os.makedirs(self._ids, exist_ok=True)
+
+        # Estimate of the size of the objects, updated by this process and
+        # refreshed from disk whenever it is over budget
+        self._size: Optional[int] = None
+        self._lock = Lock()
+
+    def get(self, image_id: UUID) -> Optional[DownloadedImage]:
+        try:
+            with open(os.path.join(self._ids, str(image_id))) as f:
+                digest = f.read()
+            object_path = os.path.join(self._objects, digest)
+            with open(object_path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # Mark the object as recently used
+            os.utime(object_path)
+        except (FileNotFoundError, ValueError):
+            # Missing, or an empty file which can't be mapped
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return DownloadedImage(mapped, len(mapped), sniff_media_type(mapped[:16]))
+
+    def _write_atomically(self, write: Callable[[BinaryIO], None], path: Callable[[], str]) -> bool:
+        """
+        Writes a temporary file and renames it to `path()`, returning whether
+        it replaced an existing file
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            final_path = path()
+            existed = os.path.exists(final_path)
+            os.replace(temp_path, final_path)
+            return existed
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    def put(self, image_id: UUID, image: DownloadedImage):
+        digest = hashlib.sha256()
+
+        def copy(target: BinaryIO):
+            image.file.seek(0)
+            for chunk in iter(lambda: image.file.read(_COPY_SIZE), b''):
+                digest.update(chunk)
+                target.write(chunk)
+
+        # Another worker may have stored the same content already, in which
+        # case it is replaced with an identical copy
+        existed = self._write_atomically(copy, lambda: os.path.join(self._objects, digest.hexdigest()))
+        self._write_atomically(lambda f: f.write(digest.hexdigest().encode()),
+                               lambda: os.path.join(self._ids, str(image_id)))
+        self._added(0 if existed else image.size)
+
+    def _added(self, size: int):
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            self._size += size
+            if self._size > self.max_bytes:
+                self._size = self._evict()
+
+    def _scan_size(self) -> int:
+        return sum(entry.stat().st_size for entry in os.scandir(self._objects))
+
+    def _evict(self) -> int:
+        entries = []
+        for entry in os.scandir(self._objects):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        size = sum(entry_size for _, entry_size, _ in entries)
+        # Evict down to 90% so every write doesn't trigger another scan
+        target = self.max_bytes * 0.9
+        evicted = set()
+        for _, entry_size, path in sorted(entries):
+            if size <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                # Already evicted by another worker
+                pass
+            evicted.add(os.path.basename(path))
+            size -= entry_size
+
+        if evicted:
+            self._remove_ids(evicted)
+        return size
+
+    def _remove_ids(self, digests: Set[str]):
+        for entry in os.scandir(self._ids):
+            try:
+                with open(entry.path) as f:
+                    if f.read() in digests:
+                        os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'disk_hits': self.hits,
+            'disk_misses': self.misses,
+            'disk_hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,144 @@
+import logging
+import os
+from collections import deque
+from threading import Condition, Thread
+from time import monotonic
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class OverflowPolicy:
+    # Wait for space in the queue, rejecting the callback if none frees up in time
+    BLOCK = 'BLOCK'
+    # Reject the callback straight away
+    SHED = 'SHED'
+    # Keep the callback in an unbounded overflow buffer, drained as the queue empties
+    SPILL = 'SPILL'
+
+    choices = frozenset({BLOCK, SHED, SPILL})
+
+
+class CallbackDispatcher:
+    """
+    Runs callbacks on a fixed number of worker threads, fed by a bounded queue.
+
+    Workers are started on first use, and again in a forked child process, so
+    a dispatcher can be created at import time.
+    """
+
+    def __init__(self, workers: int, queue_size: int, policy: str = OverflowPolicy.BLOCK,
+                 block_timeout: Optional[float] = None):
+        if policy not in OverflowPolicy.choices:
+            raise ValueError(f'Unknown overflow policy: {policy}')
+
+        self.workers = workers
+        self.queue_size = queue_size
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self.submitted = 0
+        self.rejected = 0
+        self.spilled = 0
+
+        self._pending = deque()
+        self._overflow = deque()
+        self._active = 0
+        self._cond = Condition()
+        self._pid = None
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._active = 0
+        for i in range(self.workers):
+            Thread(target=self._work, name=f'callback-worker-{i}', daemon=True).start()
+
+    def submit(self, fn: Callable, *args: Any) -> bool:
+        """
+        Queues `fn(*args)` to run on a worker, returning False if it was rejected
+        """
+        with self._cond:
+            if self._pid != os.getpid():
+                self._start()
+
+            if len(self._pending) >= self.queue_size:
+                if self.policy == OverflowPolicy.SPILL:
+                    self._overflow.append((fn, args))
+                    self.submitted += 1
+                    self.spilled += 1
+                    self._cond.notify_all()
+                    return True
+
+                if self.policy == OverflowPolicy.BLOCK:
+                    self._cond.wait_for(lambda: len(self._pending) < self.queue_size, self.block_timeout)
+
+                if len(self._pending) >= self.queue_size:
+                    self.rejected += 1
+                    logger.warning(f'Callback queue is full, rejected {fn!r}{args}')
+                    return False
+
+            self._pending.append((fn, args))
+            self.submitted += 1
+            self._cond.notify_all()
+            return True
+
+    def _next(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self._overflow)
+            if self._pending:
+                task = self._pending.popleft()
+                # Keep the spilled callbacks in order behind the queue
+                if self._overflow:
+                    self._pending.append(self._overflow.popleft())
+            else:
+                task = self._overflow.popleft()
+
+            self._active += 1
+            self._cond.notify_all()
+            return task
+
+    def _work(self):
+        while True:
+            fn, args = self._next()
+            try:
+                fn(*args)
+            except Exception:
+                logger.exception(f'Callback {fn!r}{args} failed')
+            finally:
+                with self._cond:
+                    self._active -= 1
+                    self._cond.notify_all()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until every queued callback has finished, returning False on timeout
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        with self._cond:
+            while self._pending or self._overflow or self._active:
+                remaining = None if deadline is None else deadline - monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def pending(self) -> List[Tuple[Callable, Tuple[Any, ...]]]:
+        """
+        Callbacks which are still waiting for a worker
+        """
+        with self._cond:
+            return [*self._pending, *self._overflow]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'queue_depth': len(self._pending),
+                'overflow_depth': len(self._overflow),
+                'active': self._active,
+                'utilization': self._active / self.workers,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'spilled': self.spilled,
+            }
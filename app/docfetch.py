@@ -1,4 +1,3 @@
-from threading import Thread
 from typing import List, Tuple
 from uuid import UUID
 from flask import Blueprint, send_file, Response, abort
@@ -9,8 +8,8 @@ from app.api import Document, DatedAddress, DemoResultType, Error, ErrorType, Fi
     DocumentData, RunCheckRequest, RunCheckResponse, validate_models, IndividualData, \
     DocumentResult, CheckedDocumentFieldResult, FinishResponse, \
     FinishRequest, DownloadFileRequest, DocumentCategory, DocumentType, DocumentImageType, DownloadType, FileType
-from app.shared import blueprint as shared_blueprint, create_demo_field_checks, invalid_fields_from_result_type, uncertain_fields_from_result_type, \
-    create_demo_forgery_check, create_demo_image_check, run_demo_check, task_thread
+from app.scenarios import ScenarioEngine, create_extracted_data
+from app.shared import blueprint as shared_blueprint, run_demo_check
 
 blueprint = Blueprint('docfetch', __name__, url_prefix='/docfetch')
 blueprint.register_blueprint(shared_blueprint)
@@ -19,6 +18,9 @@ SUPPORTED_COUNTRIES = ['GBR', 'USA', 'CAN', 'NLD']
 DEMO_PROVIDER_ID = UUID('5c0bf04f-fce5-4f3a-a078-33dab7f65783')
 
 
+SCENARIOS = ScenarioEngine('Document Fetch Reference', DemoResultType.DOCUMENT_ALL_PASS)
+
+
 @blueprint.route('/')
 def index():
     return send_file('../static/docfetch/metadata.json', max_age=-1)
@@ -55,63 +57,15 @@ def _synthesize_demo_result(entity_data: IndividualData, demo_result: DemoResult
         ]
     })
 
-    # If we get an 'ANY' Demo Request, treat it as an ALL_PASS
-    if demo_result == DemoResultType.ANY:
-        demo_result = DemoResultType.DOCUMENT_ALL_PASS
-
-    # For unsupported documents, bail out immediately
-    if demo_result == DemoResultType.ERROR_UNSUPPORTED_DOCUMENT_TYPE:
-        result = DocumentResult({
-            'all_passed': False,
-            'document_type_passed': False,
-            'error_reason': 'Unsupported document type',
-            'image_checks_passed': False,
-            'provider_name': 'Document Verification Reference',
-        })
-
-        document.verification_result = result
-        return [document]
-
-    # Extract only one address from the history
-    current_address = entity_data.get_current_address()
-    dated_address = DatedAddress({'address': current_address})
-
-    # Only generate field checks if the document would be valid
-    field_checks = []
-    if demo_result not in [DemoResultType.DOCUMENT_FORGERY_CHECK_FAILURE, DemoResultType.DOCUMENT_IMAGE_CHECK_FAILURE]:
-        field_checks = create_demo_field_checks(
-            invalid_fields_from_result_type(demo_result),
-            uncertain_fields_from_result_type(demo_result),
-        )
-
-    image_checks_passed = demo_result is not DemoResultType.DOCUMENT_IMAGE_CHECK_FAILURE
-    forgery_checks_passed = demo_result is not DemoResultType.DOCUMENT_FORGERY_CHECK_FAILURE
-    field_checks_passed = True
-    for fc in field_checks:
-        if fc.result is not CheckedDocumentFieldResult.CHECK_VALID:
-            field_checks_passed = False
-
-    all_passed = image_checks_passed and forgery_checks_passed and field_checks_passed
-
-    result = DocumentResult({
-        'all_passed': all_passed,
-        'document_type_passed': True,
-        'field_checks': field_checks,
-        'forgery_checks': [create_demo_forgery_check(forgery_checks_passed)],
-        'forgery_checks_passed': forgery_checks_passed,
-        'image_checks': [create_demo_image_check(image_checks_passed)],
-        'image_checks_passed': image_checks_passed,
-        'provider_name': "Document Fetch Reference",
-    })
-
-    extracted = DocumentData({
-        'address_history': [dated_address],
-        'personal_details': entity_data.personal_details,
-        'result': result
-    })
+    # 'ANY' and unknown demo requests are treated as an ALL_PASS
+    outcome = SCENARIOS.lookup(demo_result, default=DemoResultType.ANY).outcome(document.category)
+    document.verification_result = outcome.result
 
-    document.extracted_data = extracted
-    document.verification_result = result
+    # Nothing is extracted from unsupported documents
+    if outcome.result.document_type_passed:
+        document.extracted_data = create_extracted_data(entity_data, outcome)
+        # With the results of comparing the extracted fields
+        document.verification_result = document.extracted_data.result
 
     return [document]
 
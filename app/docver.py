@@ -1,23 +1,57 @@
-from threading import Thread
-from typing import Optional, List, Tuple
+import logging
+from concurrent.futures import Future
+from functools import partial
+from threading import Event
+from typing import Any, Callable, Dict, Optional, List, Tuple, Union
 from uuid import UUID
 from flask import Blueprint, send_file
-import requests
 
+from app import http_client
 from app.auth import auth, outbound_auth
-from app.startup import passfort_base_url
-from app.api import Document, DatedAddress, DemoResultType, Error, ErrorType, Field, \
+from app.aio_client import CHUNK_SIZE
+from app.startup import passfort_base_url, download_workers, download_concurrency, check_max_image_bytes, \
+    image_cache_bytes, image_cache_ttl, image_disk_cache_dir, image_disk_cache_bytes, download_in_background, \
+    check_state_path, check_state_ttl, download_hedging, download_retries, download_retry_base_delay, \
+    download_retry_max_delay, download_retry_budget, image_analysis_workers, image_analysis_cache_size
+from app.api import DecisionClass, Document, DocumentCheck, DatedAddress, DemoResultType, Error, ErrorType, Field, \
     DocumentData, RunCheckRequest, RunCheckResponse, validate_models, IndividualData, \
     DocumentResult, CheckedDocumentFieldResult, FinishResponse, \
     FinishRequest
-from app.shared import create_demo_field_checks, invalid_fields_from_result_type, uncertain_fields_from_result_type, \
-    create_demo_forgery_check, create_demo_image_check, task_thread
+from app.cache import LRUCache
+from app.check_state import CheckState
+from app.disk_cache import DiskImageCache
+from app.downloads import DownloadPool
+from app.hedging import Hedger, RetryBudget
+from app.image_analysis import AnalysisPool, ImageAnalysis, np
+from app.images import ByteBudget, DownloadedImage, ImageCharge, ImageRejected, ImageWriter
+from app.mrz import MRZ, parse_batch
+from app.scenarios import ScenarioEngine, create_extracted_data
+from app.scheduler import RetryPolicy
+from app.shared import create_forgery_checks, create_image_checks, queue_callback, send_callback
 
 blueprint = Blueprint('docver', __name__, url_prefix='/docver')
+logger = logging.getLogger(__name__)
 
 SUPPORTED_COUNTRIES = ['GBR', 'USA', 'CAN', 'NLD']
 DEMO_PROVIDER_ID = UUID('f0214ca0-3b69-463e-9dd6-c8601034195f')
 
+DOWNLOADS = DownloadPool(download_workers, download_concurrency)
+# Runs its attempts on the download pool's threads
+DOWNLOAD_ATTEMPTS = Hedger(
+    RetryPolicy(download_retries, download_retry_base_delay, download_retry_max_delay),
+    RetryBudget(download_retry_budget),
+    retryable=http_client.is_transient,
+    hedge=download_hedging,
+)
+IMAGE_CACHE = LRUCache(max_weight=image_cache_bytes, weigh=len, ttl=image_cache_ttl) if image_cache_bytes else None
+CHECK_STATE = CheckState(check_state_path, check_state_ttl) if download_in_background else None
+DISK_CACHE = DiskImageCache(image_disk_cache_dir, image_disk_cache_bytes) if image_disk_cache_dir else None
+IMAGE_ANALYSIS = AnalysisPool(image_analysis_workers, cache_size=image_analysis_cache_size) \
+    if np is not None and image_analysis_workers else None
+
+SCENARIOS = ScenarioEngine('Document Verification Reference', DemoResultType.DOCUMENT_ALL_PASS)
+
+
 @blueprint.route('/')
 def index():
     return send_file('../static/docver/metadata.json', max_age=-1)
@@ -28,69 +62,63 @@ def get_config():
     return send_file('../static/docver/config.json', max_age=-1)
 
 
-def _synthesize_demo_result(document: Document, entity_data: IndividualData, demo_result: DemoResultType) -> List[Document]:
+def _measured_checks(document: Document, analyses: Dict[UUID, ImageAnalysis], stage: str,
+                     create_checks: Callable[[Any], List[DocumentCheck]]) -> List[DocumentCheck]:
+    return [
+        check
+        for image in document.get_images() if image.id in analyses
+        for check in create_checks(analyses[image.id].results[stage])
+    ]
+
+
+def _mrz_lines(document: Document) -> Tuple[Optional[str], ...]:
+    data = document.extracted_data
+    return (data.mrz1, data.mrz2, data.mrz3) if data is not None else ()
+
+
+def _synthesize_demo_result(document: Document, entity_data: IndividualData, demo_result: DemoResultType,
+                            analyses: Optional[Dict[UUID, ImageAnalysis]] = None,
+                            mrz: Optional[MRZ] = None) -> List[Document]:
     """
     Takes a Document and populates the extracted_data and verification_result
-    based on the desired demo_result
+    based on the desired demo_result, using the analysis of its images for the
+    image and forgery checks where there is one, and its MRZ if it has one
     """
-    # If we get an 'ANY' Demo Request, treat it as an ALL_PASS
-    if demo_result == DemoResultType.ANY:
-        demo_result = DemoResultType.DOCUMENT_ALL_PASS
-
-    # For unsupported documents, bail out immediately
-    if demo_result == DemoResultType.ERROR_UNSUPPORTED_DOCUMENT_TYPE:
-        result = DocumentResult({
-            'all_passed': False,
-            'document_type_passed': False,
-            'error_reason': 'Unsupported document type',
-            'image_checks_passed': False,
-            'provider_name': 'Document Verification Reference',
-        })
-
-        document.verification_result = result
-        return document
-
-    # Extract only one address from the history
-    current_address = entity_data.get_current_address()
-    dated_address = DatedAddress({'address': current_address})
-
-    # Only generate field checks if the document would be valid
-    field_checks = []
-    if demo_result not in [DemoResultType.DOCUMENT_FORGERY_CHECK_FAILURE, DemoResultType.DOCUMENT_IMAGE_CHECK_FAILURE]:
-        field_checks = create_demo_field_checks(
-            invalid_fields_from_result_type(demo_result),
-            uncertain_fields_from_result_type(demo_result),
-        )
-
-    image_checks_passed = demo_result is not DemoResultType.DOCUMENT_IMAGE_CHECK_FAILURE
-    forgery_checks_passed = demo_result is not DemoResultType.DOCUMENT_FORGERY_CHECK_FAILURE
-    field_checks_passed = True
-    for fc in field_checks:
-        if fc.result is not CheckedDocumentFieldResult.CHECK_VALID:
-            field_checks_passed = False
-
-    all_passed = image_checks_passed and forgery_checks_passed and field_checks_passed
-
-    result = DocumentResult({
-        'all_passed': all_passed,
-        'document_type_passed': True,
-        'field_checks': field_checks,
-        'forgery_checks': [create_demo_forgery_check(forgery_checks_passed)],
-        'forgery_checks_passed': forgery_checks_passed,
-        'image_checks': [create_demo_image_check(image_checks_passed)],
-        'image_checks_passed': image_checks_passed,
-        'provider_name': "Document Verification Reference",
-    })
+    # 'ANY' and unknown demo requests are treated as an ALL_PASS
+    outcome = SCENARIOS.lookup(demo_result, default=DemoResultType.ANY).outcome(document.category)
+    mrz_lines = _mrz_lines(document)
+    document.verification_result = outcome.result
 
-    extracted = DocumentData({
-        'address_history': [dated_address],
-        'personal_details': entity_data.personal_details,
-        'result': result
-    })
-
-    document.extracted_data = extracted
-    document.verification_result = result
+    # Nothing is extracted from unsupported documents
+    if not outcome.result.document_type_passed:
+        return document
 
+    document.extracted_data = create_extracted_data(entity_data, outcome)
+    # With the results of comparing the extracted fields
+    base_result = document.extracted_data.result
+
+    image_checks = _measured_checks(document, analyses or {}, 'quality', create_image_checks)
+    forgery_checks = _measured_checks(document, analyses or {}, 'forgery', create_forgery_checks)
+    # Demo failures still fail regardless of the images
+    if image_checks or forgery_checks or mrz is not None:
+        result = DocumentResult(base_result.to_primitive())
+        if image_checks and result.image_checks_passed:
+            result.image_checks = image_checks
+            result.image_checks_passed = all(check.result == DecisionClass.PASS for check in image_checks)
+        if forgery_checks and result.forgery_checks_passed:
+            result.forgery_checks = forgery_checks
+            result.forgery_checks_passed = all(check.result == DecisionClass.PASS for check in forgery_checks)
+        if mrz is not None:
+            result.field_checks = [*(result.field_checks or []), mrz.field_check()]
+        result.all_passed = result.all_passed and result.image_checks_passed and result.forgery_checks_passed \
+            and (mrz is None or mrz.valid)
+        document.extracted_data.result = result
+
+    if mrz is not None:
+        document.extracted_data.mrz1, document.extracted_data.mrz2, document.extracted_data.mrz3 = mrz_lines
+        mrz.fill(document.extracted_data)
+
+    document.verification_result = document.extracted_data.result
     return document
 
 
@@ -129,23 +157,155 @@ def _extract_input(req: RunCheckRequest) -> Tuple[List[Error], Optional[Individu
         return [], req.check_input
 
 
-def _download_image(image_id: UUID):
-    session = requests.Session()
+def _download_image(image_id: UUID, budget: ByteBudget) -> Union[DownloadedImage, 'Future[DownloadedImage]']:
+    """
+    The image if it is cached, or else a future of it being downloaded, so
+    the thread isn't held waiting for the download
+    """
+    # Images don't change, so retries and repeated checks can use earlier downloads
+    if IMAGE_CACHE is not None:
+        content = IMAGE_CACHE.get(image_id)
+        if content is not None:
+            budget.take(len(content))
+            return DownloadedImage.from_bytes(content)
+
+    # Other workers on this machine may have downloaded it already
+    image = DISK_CACHE.get(image_id) if DISK_CACHE is not None else None
+    if image is not None:
+        budget.take(image.size)
+        _cache_image(image_id, image)
+        return image
+
+    return _then(_stream_image(image_id, budget), partial(_store_image, image_id))
+
+
+def _then(future: Future, fn: Callable) -> Future:
+    """
+    Future of `fn` applied to the result of `future`, called on the thread
+    which completes it
+    """
+    chained = Future()
+    chained.set_running_or_notify_cancel()
+
+    def done(_):
+        try:
+            chained.set_result(fn(future.result()))
+        except Exception as e:
+            chained.set_exception(e)
+
+    future.add_done_callback(done)
+    return chained
+
+
+def _store_image(image_id: UUID, image: DownloadedImage) -> DownloadedImage:
+    if DISK_CACHE is not None:
+        DISK_CACHE.put(image_id, image)
+    _cache_image(image_id, image)
+    return image
+
+
+def _cache_image(image_id: UUID, image: DownloadedImage):
+    if IMAGE_CACHE is not None:
+        IMAGE_CACHE.put(image_id, image.read())
+
+
+def _stream_image(image_id: UUID, budget: ByteBudget) -> 'Future[DownloadedImage]':
+    # Hedged attempts are downloading the same image, so it is only charged once
+    charge = ImageCharge(budget)
+
+    def won(image: DownloadedImage) -> DownloadedImage:
+        charge.settle(image.size)
+        return image
+
+    future = DOWNLOAD_ATTEMPTS.submit(DOWNLOADS, partial(_stream_image_once, image_id, charge),
+                                      discard=DownloadedImage.close)
+    return _then(future, won)
+
+
+def _stream_image_once(image_id: UUID, charge: ImageCharge, cancelled: Event) -> DownloadedImage:
     url = f'{passfort_base_url}/v1/images/{image_id}'
+    writer = ImageWriter(charge.attempt(), cancelled=cancelled)
+
+    try:
+        client = http_client.async_client()
+        if client is not None:
+            client.request('GET', url, auth=outbound_auth(), on_chunk=writer.write).result()
+            return writer.finish()
+
+        with http_client.session().get(url, auth=outbound_auth(), stream=True) as res:
+            res.raise_for_status()
+            writer.expect(res.headers.get('Content-Length'))
+            for chunk in res.iter_content(CHUNK_SIZE):
+                writer.write(chunk)
+        return writer.finish()
+    except Exception:
+        # A failed attempt doesn't count against the check's budget
+        writer.discard()
+        raise
+
+
+def _analyse_images(images: Dict[UUID, DownloadedImage]) -> Dict[UUID, ImageAnalysis]:
+    """
+    Analyses each image which can be decoded, in worker processes
+    """
+    if IMAGE_ANALYSIS is None:
+        return {}
+
+    futures = {image_id: IMAGE_ANALYSIS.submit(image.read()) for image_id, image in images.items()}
+    analyses = {}
+    for image_id, future in futures.items():
+        try:
+            analysis = future.result()
+        except Exception:
+            logger.exception(f'Failed to analyse image {image_id}')
+            continue
+        if analysis is not None:
+            analyses[image_id] = analysis
+    return analyses
+
+
+def _download_images(image_ids: List[UUID]) -> Dict[UUID, DownloadedImage]:
+    budget = ByteBudget(check_max_image_bytes)
+    try:
+        return DOWNLOADS.download_all(partial(_download_image, budget=budget), image_ids)
+    finally:
+        # Stop any downloads still in flight
+        budget.cancel()
+
+
+def _finish_in_background(image_ids: List[UUID], provider_id: UUID, reference: str) -> Optional[Future]:
+    """
+    Downloads the images of a check which has already responded, recording
+    any failure for `finish_check`, then sends the callback
+    """
+    # Don't download again if only the callback failed
+    if CHECK_STATE.get(reference) is None:
+        errors = []
+        try:
+            for image in _download_images(image_ids).values():
+                image.close()
+        except ImageRejected as e:
+            errors.append(Error.invalid_image(str(e)))
+        except Exception as e:
+            logger.exception(f'Failed to download images for {reference}')
+            errors.append(Error.provider_connection(f'Failed to download images: {e}'))
 
-    res = session.get(url, auth=outbound_auth())
-    res.raise_for_status()
-    return res.content
+        CHECK_STATE.record(reference, [error.serialize() for error in errors])
 
+    return send_callback(provider_id, reference)
 
 
 # We store the computed demo result in the custom data retained for us
 # by the server
-def _run_demo_check(check_id: UUID, check_input: IndividualData, demo_result: str) -> RunCheckResponse:
+def _run_demo_check(check_id: UUID, check_input: IndividualData, demo_result: str,
+                    send: Optional[Callable] = None,
+                    analyses: Optional[Dict[UUID, ImageAnalysis]] = None) -> RunCheckResponse:
     documents = check_input.get_documents()
+    # The MRZs of all the documents are checked together
+    mrzs = parse_batch([_mrz_lines(doc) for doc in documents])
     verified_documents = [
-        _synthesize_demo_result(doc, check_input, demo_result)
-        for doc in documents
+        _synthesize_demo_result(doc, check_input, demo_result, analyses, mrz)
+        for doc, mrz in zip(documents, mrzs)
     ]
     check_input.documents = verified_documents
 
@@ -171,9 +331,9 @@ def _run_demo_check(check_id: UUID, check_input: IndividualData, demo_result: st
         'custom_data': custom_data,
     })
 
-    # Prepare a callback to be fired in another thread
-    _cb = Thread(target=task_thread, args=(response['provider_id'], response['reference']))
-    _cb.start()
+    # Send the callback separately to simulate doing some work asynchronously
+    # through a provider, but not before the server has our response
+    queue_callback(send if send is not None else send_callback, response['provider_id'], response['reference'])
 
     return response
 
@@ -191,15 +351,24 @@ def run_check(req: RunCheckRequest) -> RunCheckResponse:
     if country not in SUPPORTED_COUNTRIES:
         return RunCheckResponse.error(DEMO_PROVIDER_ID, [Error.unsupported_country()])
 
-    # Download the images even though we won't do anything with them
-    doc_images = {}
-    for doc_image_id in check_input.get_document_image_ids():
-        content = _download_image(doc_image_id)
-        assert len(content) > 0
-        doc_images[doc_image_id] = content
-
-    if req.demo_result is not None:
-        return _run_demo_check(req.id, check_input, req.demo_result)
+    image_ids = check_input.get_document_image_ids()
+    if download_in_background:
+        # Answer straight away, the images are downloaded before the callback
+        if req.demo_result is not None:
+            return _run_demo_check(req.id, check_input, req.demo_result, partial(_finish_in_background, image_ids))
+    else:
+        try:
+            doc_images = _download_images(image_ids)
+        except ImageRejected as e:
+            return RunCheckResponse.error(DEMO_PROVIDER_ID, [Error.invalid_image(str(e))])
+
+        try:
+            if req.demo_result is not None:
+                analyses = _analyse_images(doc_images)
+                return _run_demo_check(req.id, check_input, req.demo_result, analyses=analyses)
+        finally:
+            for image in doc_images.values():
+                image.close()
 
     return RunCheckResponse.error(DEMO_PROVIDER_ID, [Error({
         'type': ErrorType.PROVIDER_MESSAGE,
@@ -225,6 +394,13 @@ def finish_check(req: FinishRequest, _id: UUID) -> FinishResponse:
             'message': 'Demo finish request did not contain demo result',
         })])
 
+    if download_in_background:
+        errors = CHECK_STATE.get(req.reference)
+        if errors is None:
+            return FinishResponse.error([Error.provider_message('Images for this check were not downloaded')])
+        if errors:
+            return FinishResponse.error([Error(error) for error in errors])
+
     resp = FinishResponse()
     resp.import_data(req.custom_data)
     return resp
@@ -0,0 +1,78 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ThreadPoolExecutor, wait
+from threading import Lock
+from typing import Callable, Dict, Hashable, Iterable, Optional, TypeVar, Union
+
+T = TypeVar('T')
+
+_NO_MORE_KEYS = object()
+
+
+class DownloadPool(Executor):
+    """
+    Runs downloads on a thread pool shared by all requests, which caps how
+    many run at once across the process, while each request keeps at most
+    `per_request` of its own in flight.
+
+    It is also an `Executor`, so calls which make up a download can be run
+    on the same threads.
+    """
+
+    def __init__(self, max_workers: int, per_request: int):
+        self.max_workers = max_workers
+        self.per_request = per_request
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = Lock()
+        self._pid = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='download')
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, fn: Callable[..., T], *args, **kwargs) -> 'Future[T]':
+        return self._get_executor().submit(fn, *args, **kwargs)
+
+    def download_all(self, download: Callable[[Hashable], Union[T, 'Future[T]']], keys: Iterable[Hashable]) \
+            -> Dict[Hashable, T]:
+        """
+        Calls `download` for each key, returning the results by key. If one
+        fails, downloads which haven't started are cancelled and its error is
+        raised without waiting for the others.
+
+        `download` may return a future rather than block, such as one of calls
+        it has submitted to the pool, and its result is waited for in its place.
+        Its thread is then free to run those calls.
+        """
+        executor = self._get_executor()
+        keys = iter(keys)
+        in_flight: Dict[Future, Hashable] = {}
+        results = {}
+
+        def submit_next():
+            key = next(keys, _NO_MORE_KEYS)
+            if key is not _NO_MORE_KEYS:
+                in_flight[executor.submit(download, key)] = key
+
+        for _ in range(self.per_request):
+            submit_next()
+
+        try:
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = in_flight.pop(future)
+                    result = future.result()
+                    if isinstance(result, Future):
+                        in_flight[result] = key
+                        continue
+                    results[key] = result
+                    submit_next()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+        return results
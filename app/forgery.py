@@ -0,0 +1,95 @@
+from typing import NamedTuple
+
+# NumPy is optional, see `app.image_analysis`
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Images are analysed in strips of this many rows, so the intermediate arrays
+# of a large scan stay small, and compared in square blocks of this size
+STRIP_ROWS = 256
+BLOCK_SIZE = 32
+# Blocks flatter than this carry no noise or quantisation to compare
+MIN_BLOCK_STD = 4.0
+# Step of the requantisation used for the error level
+ERROR_LEVEL_STEP = 8
+# Robust z-score above which a block is inconsistent with the rest, and the
+# smallest deviation it is measured against, so near-identical blocks in
+# clean images aren't flagged for tiny differences
+OUTLIER_SCORE = 3.5
+MIN_ERROR_DEVIATION = 0.25
+MIN_NOISE_DEVIATION = 0.2
+
+
+class ForgeryScore(NamedTuple):
+    # Fraction of textured blocks whose requantisation error stands out
+    error_level: float
+    # Fraction of textured blocks whose noise level stands out
+    noise_inconsistency: float
+
+
+class ForgeryThresholds(NamedTuple):
+    max_error_level: float = 0.3
+    max_noise_inconsistency: float = 0.2
+
+
+def _blocks(array, size: int):
+    """
+    Splits a 2D array into a (rows, columns, size * size) array of blocks,
+    dropping partial blocks at the edges
+    """
+    rows, columns = array.shape[0] // size, array.shape[1] // size
+    blocks = array[:rows * size, :columns * size].reshape(rows, size, columns, size)
+    return blocks.transpose(0, 2, 1, 3).reshape(rows, columns, size * size)
+
+
+def _block_statistics(strip):
+    """
+    Spread, noise level and requantisation error of each block in a strip
+    """
+    residual = np.zeros_like(strip)
+    residual[1:-1, 1:-1] = (
+        strip[:-2, 1:-1] + strip[2:, 1:-1] + strip[1:-1, :-2] + strip[1:-1, 2:]
+        - 4 * strip[1:-1, 1:-1]
+    )
+    error = np.abs(strip - np.round(strip / ERROR_LEVEL_STEP) * ERROR_LEVEL_STEP)
+
+    return (
+        _blocks(strip, BLOCK_SIZE).std(axis=2).ravel(),
+        _blocks(residual, BLOCK_SIZE).std(axis=2).ravel(),
+        _blocks(error, BLOCK_SIZE).mean(axis=2).ravel(),
+    )
+
+
+def _outliers(values, min_deviation: float) -> float:
+    """
+    Fraction of values far from the median, measured in median absolute deviations
+    """
+    if values.size == 0:
+        return 0.0
+    median = np.median(values)
+    deviation = max(float(np.median(np.abs(values - median))), min_deviation)
+    return float((np.abs(values - median) / deviation > OUTLIER_SCORE).mean())
+
+
+def score(luma) -> ForgeryScore:
+    """
+    Looks for regions of an image which were pasted in from another source,
+    by comparing the noise and quantisation of every textured block
+    """
+    spreads, noise, errors = [], [], []
+    for start in range(0, luma.shape[0], STRIP_ROWS):
+        spread, strip_noise, strip_errors = _block_statistics(luma[start:start + STRIP_ROWS])
+        spreads.append(spread)
+        noise.append(strip_noise)
+        errors.append(strip_errors)
+
+    spreads = np.concatenate(spreads)
+    textured = spreads >= MIN_BLOCK_STD
+    # Noise grows with texture, so it is compared relative to each block's
+    # spread, on a log scale
+    return ForgeryScore(
+        error_level=_outliers(np.concatenate(errors)[textured], MIN_ERROR_DEVIATION),
+        noise_inconsistency=_outliers(np.log(np.concatenate(noise)[textured] / spreads[textured]), MIN_NOISE_DEVIATION),
+    )
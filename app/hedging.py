@@ -0,0 +1,269 @@
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
+from threading import Condition, Event, Lock, Thread
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.scheduler import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class LatencyTracker:
+    """
+    Latencies of the most recent successful calls
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._lock = Lock()
+
+    def record(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def p95(self) -> Optional[float]:
+        """
+        95th percentile of the recent latencies, or None until there are enough
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[int(len(latencies) * 0.95)]
+
+
+class RetryBudget:
+    """
+    Limits retries and hedged calls to a fraction of all calls, so they can't
+    multiply the load on a server which is already struggling. Each call adds
+    `ratio` of a token, and each retry spends a whole one.
+    """
+
+    def __init__(self, ratio: float, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class _Timer:
+    """
+    Calls functions after a delay, on a single thread which waits for the next
+    one to fall due. Started on first use and again in a forked child process.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._heap = []
+        self._sequence = itertools.count()
+        self._cond = Condition()
+        self._pid = None
+
+    def after(self, delay: float, fn: Callable[[], Any]):
+        with self._cond:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._heap = []
+                Thread(target=self._run, name=self.name, daemon=True).start()
+
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._sequence), fn))
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                _, _, fn = heapq.heappop(self._heap)
+
+            try:
+                fn()
+            except Exception:
+                logger.exception(f'Delayed call to {fn!r} failed')
+
+
+class Hedger:
+    """
+    Makes calls which are hedged, with a second call made if the first takes
+    longer than the recent 95th percentile, and retried with backoff when they
+    fail. The first successful call wins and the other is cancelled.
+
+    Calls are given an `Event` which is set when they should stop early.
+    Hedged calls and retries both spend the same `RetryBudget`.
+
+    Calls run on the executor passed to `submit`, so they share its threads
+    with everything else on it. Nothing waits on a thread while a call is in
+    flight: hedges and retries are started by a single timer thread.
+    """
+
+    def __init__(self, retry: RetryPolicy, budget: RetryBudget, retryable: Callable[[Exception], bool],
+                 hedge: bool = True, latencies: Optional[LatencyTracker] = None):
+        self.retry = retry
+        self.budget = budget
+        self.retryable = retryable
+        self.hedge = hedge
+        self.latencies = latencies if latencies is not None else LatencyTracker()
+
+        self.calls = 0
+        self.hedged = 0
+        self.retried = 0
+
+        self._timer = _Timer('hedge')
+        self._lock = Lock()
+
+    def submit(self, executor: Executor, fn: Callable[[Event], T],
+               discard: Callable[[T], Any] = lambda result: None) -> 'Future[T]':
+        """
+        Starts calling `fn` on `executor`, hedging and retrying it, and returns
+        a future of the winning result. `discard` is given the result of a
+        call which lost the race but completed anyway.
+        """
+        call = _HedgedCall(self, executor, fn, discard)
+        call.start()
+        return call.future
+
+    def call(self, executor: Executor, fn: Callable[[Event], T],
+             discard: Callable[[T], Any] = lambda result: None) -> T:
+        """
+        Like `submit`, but waits for the result. Mustn't be called on a thread
+        of `executor`, which could be left waiting for calls queued behind it.
+        """
+        return self.submit(executor, fn, discard).result()
+
+    def _timed(self, fn: Callable[[Event], T], cancelled: Event) -> T:
+        start = time.monotonic()
+        result = fn(cancelled)
+        self.latencies.record(time.monotonic() - start)
+        return result
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'hedged': self.hedged,
+            'retried': self.retried,
+            'latency_p95': self.latencies.p95(),
+        }
+
+
+class _HedgedCall:
+    """
+    State of one call to `Hedger.submit`, moved on by its calls completing
+    and by the hedger's timer
+    """
+
+    def __init__(self, hedger: Hedger, executor: Executor, fn: Callable[[Event], T], discard: Callable[[T], Any]):
+        self.hedger = hedger
+        self.executor = executor
+        self.fn = fn
+        self.discard = discard
+        # Only completed here, so it can't be cancelled
+        self.future = Future()
+        self.future.set_running_or_notify_cancel()
+
+        self._attempt = 0
+        # Calls of the current attempt which are in flight
+        self._calls: Dict[Future, Event] = {}
+        self._error: Optional[Exception] = None
+        self._done = False
+        self._lock = Lock()
+
+    def start(self):
+        hedger = self.hedger
+        hedger.budget.deposit()
+        hedger._count('calls')
+        with self._lock:
+            self._error = None
+            attempt = self._attempt
+            self._launch()
+
+        delay = hedger.latencies.p95() if hedger.hedge else None
+        if delay is not None:
+            hedger._timer.after(delay, lambda: self._maybe_hedge(attempt))
+
+    def _launch(self):
+        cancelled = Event()
+        call = self.executor.submit(self.hedger._timed, self.fn, cancelled)
+        self._calls[call] = cancelled
+        call.add_done_callback(self._completed)
+
+    def _maybe_hedge(self, attempt: int):
+        with self._lock:
+            # Only a call which is still the only one of its attempt is hedged
+            if self._done or self._attempt != attempt or len(self._calls) != 1:
+                return
+            if not self.hedger.budget.withdraw():
+                return
+            self.hedger._count('hedged')
+            self._launch()
+
+    def _completed(self, call: Future):
+        if call.cancelled():
+            return
+
+        error = call.exception()
+        with self._lock:
+            self._calls.pop(call, None)
+            if self._done:
+                won = retry = False
+            elif error is None:
+                won, retry = True, False
+                self._done = True
+            else:
+                self._error = self._error or error
+                won = False
+                # The attempt has failed once none of its calls are left
+                retry = not self._calls
+            losers = dict(self._calls) if won else {}
+
+        if error is None and not won:
+            self.discard(call.result())
+        elif won:
+            self._stop(losers)
+            self.future.set_result(call.result())
+        elif retry:
+            self._failed()
+
+    def _failed(self):
+        hedger = self.hedger
+        error = self._error
+        if self._attempt + 1 >= hedger.retry.attempts or not hedger.retryable(error) or not hedger.budget.withdraw():
+            with self._lock:
+                self._done = True
+            self.future.set_exception(error)
+            return
+
+        hedger._count('retried')
+        delay = hedger.retry.backoff(self._attempt)
+        with self._lock:
+            self._attempt += 1
+        hedger._timer.after(delay, self.start)
+
+    def _stop(self, calls: Dict[Future, Event]):
+        for call, cancelled in calls.items():
+            cancelled.set()
+            # Calls which haven't started never will, and those which have
+            # are discarded by `_completed` if they succeed anyway
+            call.cancel()
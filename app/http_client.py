@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import os
+from threading import Lock, Thread
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.aio_client import AsyncClient, aiohttp
+from app.startup import passfort_base_url, http_pool_size, http_connect_timeout, http_read_timeout, http_async
+
+logger = logging.getLogger(__name__)
+
+
+class _TimeoutSession(requests.Session):
+    """
+    Session applying default connect and read timeouts to every request
+    """
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', (http_connect_timeout, http_read_timeout))
+        return super().request(method, url, **kwargs)
+
+
+def _create_session() -> requests.Session:
+    session = _TimeoutSession()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=http_pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+_session: Optional[requests.Session] = None
+_lock = Lock()
+
+
+def session() -> requests.Session:
+    """
+    Process-wide session for talking to PassFort, keeping connections alive
+    between requests
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _create_session()
+    return _session
+
+
+_async_client = AsyncClient() if http_async else None
+
+
+def async_client() -> Optional[AsyncClient]:
+    """
+    Client sending requests from an event loop, if enabled
+    """
+    return _async_client
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Whether a request which failed with `error` may succeed if it is sent again
+    """
+    if isinstance(error, requests.HTTPError):
+        status = error.response.status_code if error.response is not None else None
+        return status is None or status >= 500 or status == 429
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, asyncio.TimeoutError)):
+        return True
+    return aiohttp is not None and isinstance(error, aiohttp.ClientError)
+
+
+def _reset_after_fork():
+    # The pooled sockets are shared with the parent process, so the child must
+    # not use them. Drop them without closing, which would affect the parent
+    global _session, _lock
+    _session = None
+    _lock = Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _warm_up():
+    try:
+        session().head(passfort_base_url)
+    except requests.RequestException as e:
+        logger.warning(f'Could not warm up connection to {passfort_base_url}: {e}')
+
+
+def warm_up():
+    """
+    Opens a connection to PassFort in the background, ready for the first
+    callback or download
+    """
+    Thread(target=_warm_up, name='http-warm-up', daemon=True).start()
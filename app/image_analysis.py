@@ -0,0 +1,177 @@
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from threading import Lock
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence
+
+# NumPy is optional, without it images aren't analysed and documents keep the
+# demo checks. This module and its stages are imported by the worker
+# processes, so they don't depend on the rest of the app
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from app import forgery, image_quality
+from app.cache import LRUCache
+from app.image_quality import UnsupportedImage, decode_png
+
+
+class Stage(NamedTuple):
+    name: str
+    # Given the luma of the image, returns the result of the stage
+    analyse: Callable[[Any], Any]
+
+
+STAGES = (
+    Stage('quality', image_quality.measure),
+    Stage('forgery', forgery.score),
+)
+
+
+class ImageAnalysis(NamedTuple):
+    # Result of each stage, by name
+    results: Dict[str, Any]
+    # Seconds taken to decode the image and by each stage
+    timings: Dict[str, float]
+
+
+def analyse(data: bytes, stages: Sequence[Stage] = STAGES) -> Optional[ImageAnalysis]:
+    """
+    Decodes an image and runs every stage on it, or returns None if it can't
+    be decoded
+    """
+    start = time.perf_counter()
+    try:
+        luma = decode_png(data)
+    except UnsupportedImage:
+        return None
+    timings = {'decode': time.perf_counter() - start}
+
+    results = {}
+    for stage in stages:
+        start = time.perf_counter()
+        results[stage.name] = stage.analyse(luma)
+        timings[stage.name] = time.perf_counter() - start
+    return ImageAnalysis(results, timings)
+
+
+# Cached for images which can't be decoded, as None means a cache miss
+_UNDECODABLE = object()
+
+
+class AnalysisPool:
+    """
+    Analyses images in worker processes, so decoding and measuring them
+    doesn't hold the GIL on the threads serving requests. Keeps the total
+    time spent in each stage.
+
+    With a `cache_size`, the analyses of up to that many images are kept by
+    the SHA-256 of their content, so the same image attached to several
+    documents, or submitted again, is only analysed once. Images already
+    being analysed share the same future.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, stages: Sequence[Stage] = STAGES, cache_size: int = 0):
+        self.max_workers = max_workers
+        self.stages = tuple(stages)
+        self.analysed = 0
+        self.seconds: Dict[str, float] = {}
+        self.cache = LRUCache(maxsize=cache_size) if cache_size else None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = Lock()
+        self._pid = None
+        # Analyses in flight, by digest, in the process they were submitted by
+        self._pending: Dict[bytes, Future] = {}
+        self._pending_lock = Lock()
+        self._pending_pid = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pid != os.getpid():
+                # Workers are started by a server process rather than forked
+                # from this one, which has threads holding locks
+                context = multiprocessing.get_context('forkserver')
+                self._executor = ProcessPoolExecutor(self.max_workers, mp_context=context)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _record(self, future: Future):
+        if future.cancelled() or future.exception() is not None or future.result() is None:
+            return
+        with self._lock:
+            self.analysed += 1
+            for name, seconds in future.result().timings.items():
+                self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def _submit(self, data: bytes) -> Future:
+        future = self._get_executor().submit(analyse, data, self.stages)
+        future.add_done_callback(self._record)
+        return future
+
+    def _store(self, digest: bytes, future: Future):
+        with self._pending_lock:
+            self._pending.pop(digest, None)
+        # Failures aren't cached, so the image is analysed again next time
+        if not future.cancelled() and future.exception() is None:
+            result = future.result()
+            self.cache.put(digest, _UNDECODABLE if result is None else result)
+
+    def submit(self, data: bytes) -> Future:
+        if self.cache is None:
+            return self._submit(data)
+
+        digest = hashlib.sha256(data).digest()
+        with self._pending_lock:
+            if self._pending_pid != os.getpid():
+                # A forked child never sees its parent's analyses finish
+                self._pending = {}
+                self._pending_pid = os.getpid()
+            future = self._pending.get(digest)
+            if future is not None:
+                self.cache_hits += 1
+                return future
+
+            cached = self.cache.get(digest)
+            if cached is None:
+                self.cache_misses += 1
+                future = self._pending[digest] = self._submit(data)
+            else:
+                self.cache_hits += 1
+
+        if cached is not None:
+            future = Future()
+            future.set_result(None if cached is _UNDECODABLE else cached)
+        else:
+            # Outside the lock, as the callback runs straight away if the
+            # analysis has already finished
+            future.add_done_callback(partial(self._store, digest))
+        return future
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._pid = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {'images_analysed': self.analysed}
+            if self.cache is not None:
+                lookups = self.cache_hits + self.cache_misses
+                stats.update({
+                    'analysis_cache_entries': len(self.cache),
+                    'analysis_cache_hits': self.cache_hits,
+                    'analysis_cache_misses': self.cache_misses,
+                    'analysis_cache_hit_ratio': self.cache_hits / lookups if lookups else 0.0,
+                })
+            for name, seconds in self.seconds.items():
+                stats[f'{name}_seconds'] = seconds
+                stats[f'{name}_mean_seconds'] = seconds / self.analysed
+            return stats
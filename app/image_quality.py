@@ -0,0 +1,145 @@
+import struct
+import zlib
+from typing import NamedTuple
+
+# NumPy is optional, see `app.image_analysis`
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Channels in each PNG colour type
+_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+# Weights of red, green and blue in luma (ITU-R BT.601)
+_LUMA = (0.299, 0.587, 0.114)
+
+# Pixels at least this bright are glare
+GLARE_LEVEL = 250
+
+
+class UnsupportedImage(Exception):
+    pass
+
+
+class ImageQuality(NamedTuple):
+    # Variance of the Laplacian, low when the image is blurred
+    sharpness: float
+    # Mean brightness, from 0 (black) to 1 (white)
+    brightness: float
+    # Fraction of pixels which are washed out
+    glare: float
+
+
+class QualityThresholds(NamedTuple):
+    min_sharpness: float = 100.0
+    min_brightness: float = 0.2
+    max_brightness: float = 0.95
+    max_glare: float = 0.25
+
+
+def _read_chunks(data: bytes):
+    offset = len(PNG_SIGNATURE)
+    while offset + 8 <= len(data):
+        length, chunk_type = struct.unpack('>I4s', data[offset:offset + 8])
+        yield chunk_type, data[offset + 8:offset + 8 + length]
+        offset += 12 + length
+        if chunk_type == b'IEND':
+            return
+
+
+def _paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = np.abs(p - a), np.abs(p - b), np.abs(p - c)
+    return np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+
+
+def _unfilter(raw, height: int, row_bytes: int, bpp: int):
+    """
+    Reverses the PNG filter of every row. Each byte depends on the bytes to
+    its left and above, so the pixels are reconstructed one anti-diagonal at
+    a time, with every pixel on a diagonal computed at once.
+    """
+    rows = raw.reshape(height, row_bytes + 1)
+    filters = rows[:, 0].astype(np.int16)
+    if filters.max() > 4:
+        raise UnsupportedImage('PNG has an unknown filter type')
+    filtered = rows[:, 1:].astype(np.int16)
+
+    # Padded with a row above and a pixel to the left, which read as zero
+    out = np.zeros((height + 1, row_bytes + bpp), dtype=np.int16)
+    width = row_bytes // bpp
+    channels = np.arange(bpp)
+
+    for diagonal in range(height + width - 1):
+        row = np.arange(max(0, diagonal - width + 1), min(height, diagonal + 1))[:, None]
+        x = (diagonal - row) * bpp + channels
+        a = out[row + 1, x]
+        b = out[row, x + bpp]
+        c = out[row, x]
+        predicted = np.choose(filters[row], [np.zeros_like(a), a, b, (a + b) // 2, _paeth(a, b, c)])
+        out[row + 1, x + bpp] = (filtered[row, x] + predicted) & 0xFF
+
+    return out[1:, bpp:]
+
+
+def decode_png(data: bytes):
+    """
+    Decodes a non-interlaced PNG into an array of luma values from 0 to 255
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        raise UnsupportedImage('Not a PNG')
+
+    header = None
+    palette = None
+    compressed = []
+    for chunk_type, chunk in _read_chunks(data):
+        if chunk_type == b'IHDR':
+            header = struct.unpack('>IIBBBBB', chunk)
+        elif chunk_type == b'PLTE':
+            palette = np.frombuffer(chunk, dtype=np.uint8).reshape(-1, 3)
+        elif chunk_type == b'IDAT':
+            compressed.append(chunk)
+    if header is None:
+        raise UnsupportedImage('PNG has no header')
+
+    width, height, bit_depth, colour_type, _, _, interlace = header
+    if colour_type not in _CHANNELS or bit_depth not in (8, 16) or interlace:
+        raise UnsupportedImage('Only 8 or 16 bit, non-interlaced PNGs are supported')
+    if colour_type == 3 and palette is None:
+        raise UnsupportedImage('PNG has no palette')
+
+    channels = _CHANNELS[colour_type]
+    bpp = channels * bit_depth // 8
+    try:
+        raw = np.frombuffer(zlib.decompress(b''.join(compressed)), dtype=np.uint8)
+    except zlib.error as e:
+        raise UnsupportedImage(f'PNG data is corrupt: {e}')
+    if raw.size != height * (width * bpp + 1):
+        raise UnsupportedImage('PNG data is truncated')
+
+    pixels = _unfilter(raw, height, width * bpp, bpp).reshape(height, width, bpp)
+    if bit_depth == 16:
+        # The most significant byte is enough to measure quality
+        pixels = pixels[:, :, ::2]
+    if colour_type == 3:
+        pixels = palette[pixels[:, :, 0]]
+        channels = 3
+
+    pixels = pixels.astype(np.float32)
+    if channels >= 3:
+        return pixels[:, :, :3] @ np.array(_LUMA, dtype=np.float32)
+    return pixels[:, :, 0]
+
+
+def measure(luma) -> ImageQuality:
+    laplacian = (
+        luma[:-2, 1:-1] + luma[2:, 1:-1] + luma[1:-1, :-2] + luma[1:-1, 2:]
+        - 4 * luma[1:-1, 1:-1]
+    )
+    return ImageQuality(
+        sharpness=float(laplacian.var()),
+        brightness=float(luma.mean() / 255),
+        glare=float((luma >= GLARE_LEVEL).mean()),
+    )
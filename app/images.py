@@ -0,0 +1,208 @@
+from tempfile import SpooledTemporaryFile
+from threading import Event, Lock
+from typing import Dict, Optional, Union
+
+from app.startup import image_spool_size, image_max_bytes
+
+# Leading bytes of each format we accept
+MAGIC_BYTES = {
+    b'\x89PNG\r\n\x1a\n': 'image/png',
+    b'\xff\xd8\xff': 'image/jpeg',
+    b'%PDF-': 'application/pdf',
+}
+_SNIFF_LENGTH = max(len(magic) for magic in MAGIC_BYTES)
+
+
+class ImageRejected(Exception):
+    pass
+
+
+def sniff_media_type(head: bytes) -> Optional[str]:
+    for magic, media_type in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return media_type
+    return None
+
+
+class ByteBudget:
+    """
+    Bytes that all the downloads of one request may use between them. It is
+    also how downloads in flight are told to stop.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self.cancelled = False
+        self._lock = Lock()
+
+    def take(self, size: int):
+        """
+        Uses `size` bytes, which are counted even when it raises, so they are
+        always given back by `release`
+        """
+        with self._lock:
+            self.used += size
+            if self.cancelled:
+                raise ImageRejected('Download cancelled')
+            if self.used > self.max_bytes:
+                raise ImageRejected(f'Images are larger than {self.max_bytes} bytes in total')
+
+    def release(self, size: int):
+        with self._lock:
+            self.used -= size
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class ImageCharge:
+    """
+    Bytes of one image charged to a budget, when more than one attempt at
+    downloading it may be in flight at once. As only one of them is kept, the
+    budget is charged for the largest rather than all of them, and once the
+    winner is known for exactly that.
+    """
+
+    def __init__(self, budget: ByteBudget):
+        self.budget = budget
+        self.charged = 0
+        self._attempts: Dict['_AttemptCharge', int] = {}
+        self._settled = False
+        self._lock = Lock()
+
+    def attempt(self) -> '_AttemptCharge':
+        """
+        Budget for one attempt, to give to its `ImageWriter`
+        """
+        attempt = _AttemptCharge(self)
+        with self._lock:
+            self._attempts[attempt] = 0
+        return attempt
+
+    def settle(self, size: int):
+        """
+        Charges the size of the attempt which won, ignoring any others from now on
+        """
+        with self._lock:
+            self._settled = True
+            self._charge(size)
+
+    def _update(self, attempt: '_AttemptCharge', size: int):
+        with self._lock:
+            if self._settled:
+                return
+            self._attempts[attempt] += size
+            self._charge(max(self._attempts.values()))
+
+    def _charge(self, size: int):
+        change = size - self.charged
+        self.charged = size
+        if change < 0:
+            self.budget.release(-change)
+        elif change > 0:
+            self.budget.take(change)
+
+
+class _AttemptCharge:
+    def __init__(self, charge: ImageCharge):
+        self.charge = charge
+
+    def take(self, size: int):
+        self.charge._update(self, size)
+
+    def release(self, size: int):
+        self.charge._update(self, -size)
+
+
+class DownloadedImage:
+    """
+    Image held in memory if small, or in a temporary file otherwise
+    """
+
+    def __init__(self, file: SpooledTemporaryFile, size: int, media_type: str):
+        self.file = file
+        self.size = size
+        self.media_type = media_type
+
+    @classmethod
+    def from_bytes(cls, content: bytes) -> 'DownloadedImage':
+        writer = ImageWriter()
+        writer.write(content)
+        return writer.finish()
+
+    def read(self) -> bytes:
+        self.file.seek(0)
+        return self.file.read()
+
+    def close(self):
+        self.file.close()
+
+
+class ImageWriter:
+    """
+    Receives an image as it is downloaded, rejecting it as soon as it is too
+    large or its first bytes show it isn't an image format we accept
+    """
+
+    def __init__(self, budget: Optional[Union[ByteBudget, _AttemptCharge]] = None, max_bytes: int = image_max_bytes,
+                 cancelled: Optional[Event] = None):
+        self.budget = budget
+        self.max_bytes = max_bytes
+        self.cancelled = cancelled
+        self.size = 0
+        self.taken = 0
+        self.media_type = None
+        self._file = SpooledTemporaryFile(max_size=image_spool_size)
+
+    def expect(self, content_length: Optional[str]):
+        """
+        Rejects the image before it is downloaded if its declared length is too large
+        """
+        if content_length is not None and int(content_length) > self.max_bytes:
+            self._reject(f'Image is larger than {self.max_bytes} bytes')
+
+    def _reject(self, message: str):
+        self._file.close()
+        raise ImageRejected(message)
+
+    def write(self, chunk: bytes):
+        if self.cancelled is not None and self.cancelled.is_set():
+            self._reject('Download cancelled')
+
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            self._reject(f'Image is larger than {self.max_bytes} bytes')
+
+        if self.budget is not None:
+            try:
+                self.taken += len(chunk)
+                self.budget.take(len(chunk))
+            except ImageRejected:
+                self._file.close()
+                raise
+
+        self._file.write(chunk)
+        if self.media_type is None and self.size >= _SNIFF_LENGTH:
+            self._sniff()
+
+    def _sniff(self):
+        self._file.seek(0)
+        self.media_type = sniff_media_type(self._file.read(_SNIFF_LENGTH))
+        self._file.seek(0, 2)
+        if self.media_type is None:
+            self._reject('Image is not a PNG, JPEG or PDF')
+
+    def discard(self):
+        """
+        Abandons the image, returning the bytes it used to the budget
+        """
+        if self.budget is not None:
+            self.budget.release(self.taken)
+            self.taken = 0
+        self._file.close()
+
+    def finish(self) -> DownloadedImage:
+        if self.media_type is None:
+            self._sniff()
+        return DownloadedImage(self._file, self.size, self.media_type)
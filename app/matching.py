@@ -0,0 +1,161 @@
+import re
+import unicodedata
+from typing import Dict, Optional, Sequence, Tuple
+
+from app.api import CheckedDocumentField, CheckedDocumentFieldResult, PersonalDetails
+from app.cache import LRUCache
+
+# Letters which don't decompose into a base letter and combining marks
+TRANSLITERATIONS = str.maketrans({
+    'ß': 'ss', 'æ': 'ae', 'Æ': 'AE', 'œ': 'oe', 'Œ': 'OE', 'ø': 'o', 'Ø': 'O', 'ł': 'l', 'Ł': 'L',
+    'đ': 'd', 'Đ': 'D', 'ð': 'd', 'Ð': 'D', 'þ': 'th', 'Þ': 'TH', 'ı': 'i', 'ħ': 'h', 'Ħ': 'H',
+})
+# Apostrophes are dropped, so O'Brien matches OBrien, and other punctuation
+# separates words, so Smith-Jones matches Smith Jones
+_APOSTROPHES = re.compile(r"['’`ʼ]")
+_SEPARATORS = re.compile(r'[^a-z0-9]+')
+
+_normalized_names = LRUCache(maxsize=4096)
+
+
+def split_words(text: str) -> Tuple[str, ...]:
+    """
+    Words of some text without case, accents or punctuation
+    """
+    decomposed = unicodedata.normalize('NFKD', text.translate(TRANSLITERATIONS))
+    ascii_text = ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+    return tuple(word for word in _SEPARATORS.split(_APOSTROPHES.sub('', ascii_text)) if word)
+
+
+def normalize_name(name: str) -> Tuple[str, ...]:
+    """
+    Words of a name, cached as the same names are compared across many documents
+    """
+    words = _normalized_names.get(name)
+    if words is None:
+        words = split_words(name)
+        _normalized_names.put(name, words)
+    return words
+
+
+def max_edits(word: str) -> int:
+    """
+    Typos tolerated in a word, none in short words where they change the name
+    """
+    if len(word) < 5:
+        return 0
+    return 1 if len(word) < 9 else 2
+
+
+def within_edits(a: str, b: str, limit: int) -> bool:
+    """
+    Whether the Levenshtein distance between `a` and `b` is at most `limit`,
+    only filling the band of the table which could stay within it
+    """
+    if abs(len(a) - len(b)) > limit:
+        return False
+    if a == b:
+        return True
+
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        current = [i] + [limit + 1] * len(b)
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char != b[j - 1]),
+            )
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+def _words_match(a: str, b: str) -> bool:
+    # An initial matches any name starting with it
+    if len(a) == 1 or len(b) == 1:
+        return a[0] == b[0]
+    return within_edits(a, b, max_edits(max(a, b, key=len)))
+
+
+def _result(matched: Optional[bool]) -> str:
+    if matched is None:
+        return CheckedDocumentFieldResult.CHECK_UNCERTAIN
+    return CheckedDocumentFieldResult.CHECK_VALID if matched else CheckedDocumentFieldResult.CHECK_INVALID
+
+
+def match_family_name(expected: Optional[str], extracted: Optional[str]) -> str:
+    if not expected or not extracted:
+        return _result(None)
+    expected_name, extracted_name = ' '.join(normalize_name(expected)), ' '.join(normalize_name(extracted))
+    return _result(within_edits(expected_name, extracted_name, max_edits(expected_name)))
+
+
+def match_given_names(expected: Optional[Sequence[str]], extracted: Optional[Sequence[str]]) -> str:
+    """
+    Every word of the shorter list of given names must match a different word
+    of the other, in any order, so a missing middle name still matches
+    """
+    expected_words = [word for name in expected or () for word in normalize_name(name)]
+    extracted_words = [word for name in extracted or () for word in normalize_name(name)]
+    if not expected_words or not extracted_words:
+        return _result(None)
+
+    shorter, longer = sorted((expected_words, extracted_words), key=len)
+    # Match full words before initials, so an initial can't take a word
+    # which a full name needed
+    unmatched = list(longer)
+    for word in sorted(shorter, key=len, reverse=True):
+        match = next((other for other in unmatched if _words_match(word, other)), None)
+        if match is None:
+            return _result(False)
+        unmatched.remove(match)
+    return _result(True)
+
+
+def _date_parts(value: str) -> Optional[Tuple[int, ...]]:
+    try:
+        return tuple(int(part) for part in value.split('-'))
+    except ValueError:
+        return None
+
+
+def match_dob(expected: Optional[str], extracted: Optional[str]) -> str:
+    """
+    Compares dates of birth which may each be just a year, or year and month,
+    by the parts they both have
+    """
+    expected_parts = _date_parts(expected) if expected else None
+    extracted_parts = _date_parts(extracted) if extracted else None
+    if not expected_parts or not extracted_parts:
+        return _result(None)
+    common = min(len(expected_parts), len(extracted_parts))
+    return _result(expected_parts[:common] == extracted_parts[:common])
+
+
+def match_personal_details(expected: PersonalDetails, extracted: Optional[PersonalDetails]) -> Dict[str, str]:
+    """
+    Checks the personal details extracted from a document against those of
+    the entity being checked, giving the result of each field the entity has
+    """
+    expected_name = expected.name
+    extracted_name = extracted.name if extracted is not None else None
+
+    results = {}
+    if expected.dob:
+        results[CheckedDocumentField.FIELD_DOB] = match_dob(
+            expected.dob,
+            extracted.dob if extracted is not None else None,
+        )
+    if expected_name is not None and expected_name.family_name:
+        results[CheckedDocumentField.FIELD_FAMILY_NAME] = match_family_name(
+            expected_name.family_name,
+            extracted_name.family_name if extracted_name is not None else None,
+        )
+    if expected_name is not None and expected_name.given_names:
+        results[CheckedDocumentField.FIELD_GIVEN_NAMES] = match_given_names(
+            expected_name.given_names,
+            extracted_name.given_names if extracted_name is not None else None,
+        )
+    return results
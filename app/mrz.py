@@ -0,0 +1,263 @@
+from datetime import date
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# NumPy is optional, without it check digits are validated one document at a time
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from app.api import CheckedDocumentField, CheckedDocumentFieldResult, DocumentData, FieldCheckResult, \
+    FullName, PersonalDetails
+
+FILLER = '<'
+WEIGHTS = (7, 3, 1)
+
+# Value of every character in a check digit calculation, and -1 for
+# characters which can't appear in an MRZ
+CHARACTER_VALUES = [-1] * 256
+for _i, _c in enumerate('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'):
+    CHARACTER_VALUES[ord(_c)] = _i
+CHARACTER_VALUES[ord(FILLER)] = 0
+_VALUE_TABLE = np.array(CHARACTER_VALUES, dtype=np.int64) if np is not None else None
+
+
+class MRZFormat(NamedTuple):
+    name: str
+    lines: int
+    length: int
+    # Spans of each field in the lines joined together
+    fields: Dict[str, Tuple[int, int]]
+    # Spans covered by each check digit, and the position of the digit
+    checks: Tuple[Tuple[Tuple[Tuple[int, int], ...], int], ...]
+
+
+def _td1(line: int, start: int, end: int) -> Tuple[int, int]:
+    return line * 30 + start, line * 30 + end
+
+
+# ICAO 9303 parts 4 (TD3, passports), 5 (TD1, ID cards) and 6 (TD2)
+TD1 = MRZFormat('TD1', 3, 30, {
+    'document_code': _td1(0, 0, 2),
+    'issuing_country': _td1(0, 2, 5),
+    'number': _td1(0, 5, 14),
+    'dob': _td1(1, 0, 6),
+    'gender': _td1(1, 7, 8),
+    'expiry': _td1(1, 8, 14),
+    'nationality': _td1(1, 15, 18),
+    'name': _td1(2, 0, 30),
+}, (
+    ((_td1(0, 5, 14),), 14),
+    ((_td1(1, 0, 6),), 36),
+    ((_td1(1, 8, 14),), 44),
+    ((_td1(0, 5, 30), _td1(1, 0, 7), _td1(1, 8, 15), _td1(1, 18, 29)), 59),
+))
+
+TD2 = MRZFormat('TD2', 2, 36, {
+    'document_code': (0, 2),
+    'issuing_country': (2, 5),
+    'name': (5, 36),
+    'number': (36, 45),
+    'nationality': (46, 49),
+    'dob': (49, 55),
+    'gender': (56, 57),
+    'expiry': (57, 63),
+}, (
+    (((36, 45),), 45),
+    (((49, 55),), 55),
+    (((57, 63),), 63),
+    (((36, 46), (49, 56), (57, 71)), 71),
+))
+
+TD3 = MRZFormat('TD3', 2, 44, {
+    'document_code': (0, 2),
+    'issuing_country': (2, 5),
+    'name': (5, 44),
+    'number': (44, 53),
+    'nationality': (54, 57),
+    'dob': (57, 63),
+    'gender': (64, 65),
+    'expiry': (65, 71),
+}, (
+    (((44, 53),), 53),
+    (((57, 63),), 63),
+    (((65, 71),), 71),
+    (((72, 86),), 86),
+    (((44, 54), (57, 64), (65, 87)), 87),
+))
+
+FORMATS = (TD1, TD2, TD3)
+
+
+def _positions(spans: Sequence[Tuple[int, int]]) -> List[int]:
+    return [i for start, end in spans for i in range(start, end)]
+
+
+# Positions and weights of the characters under each check digit, computed
+# once so each check is a single multiplication over the whole batch
+_CHECK_TABLES = {
+    mrz_format.name: [
+        (_positions(spans), [WEIGHTS[i % 3] for i in range(len(_positions(spans)))], digit)
+        for spans, digit in mrz_format.checks
+    ]
+    for mrz_format in FORMATS
+}
+_ARRAY_CHECK_TABLES = {
+    name: [(np.array(positions), np.array(weights), digit) for positions, weights, digit in checks]
+    for name, checks in _CHECK_TABLES.items()
+} if np is not None else None
+
+
+def check_digit(value: str) -> int:
+    return sum(CHARACTER_VALUES[ord(c)] * WEIGHTS[i % 3] for i, c in enumerate(value)) % 10
+
+
+class MRZ(NamedTuple):
+    format: str
+    document_code: str
+    issuing_country: str
+    number: str
+    nationality: str
+    dob: Optional[date]
+    gender: Optional[str]
+    expiry: Optional[date]
+    family_name: str
+    given_names: List[str]
+    # Whether every check digit matched
+    valid: bool
+
+    def field_check(self) -> FieldCheckResult:
+        return FieldCheckResult({
+            'field': CheckedDocumentField.FIELD_MRZ,
+            'result': CheckedDocumentFieldResult.CHECK_VALID if self.valid else CheckedDocumentFieldResult.CHECK_INVALID,
+        })
+
+    def fill(self, data: DocumentData):
+        """
+        Fills in the fields of `data` which weren't extracted some other way
+        """
+        data.number = data.number or self.number or None
+        data.expiry = data.expiry or self.expiry
+        data.issuing_country = data.issuing_country or self.issuing_country or None
+
+        # Copied, as the extracted details may be shared with the check input
+        details = PersonalDetails(data.personal_details.to_primitive() if data.personal_details else {})
+        if details.name is None and self.family_name:
+            details.name = FullName({'family_name': self.family_name, 'given_names': self.given_names or None})
+        details.dob = details.dob or (self.dob.isoformat() if self.dob else None)
+        details.nationality = details.nationality or self.nationality or None
+        details.gender = details.gender or self.gender
+        data.personal_details = details
+
+
+def _clean(value: str) -> str:
+    return value.replace(FILLER, ' ').strip()
+
+
+def _parse_date(value: str, today: date, past: bool) -> Optional[date]:
+    """
+    Dates of birth are in the past, expiry dates within 50 years of today
+    """
+    try:
+        year, month, day = int(value[0:2]), int(value[2:4]), int(value[4:6])
+    except ValueError:
+        return None
+
+    century = today.year // 100 * 100
+    full_year = century + year
+    if past and full_year > today.year:
+        full_year -= 100
+    elif not past and full_year < today.year - 50:
+        full_year += 100
+    try:
+        return date(full_year, month, day)
+    except ValueError:
+        return None
+
+
+def _parse_fields(mrz_format: MRZFormat, joined: str, valid: bool, today: date) -> MRZ:
+    def field(name: str) -> str:
+        start, end = mrz_format.fields[name]
+        return joined[start:end]
+
+    surname, _, given_names = field('name').partition(FILLER * 2)
+    gender = field('gender')
+    return MRZ(
+        format=mrz_format.name,
+        document_code=_clean(field('document_code')),
+        issuing_country=_clean(field('issuing_country')),
+        number=_clean(field('number')),
+        nationality=_clean(field('nationality')),
+        dob=_parse_date(field('dob'), today, past=True),
+        gender=gender if gender in ('M', 'F') else None,
+        expiry=_parse_date(field('expiry'), today, past=False),
+        family_name=_clean(surname),
+        given_names=[name for name in _clean(given_names).split(' ') if name],
+        valid=valid,
+    )
+
+
+def _format_of(lines: Sequence[Optional[str]]) -> Optional[MRZFormat]:
+    lines = [line for line in lines if line]
+    for mrz_format in FORMATS:
+        if len(lines) == mrz_format.lines and all(len(line) == mrz_format.length for line in lines):
+            return mrz_format
+    return None
+
+
+def _validate(mrz_format: MRZFormat, joined: List[str]) -> Tuple[List[bool], List[bool]]:
+    """
+    Checks a batch of MRZs of one format at once, returning whether each
+    contains only MRZ characters, and whether all its check digits match
+    """
+    if np is None:
+        values = [[CHARACTER_VALUES[ord(c)] for c in mrz] for mrz in joined]
+        well_formed = [min(mrz) >= 0 for mrz in values]
+        valid = [
+            ok and all(
+                sum(mrz[p] * w for p, w in zip(positions, weights)) % 10 == mrz[digit]
+                for positions, weights, digit in _CHECK_TABLES[mrz_format.name]
+            )
+            for mrz, ok in zip(values, well_formed)
+        ]
+        return well_formed, valid
+
+    codes = np.frombuffer(''.join(joined).encode('latin-1'), dtype=np.uint8)
+    values = _VALUE_TABLE[codes].reshape(len(joined), -1)
+    well_formed = (values >= 0).all(axis=1)
+    valid = well_formed.copy()
+    for positions, weights, digit in _ARRAY_CHECK_TABLES[mrz_format.name]:
+        valid &= values[:, positions] @ weights % 10 == values[:, digit]
+    return well_formed.tolist(), valid.tolist()
+
+
+def parse_batch(documents: Sequence[Sequence[Optional[str]]], today: Optional[date] = None) -> List[Optional[MRZ]]:
+    """
+    Parses the MRZ lines of each document, validating the check digits of
+    all the documents of each format in one pass. Documents whose lines
+    don't match a format, or contain characters that can't appear in an
+    MRZ, give None.
+    """
+    today = today or date.today()
+    results: List[Optional[MRZ]] = [None] * len(documents)
+
+    batches: Dict[str, List[Tuple[int, str]]] = {}
+    for i, lines in enumerate(documents):
+        mrz_format = _format_of(lines)
+        if mrz_format is None:
+            continue
+        joined = ''.join(line.upper() for line in lines if line)
+        if not all(ord(c) < 256 for c in joined):
+            continue
+        batches.setdefault(mrz_format.name, []).append((i, joined))
+
+    for mrz_format in FORMATS:
+        batch = batches.get(mrz_format.name)
+        if not batch:
+            continue
+        well_formed, valid = _validate(mrz_format, [joined for _, joined in batch])
+        for (i, joined), ok, checked in zip(batch, well_formed, valid):
+            if ok:
+                results[i] = _parse_fields(mrz_format, joined, checked, today)
+
+    return results
@@ -0,0 +1,162 @@
+import logging
+import os
+import sqlite3
+from threading import Condition, Event, Thread
+from time import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PendingCallback(NamedTuple):
+    id: int
+    provider_id: str
+    reference: str
+
+
+class _Write:
+    def __init__(self, fn: Callable[[sqlite3.Connection], Any]):
+        self.fn = fn
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+    def wait(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Outbox:
+    """
+    Records callbacks in a SQLite database until they have been delivered, so
+    that callbacks pending in a worker that dies are sent by the next one.
+
+    All writes go through a single thread which commits whatever has queued
+    up since its last commit in one transaction, so concurrent requests share
+    the cost of syncing to disk.
+    """
+
+    def __init__(self, path: str, max_batch: int = 256):
+        self.path = path
+        self.max_batch = max_batch
+
+        self.commits = 0
+        self.writes = 0
+
+        self._queue: List[_Write] = []
+        self._cond = Condition()
+        self._pid = None
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        # Commits survive the process being killed, only a power loss can
+        # lose the most recent ones
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('''
+            CREATE TABLE IF NOT EXISTS callbacks (
+                id INTEGER PRIMARY KEY,
+                provider_id TEXT NOT NULL,
+                reference TEXT NOT NULL,
+                owner INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            )
+        ''')
+        return connection
+
+    def _submit(self, fn: Callable[[sqlite3.Connection], Any]) -> _Write:
+        write = _Write(fn)
+        with self._cond:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                Thread(target=self._run, name='callback-outbox', daemon=True).start()
+
+            self._queue.append(write)
+            self._cond.notify()
+        return write
+
+    def _run(self):
+        connection = self._connect()
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue)
+                batch = self._queue[:self.max_batch]
+                del self._queue[:self.max_batch]
+
+            try:
+                connection.execute('BEGIN')
+                for write in batch:
+                    write.result = write.fn(connection)
+                connection.execute('COMMIT')
+            except Exception as e:
+                logger.exception('Failed to write to the callback outbox')
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+                for write in batch:
+                    write.error = e
+            else:
+                self.commits += 1
+                self.writes += len(batch)
+
+            for write in batch:
+                write.done.set()
+
+    def record(self, provider_id: str, reference: str) -> int:
+        """
+        Records a callback, returning its id once it has been committed
+        """
+        return self._submit(lambda connection: connection.execute(
+            'INSERT INTO callbacks (provider_id, reference, owner, created_at) VALUES (?, ?, ?, ?)',
+            (provider_id, reference, os.getpid(), time()),
+        ).lastrowid).wait()
+
+    def delivered(self, callback_id: int):
+        """
+        Removes a delivered callback, without waiting for the commit. If that
+        is lost, the callback will be sent again.
+        """
+        self._submit(lambda connection: connection.execute('DELETE FROM callbacks WHERE id = ?', (callback_id,)))
+
+    def claim_orphans(self) -> List[PendingCallback]:
+        """
+        Takes over the callbacks recorded by processes which have since died
+        """
+        def claim(connection: sqlite3.Connection) -> List[PendingCallback]:
+            owners = [owner for owner, in connection.execute('SELECT DISTINCT owner FROM callbacks')]
+            dead = [owner for owner in owners if owner != os.getpid() and not _is_alive(owner)]
+            if not dead:
+                return []
+
+            placeholders = ', '.join('?' * len(dead))
+            rows = connection.execute(
+                f'SELECT id, provider_id, reference FROM callbacks WHERE owner IN ({placeholders}) ORDER BY id',
+                dead,
+            ).fetchall()
+            connection.execute(f'UPDATE callbacks SET owner = ? WHERE owner IN ({placeholders})', [os.getpid(), *dead])
+            return [PendingCallback(*row) for row in rows]
+
+        return self._submit(claim).wait()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits for everything written so far to be committed
+        """
+        return self._submit(lambda connection: None).done.wait(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'outbox_commits': self.commits,
+            'outbox_writes': self.writes,
+        }
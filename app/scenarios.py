@@ -0,0 +1,251 @@
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from app.api import CheckedDocumentField, CheckedDocumentFieldResult, DatedAddress, DemoFailure, DemoResultDescriptor, \
+    DemoResultType, DemoScope, DocumentCategory, DocumentData, DocumentResult, FieldCheckResult, IndividualData, \
+    DEMO_RESULT_DESCRIPTORS
+from app.address_matching import match_address
+from app.matching import match_personal_details
+from app.shared import create_demo_field_checks, create_demo_forgery_check, create_demo_image_check
+
+
+def _different_dob(dob: Optional[str]) -> str:
+    """
+    A full date of birth in the year after the entity's, which can't match
+    however much of the entity's date of birth is known
+    """
+    try:
+        year = int(dob[:4])
+    except (TypeError, ValueError):
+        return '2000-01-01'
+    month_day = dob[4:] if len(dob) == len('2000-01-01') else '-01-01'
+    return f'{year + 1:04}{month_day}'
+
+
+class Scenario(NamedTuple):
+    """
+    How a document that a demo failure applies to is reported
+    """
+    document_type_passed: bool = True
+    image_checks_passed: bool = True
+    forgery_checks_passed: bool = True
+    invalid_fields: Tuple[str, ...] = ()
+    uncertain_fields: Tuple[str, ...] = ()
+    # Changes to the extracted personal details, keyed by dotted path.
+    # Callables are given the entity's value and return the extracted one
+    overrides: Mapping[str, Any] = {}
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    DemoFailure.ALL_PASS: Scenario(),
+    DemoFailure.ERROR: Scenario(),
+    DemoFailure.UNSUPPORTED_DOCUMENT_TYPE: Scenario(
+        document_type_passed=False,
+        image_checks_passed=False,
+    ),
+    DemoFailure.IMAGE_CHECK_FAILURE: Scenario(image_checks_passed=False),
+    DemoFailure.FORGERY_CHECK_FAILURE: Scenario(forgery_checks_passed=False),
+    DemoFailure.NAME_FIELD_DIFFERENT: Scenario(
+        invalid_fields=(CheckedDocumentField.FIELD_FAMILY_NAME, CheckedDocumentField.FIELD_GIVEN_NAMES),
+        overrides={
+            'name.family_name': 'NOT-THE-ORIGINAL-FAMILY-NAME',
+            'name.given_names': ['NOT-THE-ORIGINAL-GIVEN-NAMES'],
+        },
+    ),
+    DemoFailure.NAME_FIELD_UNREADABLE: Scenario(
+        uncertain_fields=(CheckedDocumentField.FIELD_FAMILY_NAME, CheckedDocumentField.FIELD_GIVEN_NAMES),
+        overrides={'name': None},
+    ),
+    DemoFailure.DOB_FIELD_DIFFERENT: Scenario(
+        invalid_fields=(CheckedDocumentField.FIELD_DOB,),
+        overrides={'dob': _different_dob},
+    ),
+    DemoFailure.DOB_FIELD_UNREADABLE: Scenario(
+        uncertain_fields=(CheckedDocumentField.FIELD_DOB,),
+        overrides={'dob': None},
+    ),
+}
+
+
+# Name of each category in the references of its demo files
+CATEGORY_FILE_NAMES = {category: category[len('PROOF_OF_'):] for category in DocumentCategory.choices}
+
+
+class DocumentOutcome(NamedTuple):
+    result: DocumentResult
+    overrides: Mapping[str, Any]
+    file_reference: str
+
+
+class CompiledScenario(NamedTuple):
+    # Documents to produce, for products which generate their own
+    categories: Tuple[str, ...]
+    outcomes: Mapping[Optional[str], DocumentOutcome]
+
+    def outcome(self, category: Optional[str]) -> DocumentOutcome:
+        return self.outcomes[category]
+
+
+def create_scenario_result(provider_name: str, scenario: Scenario) -> DocumentResult:
+    if not scenario.document_type_passed:
+        return DocumentResult({
+            'all_passed': False,
+            'document_type_passed': False,
+            'error_reason': 'Unsupported document type',
+            'image_checks_passed': scenario.image_checks_passed,
+            'provider_name': provider_name,
+        })
+
+    # Only generate field checks if the document would be valid
+    field_checks = []
+    if scenario.image_checks_passed and scenario.forgery_checks_passed:
+        field_checks = create_demo_field_checks(scenario.invalid_fields, scenario.uncertain_fields)
+
+    field_checks_passed = all(fc.result is CheckedDocumentFieldResult.CHECK_VALID for fc in field_checks)
+    all_passed = scenario.image_checks_passed and scenario.forgery_checks_passed and field_checks_passed
+
+    return DocumentResult({
+        'all_passed': all_passed,
+        'document_type_passed': True,
+        'field_checks': field_checks,
+        'forgery_checks': [create_demo_forgery_check(scenario.forgery_checks_passed)],
+        'forgery_checks_passed': scenario.forgery_checks_passed,
+        'image_checks': [create_demo_image_check(scenario.image_checks_passed)],
+        'image_checks_passed': scenario.image_checks_passed,
+        'provider_name': provider_name,
+    })
+
+
+class ScenarioEngine:
+    """
+    Compiles the scenario table for a product into a lookup from each demo
+    result to the outcome for every document category.
+
+    The failure in a demo result applies to the documents of its category,
+    or to all documents if it doesn't name one; other documents pass.
+    """
+
+    def __init__(self, provider_name: str, any_result: str, categories: Sequence[str] = ()):
+        self.provider_name = provider_name
+        self.categories = tuple(categories)
+
+        results = {
+            failure: create_scenario_result(provider_name, scenario).freeze()
+            for failure, scenario in SCENARIOS.items()
+        }
+        self._compiled = {
+            demo_result: self._compile(descriptor, results)
+            for demo_result, descriptor in DEMO_RESULT_DESCRIPTORS.items()
+        }
+        self._compiled[DemoResultType.ANY] = self._compiled[any_result]
+
+    def _compile(self, descriptor: DemoResultDescriptor, results: Mapping[str, DocumentResult]) -> CompiledScenario:
+        if descriptor.scope == DemoScope.ALL_CATEGORIES:
+            categories = self.categories
+        elif descriptor.scope == DemoScope.SINGLE_CATEGORY:
+            categories = (descriptor.category,)
+        else:
+            categories = ()
+
+        outcomes = {}
+        for category in (None, *DocumentCategory.choices):
+            targeted = descriptor.category is None or descriptor.category == category
+            failure = descriptor.failure if targeted else DemoFailure.ALL_PASS
+            result = results[failure]
+
+            file_name = CATEGORY_FILE_NAMES.get(category, 'DOCUMENT')
+            file_status = 'PASS' if result.all_passed else 'FAIL'
+            outcomes[category] = DocumentOutcome(
+                result=result,
+                overrides=SCENARIOS[failure].overrides,
+                file_reference=f'DUMMY_FILE_{file_name}_{file_status}',
+            )
+
+        return CompiledScenario(categories, outcomes)
+
+    def lookup(self, demo_result: Optional[str], default: Optional[str] = None) -> Optional[CompiledScenario]:
+        compiled = self._compiled.get(demo_result)
+        if compiled is None and default is not None:
+            return self._compiled[default]
+        return compiled
+
+
+def _overlay(base: Mapping[str, Any], overrides: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Applies the overrides on top of `base` without modifying it. Only the
+    dicts along each overridden path are copied, everything else is shared.
+    """
+    result = dict(base)
+    for path, value in overrides.items():
+        *parents, key = path.split('.')
+        target = result
+        for parent in parents:
+            if target.get(parent) is None:
+                break
+            target[parent] = dict(target[parent])
+            target = target[parent]
+        else:
+            target[key] = value(target.get(key)) if callable(value) else value
+    return result
+
+
+class ExtractedDataBuilder:
+    """
+    Builds the data "extracted" from each document from the entity's own
+    details. The entity's details are exported at most once and shared by
+    every document, with each document's overrides overlaid on top.
+    """
+
+    def __init__(self, entity_data: IndividualData):
+        # Extract only one address from the history
+        current_address = entity_data.get_current_address()
+        self._current_address = current_address
+        self._address_history = [DatedAddress({'address': current_address})] if current_address else []
+        self._personal_details = entity_data.personal_details
+        self._base_details = None
+
+    def build(self, outcome: DocumentOutcome) -> DocumentData:
+        personal_details = self._personal_details
+        if personal_details is not None and outcome.overrides:
+            if self._base_details is None:
+                self._base_details = personal_details.to_primitive()
+            personal_details = _overlay(self._base_details, outcome.overrides)
+
+        data = DocumentData({
+            'address_history': self._address_history,
+            'personal_details': personal_details,
+            'result': outcome.result,
+        })
+        data.result = self._check_fields(outcome.result, data)
+        return data
+
+    def _check_fields(self, result: DocumentResult, data: DocumentData) -> DocumentResult:
+        """
+        Replaces the demo results of the fields which can be compared with
+        the entity's details by the results of comparing them
+        """
+        if not result.field_checks:
+            return result
+
+        matched = {}
+        if self._personal_details is not None:
+            matched.update(match_personal_details(self._personal_details, data.personal_details))
+        address = match_address(self._current_address, data.address_history) if self._current_address else None
+        if address is not None:
+            matched[CheckedDocumentField.FIELD_ADDRESS] = address
+        # Keep sharing the demo result when the comparison agrees with it
+        if all(matched.get(check.field, check.result) == check.result for check in result.field_checks):
+            return result
+
+        field_checks = [
+            FieldCheckResult({'field': check.field, 'result': matched.get(check.field, check.result)})
+            for check in result.field_checks
+        ]
+        checked = DocumentResult(result.to_primitive())
+        checked.field_checks = field_checks
+        checked.all_passed = bool(result.image_checks_passed and result.forgery_checks_passed) and \
+            all(check.result == CheckedDocumentFieldResult.CHECK_VALID for check in field_checks)
+        return checked
+
+
+def create_extracted_data(entity_data: IndividualData, outcome: DocumentOutcome) -> DocumentData:
+    return ExtractedDataBuilder(entity_data).build(outcome)
@@ -0,0 +1,182 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+from concurrent.futures import Future
+from threading import Condition, Thread
+from time import monotonic
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from app.dispatch import CallbackDispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy(NamedTuple):
+    attempts: int
+    base_delay: float
+    max_delay: float
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Delay before retrying after the given (zero-based) attempt failed,
+        exponential with full jitter
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class _Task(NamedTuple):
+    fn: Callable
+    args: Tuple[Any, ...]
+    retry: Optional[RetryPolicy]
+    attempt: int
+
+
+class Scheduler:
+    """
+    Holds delayed calls in a heap, ordered by when they are due, and hands
+    them to a dispatcher when they are. A single thread waits for the next
+    call to fall due, so pending calls cost no more than their heap entry.
+
+    Like the dispatcher, the thread is started on first use and again in a
+    forked child process.
+    """
+
+    def __init__(self, dispatcher: CallbackDispatcher):
+        self.dispatcher = dispatcher
+
+        self.retried = 0
+        self.failed = 0
+
+        self._heap = []
+        # Calls taken off the heap but not yet handed to the dispatcher
+        self._handing_off = 0
+        # Futures returned by calls which haven't completed yet
+        self._in_flight = 0
+        self._sequence = itertools.count()
+        self._cond = Condition()
+        self._pid = None
+        self._closed = False
+
+    def call_later(self, delay: float, fn: Callable, *args: Any, retry: Optional[RetryPolicy] = None) -> bool:
+        """
+        Calls `fn(*args)` on the dispatcher after `delay` seconds. If a retry
+        policy is given, failed calls are retried with backoff.
+
+        Returns False if the scheduler has been closed.
+        """
+        if self._closed:
+            logger.warning(f'Scheduler is closed, dropped call to {fn!r}{args}')
+            return False
+
+        self._schedule(delay, _Task(fn, args, retry, 0))
+        return True
+
+    def close(self):
+        """
+        Stops accepting new calls and makes every scheduled call due now.
+        Retries of calls already made are still scheduled.
+        """
+        with self._cond:
+            self._closed = True
+            now = monotonic()
+            self._heap = [(min(due, now), sequence, task) for due, sequence, task in self._heap]
+            heapq.heapify(self._heap)
+            self._cond.notify_all()
+
+    def pending(self) -> List[Tuple[Callable, Tuple[Any, ...]]]:
+        """
+        Calls which are still waiting to be made
+        """
+        with self._cond:
+            return [(task.fn, task.args) for _, _, task in sorted(self._heap)]
+
+    def _schedule(self, delay: float, task: _Task):
+        with self._cond:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                Thread(target=self._run, name='scheduler', daemon=True).start()
+
+            heapq.heappush(self._heap, (monotonic() + delay, next(self._sequence), task))
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > monotonic():
+                    self._cond.wait(self._heap[0][0] - monotonic() if self._heap else None)
+                _, _, task = heapq.heappop(self._heap)
+                self._handing_off += 1
+
+            if not self.dispatcher.submit(self._attempt, task):
+                self._failed(task, 'the dispatcher rejected it')
+
+            with self._cond:
+                self._handing_off -= 1
+                self._cond.notify_all()
+
+    def _attempt(self, task: _Task):
+        try:
+            result = task.fn(*task.args)
+        except Exception as e:
+            self._failed(task, e)
+            return
+
+        # Calls may return a future rather than block, if that fails the call is retried
+        if isinstance(result, Future):
+            with self._cond:
+                self._in_flight += 1
+            result.add_done_callback(lambda future: self._settled(task, future))
+
+    def _settled(self, task: _Task, future: Future):
+        if future.exception() is not None:
+            self._failed(task, future.exception())
+
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _failed(self, task: _Task, reason: Any):
+        if task.retry is not None and task.attempt + 1 < task.retry.attempts:
+            delay = task.retry.backoff(task.attempt)
+            logger.warning(f'Call to {task.fn!r}{task.args} failed ({reason}), retrying in {delay:.2f}s')
+            with self._cond:
+                self.retried += 1
+            self._schedule(delay, task._replace(attempt=task.attempt + 1))
+        else:
+            logger.error(f'Call to {task.fn!r}{task.args} failed ({reason}), giving up')
+            with self._cond:
+                self.failed += 1
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until every scheduled call, including retries, has been made,
+        returning False on timeout
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            with self._cond:
+                while self._heap or self._handing_off or self._in_flight:
+                    remaining = None if deadline is None else deadline - monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+
+            remaining = None if deadline is None else max(0.0, deadline - monotonic())
+            if not self.dispatcher.join(remaining):
+                return False
+
+            # A failed call may have been rescheduled while the dispatcher ran
+            with self._cond:
+                if not self._heap and not self._handing_off and not self._in_flight:
+                    return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'scheduled': len(self._heap),
+                'in_flight': self._in_flight,
+                'retried': self.retried,
+                'failed': self.failed,
+            }
@@ -1,17 +1,29 @@
-from threading import Thread
-from typing import List
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
 from uuid import UUID
 
-import requests
-from flask import Blueprint, Response, send_file, abort
+from flask import Blueprint, Response, after_this_request, send_file, abort
 
+from app import http_client
 from app.auth import auth, outbound_auth
-from app.startup import passfort_base_url
+from app.startup import passfort_base_url, callback_workers, callback_queue_size, callback_overflow_policy, \
+    callback_block_timeout, callback_retries, callback_retry_base_delay, callback_retry_max_delay, \
+    callback_outbox_path
+from app.dispatch import CallbackDispatcher
+from app.forgery import ForgeryScore, ForgeryThresholds
+from app.image_quality import ImageQuality, QualityThresholds
+from app.outbox import Outbox
+from app.scheduler import RetryPolicy, Scheduler
 from app.api import DecisionClass, DemoResultType, DownloadFileRequest, DownloadType, Error, FieldCheckResult, \
     CheckedDocumentFieldResult, CheckedDocumentField, DocumentCheck, FileType, IndividualData, RunCheckResponse, validate_models
 
 blueprint = Blueprint("shared", __name__)
 
+callbacks = CallbackDispatcher(callback_workers, callback_queue_size, callback_overflow_policy, callback_block_timeout)
+scheduler = Scheduler(callbacks)
+CALLBACK_RETRY = RetryPolicy(callback_retries, callback_retry_base_delay, callback_retry_max_delay)
+outbox = Outbox(callback_outbox_path) if callback_outbox_path else None
+
 def create_demo_field_checks(
     invalid_fields: List[CheckedDocumentField],
     uncertain_fields: List[CheckedDocumentField],
@@ -41,26 +53,6 @@ def create_demo_field_checks(
     return [*valid, *invalid, *uncertain]
 
 
-def uncertain_fields_from_result_type(demo_result_type: DemoResultType) -> List[CheckedDocumentField]:
-    if 'DOB_FIELD_UNREADABLE' in demo_result_type:
-        return [CheckedDocumentField.FIELD_DOB]
-
-    if 'NAME_FIELD_UNREADABLE' in demo_result_type:
-        return [CheckedDocumentField.FIELD_FAMILY_NAME, CheckedDocumentField.FIELD_GIVEN_NAMES]
-
-    return []
-
-
-def invalid_fields_from_result_type(demo_result_type: DemoResultType) -> List[CheckedDocumentField]:
-    if 'DOB_FIELD_DIFFERENT' in demo_result_type:
-        return [CheckedDocumentField.FIELD_DOB]
-
-    if 'NAME_FIELD_DIFFERENT' in demo_result_type:
-        return [CheckedDocumentField.FIELD_FAMILY_NAME, CheckedDocumentField.FIELD_GIVEN_NAMES]
-
-    return []
-
-
 def create_demo_forgery_check(passed: bool) -> DocumentCheck:
     result = DecisionClass.PASS if passed else DecisionClass.FAIL
     return DocumentCheck({
@@ -79,25 +71,94 @@ def create_demo_image_check(passed: bool) -> DocumentCheck:
     })
 
 
-def _callback(provider_id: UUID, reference: str):
-    session = requests.Session()
-    url = f'{passfort_base_url}/v1/callbacks'
+def _create_check(category: str, check_type: str, passed: bool) -> DocumentCheck:
+    return DocumentCheck({
+        'category': category,
+        'result': DecisionClass.PASS if passed else DecisionClass.FAIL,
+        'type': check_type,
+    })
+
+
+def create_image_checks(quality: ImageQuality, thresholds: QualityThresholds = QualityThresholds()) -> List[DocumentCheck]:
+    def check(check_type: str, passed: bool) -> DocumentCheck:
+        return _create_check('IMAGE_CHECK', check_type, passed)
+
+    return [
+        check('IMAGE_SHARPNESS', quality.sharpness >= thresholds.min_sharpness),
+        check('IMAGE_BRIGHTNESS', thresholds.min_brightness <= quality.brightness <= thresholds.max_brightness),
+        check('IMAGE_GLARE', quality.glare <= thresholds.max_glare),
+    ]
 
-    session.post(url, json={
+
+def create_forgery_checks(score: ForgeryScore, thresholds: ForgeryThresholds = ForgeryThresholds()) -> List[DocumentCheck]:
+    passed = score.error_level <= thresholds.max_error_level and \
+        score.noise_inconsistency <= thresholds.max_noise_inconsistency
+    return [_create_check('FORGERY_CHECK', 'IMAGE_TAMPERING', passed)]
+
+
+def send_callback(provider_id: UUID, reference: str) -> Optional[Future]:
+    url = f'{passfort_base_url}/v1/callbacks'
+    body = {
         'provider_id': str(provider_id),
         'reference': reference
-    }, auth=outbound_auth())
+    }
+
+    # Leave the callback in flight on the event loop rather than blocking a worker
+    client = http_client.async_client()
+    if client is not None:
+        return client.request('POST', url, json=body, auth=outbound_auth())
+
+    res = http_client.session().post(url, json=body, auth=outbound_auth())
+    res.raise_for_status()
+
+
+def call_after_response(fn: Callable, *args: Any):
+    """
+    Calls `fn(*args)` on the callback workers once the response to the
+    current request has been written, retrying it if it fails
+    """
+    def on_close():
+        scheduler.call_later(0, fn, *args, retry=CALLBACK_RETRY)
+
+    @after_this_request
+    def register(response: Response) -> Response:
+        response.call_on_close(on_close)
+        return response
+
+
+def _deliver_callback(send: Callable, callback_id: int, provider_id: UUID, reference: str) -> Optional[Future]:
+    sent = send(provider_id, reference)
+    if not isinstance(sent, Future):
+        outbox.delivered(callback_id)
+        return None
+
+    sent.add_done_callback(lambda f: f.exception() is None and outbox.delivered(callback_id))
+    return sent
+
+
+def queue_callback(send: Callable, provider_id: UUID, reference: str):
+    """
+    Sends a callback with `send` once the response has been written. With an
+    outbox, the callback is recorded first so that it survives this process.
+    """
+    if outbox is None:
+        call_after_response(send, provider_id, reference)
+    else:
+        callback_id = outbox.record(str(provider_id), reference)
+        call_after_response(_deliver_callback, send, callback_id, provider_id, reference)
+
 
+def replay_callbacks():
+    """
+    Sends the callbacks left in the outbox by processes which have died
+    """
+    if outbox is None:
+        return
 
-# Do some work outside the request handler to simulate doing some work
-# asynchronously through a provider
-def task_thread(provider_id: UUID, reference: str):
-    import time
+    for pending in outbox.claim_orphans():
+        scheduler.call_later(0, _deliver_callback, send_callback, pending.id, UUID(pending.provider_id),
+                             pending.reference, retry=CALLBACK_RETRY)
 
-    # Don't run too quickly, we need the sync request to complete first
-    time.sleep(0.1)
-    
-    _callback(provider_id, reference)
 
 # We store the computed demo result in the custom data retained for us
 # by the server
@@ -131,9 +192,9 @@ def run_demo_check(provider_id: UUID, check_id: UUID, check_input: IndividualDat
         'custom_data': custom_data,
     })
 
-    # Prepare a callback to be fired in another thread
-    _cb = Thread(target=task_thread, args=(response['provider_id'], response['reference']))
-    _cb.start()
+    # Send the callback separately to simulate doing some work asynchronously
+    # through a provider, but not before the server has our response
+    queue_callback(send_callback, response['provider_id'], response['reference'])
 
     return response
 
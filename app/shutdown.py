@@ -0,0 +1,64 @@
+import atexit
+import logging
+import signal
+import threading
+from time import monotonic
+
+from app import http_client
+from app.shared import callbacks, outbox, scheduler
+
+logger = logging.getLogger(__name__)
+
+
+def drain(timeout: float) -> bool:
+    """
+    Stops accepting new callbacks and waits up to `timeout` seconds for those
+    already queued to be sent. Returns False if any were left over, which are
+    logged, and are sent by the next worker if the outbox is enabled.
+    """
+    deadline = monotonic() + timeout
+    scheduler.close()
+
+    drained = scheduler.join(timeout)
+    if drained:
+        logger.info('Sent all pending callbacks')
+    else:
+        left_over = [*scheduler.pending(), *callbacks.pending()]
+        where = 'left in the outbox' if outbox is not None else 'lost'
+        logger.warning(f'{len(left_over)} callbacks were not sent within {timeout}s and are {where}')
+        for fn, args in left_over:
+            logger.warning(f'Unsent callback: {fn!r}{args}')
+
+    if outbox is not None:
+        outbox.flush(max(0.0, deadline - monotonic()))
+
+    client = http_client.async_client()
+    if client is not None:
+        client.close()
+
+    return drained
+
+
+def install(timeout: float):
+    """
+    Drains callbacks when the process exits. SIGTERM, which would otherwise
+    kill the process without running exit handlers, is turned into a normal
+    exit unless a server has installed its own handler.
+    """
+    atexit.register(drain, timeout)
+
+    # Signal handlers can only be installed from the main thread
+    if threading.current_thread() is not threading.main_thread():
+        return
+
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def on_sigterm(signum, frame):
+        if previous == signal.SIG_IGN:
+            return
+        if callable(previous):
+            previous(signum, frame)
+        else:
+            raise SystemExit(128 + signum)
+
+    signal.signal(signal.SIGTERM, on_sigterm)
@@ -3,6 +3,7 @@
 import base64
 import os
 import sys
+import tempfile
 import logging
 
 
@@ -21,4 +22,66 @@ integration_key_store = {
 }
 integration_key_id = _integration_secret_key[:8]
 
+# Connections to PassFort are pooled and kept alive, and can be opened when
+# the worker boots
+http_pool_size = int(os.environ.get('HTTP_POOL_SIZE', '10'))
+http_connect_timeout = float(os.environ.get('HTTP_CONNECT_TIMEOUT', '3.05'))
+http_read_timeout = float(os.environ.get('HTTP_READ_TIMEOUT', '30'))
+http_warm_up = os.environ.get('HTTP_WARM_UP', 'false').lower() == 'true'
+# Send callbacks and downloads from an asyncio event loop, requires aiohttp
+http_async = os.environ.get('HTTP_ASYNC', 'false').lower() == 'true'
+
+# Images are downloaded on a pool of threads shared by all requests, with a
+# limit on how many each request downloads at once
+download_workers = int(os.environ.get('DOWNLOAD_WORKERS', '16'))
+download_concurrency = int(os.environ.get('DOWNLOAD_CONCURRENCY', '4'))
+# Slow downloads are duplicated once they take longer than the recent 95th
+# percentile, and failed ones are retried. Both are limited to a fraction of
+# all downloads, so they can't pile more load onto a struggling server
+download_hedging = os.environ.get('DOWNLOAD_HEDGING', 'true').lower() == 'true'
+download_retries = int(os.environ.get('DOWNLOAD_RETRIES', '3'))
+download_retry_base_delay = float(os.environ.get('DOWNLOAD_RETRY_BASE_DELAY', '0.1'))
+download_retry_max_delay = float(os.environ.get('DOWNLOAD_RETRY_MAX_DELAY', '2'))
+download_retry_budget = float(os.environ.get('DOWNLOAD_RETRY_BUDGET', '0.1'))
+# Images are kept in memory up to this size, and in a temporary file above it
+image_spool_size = int(os.environ.get('IMAGE_SPOOL_SIZE', str(256 * 1024)))
+# Largest image, and largest total of all images in a check, in bytes
+image_max_bytes = int(os.environ.get('IMAGE_MAX_BYTES', str(20 * 1024 * 1024)))
+check_max_image_bytes = int(os.environ.get('CHECK_MAX_IMAGE_BYTES', str(50 * 1024 * 1024)))
+# Bytes of downloaded images kept in memory for retries, and for how many
+# seconds. Zero disables the cache or the expiry respectively
+image_cache_bytes = int(os.environ.get('IMAGE_CACHE_BYTES', str(64 * 1024 * 1024)))
+image_cache_ttl = float(os.environ.get('IMAGE_CACHE_TTL', '0')) or None
+# Directory of a cache shared by all workers on the machine, disabled if unset
+image_disk_cache_dir = os.environ.get('IMAGE_DISK_CACHE_DIR') or None
+image_disk_cache_bytes = int(os.environ.get('IMAGE_DISK_CACHE_BYTES', str(1024 * 1024 * 1024)))
+# Processes analysing the quality of downloaded PNGs and looking for signs of
+# tampering, requires numpy. Zero disables the analysis
+image_analysis_workers = int(os.environ.get('IMAGE_ANALYSIS_WORKERS', str(os.cpu_count() or 1)))
+# Analyses of this many images are kept by the hash of their content, so the
+# same image is only analysed once. Zero disables the cache
+image_analysis_cache_size = int(os.environ.get('IMAGE_ANALYSIS_CACHE_SIZE', '4096'))
+
+# Download images after responding to the check instead, and report failures
+# when it is finished. Failures are recorded in a SQLite database which must
+# be shared by every worker that may receive the finish request
+download_in_background = os.environ.get('DOWNLOAD_IN_BACKGROUND', 'false').lower() == 'true'
+check_state_path = os.environ.get('CHECK_STATE_PATH', os.path.join(tempfile.gettempdir(), 'docver-check-state.db'))
+check_state_ttl = float(os.environ.get('CHECK_STATE_TTL', str(24 * 60 * 60)))
+
+# Callbacks to the server are sent from a fixed pool of worker threads
+callback_workers = int(os.environ.get('CALLBACK_WORKERS', '4'))
+callback_queue_size = int(os.environ.get('CALLBACK_QUEUE_SIZE', '256'))
+# One of BLOCK, SHED or SPILL, see `app.dispatch.OverflowPolicy`
+callback_overflow_policy = os.environ.get('CALLBACK_OVERFLOW_POLICY', 'BLOCK')
+callback_block_timeout = float(os.environ.get('CALLBACK_BLOCK_TIMEOUT', '5'))
+# How failed callbacks are retried
+callback_retries = int(os.environ.get('CALLBACK_RETRIES', '5'))
+callback_retry_base_delay = float(os.environ.get('CALLBACK_RETRY_BASE_DELAY', '0.5'))
+callback_retry_max_delay = float(os.environ.get('CALLBACK_RETRY_MAX_DELAY', '30'))
+# SQLite database recording callbacks until they are delivered, disabled if unset
+callback_outbox_path = os.environ.get('CALLBACK_OUTBOX_PATH') or None
+# Seconds to wait for pending callbacks to be sent when the worker shuts down
+shutdown_drain_timeout = float(os.environ.get('SHUTDOWN_DRAIN_TIMEOUT', '10'))
+
 logging.basicConfig(level=os.environ.get('LOGLEVEL', 'INFO'))
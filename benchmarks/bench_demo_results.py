@@ -0,0 +1,99 @@
+"""
+Compares synthesizing demo results from the prebuilt scenario templates
+against rebuilding every DocumentResult per request, for every
+DemoResultType.
+
+    python -m benchmarks.bench_demo_results
+"""
+import sys
+import timeit
+
+import tests.startup
+
+sys.modules['app.startup'] = tests.startup
+
+from app import doccapture, docfetch, docver  # noqa: E402
+from app.api import DemoResultType, Document, IndividualData, DEMO_RESULT_DESCRIPTORS  # noqa: E402
+from app.scenarios import SCENARIOS, ScenarioEngine, create_scenario_result  # noqa: E402
+
+ITERATIONS = 20
+
+
+class _FreshResults(dict):
+    def __init__(self, provider_name):
+        super().__init__()
+        self.provider_name = provider_name
+
+    def __missing__(self, failure):
+        result = self[failure] = create_scenario_result(self.provider_name, SCENARIOS[failure])
+        return result
+
+
+class _RebuildingEngine(ScenarioEngine):
+    """
+    Stands in for the prebuilt engine, building new results on every lookup
+    """
+
+    def __init__(self, engine: ScenarioEngine, any_result: str):
+        super().__init__(engine.provider_name, any_result, engine.categories)
+        self._descriptors = dict(DEMO_RESULT_DESCRIPTORS)
+        self._descriptors[DemoResultType.ANY] = DEMO_RESULT_DESCRIPTORS[any_result]
+
+    def lookup(self, demo_result, default=None):
+        descriptor = self._descriptors.get(demo_result, self._descriptors.get(default))
+        if descriptor is None:
+            return None
+        return self._compile(descriptor, _FreshResults(self.provider_name))
+
+
+def _entity() -> IndividualData:
+    return IndividualData({
+        'personal_details': {
+            'name': {'given_names': ['John'], 'family_name': 'Smith'},
+            'dob': '1985-04-21',
+        },
+        'address_history': [{'address': {'country': 'GBR', 'postal_code': 'SW1A 1AA'}}],
+    })
+
+
+def _docver(demo_result):
+    document = Document({'category': 'PROOF_OF_IDENTITY', 'document_type': 'PASSPORT'})
+    return [docver._synthesize_demo_result(document, _entity(), demo_result)]
+
+
+def _docfetch(demo_result):
+    return docfetch._synthesize_demo_result(_entity(), demo_result)
+
+
+def _doccapture(demo_result):
+    return doccapture._synthesize_demo_result(_entity(), demo_result)
+
+
+def _run(synthesize):
+    for demo_result in DemoResultType.variants:
+        IndividualData({'documents': synthesize(demo_result)}).serialize()
+
+
+def main():
+    products = [
+        ('docver', docver, _docver, DemoResultType.DOCUMENT_ALL_PASS),
+        ('docfetch', docfetch, _docfetch, DemoResultType.DOCUMENT_ALL_PASS),
+        ('doccapture', doccapture, _doccapture, DemoResultType.DOCUMENT_ALL_CATEGORIES_ALL_PASS),
+    ]
+    print(f'{len(DemoResultType.variants)} demo results x {ITERATIONS} iterations')
+    for name, module, synthesize, any_result in products:
+        engine = module.SCENARIOS
+        templated = timeit.timeit(lambda: _run(synthesize), number=ITERATIONS)
+
+        module.SCENARIOS = _RebuildingEngine(engine, any_result)
+        try:
+            rebuilt = timeit.timeit(lambda: _run(synthesize), number=ITERATIONS)
+        finally:
+            module.SCENARIOS = engine
+
+        print(f'{name:>10}: rebuilt {rebuilt * 1000:8.1f} ms, templated {templated * 1000:8.1f} ms, '
+              f'speedup {rebuilt / templated:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
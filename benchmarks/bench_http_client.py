@@ -0,0 +1,68 @@
+"""
+Compares sending callbacks through a new session per request against the
+shared, pooled session, using a local stand-in for PassFort.
+
+    python -m benchmarks.bench_http_client
+"""
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import requests
+
+import tests.startup
+
+sys.modules['app.startup'] = tests.startup
+
+from app import http_client  # noqa: E402
+
+REQUESTS = 500
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def _fresh_session(url):
+    with requests.Session() as session:
+        session.post(url, json={'reference': 'DEMODATA'}).raise_for_status()
+
+
+def _pooled_session(url):
+    http_client.session().post(url, json={'reference': 'DEMODATA'}).raise_for_status()
+
+
+def _measure(send, url):
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(REQUESTS):
+        send(url)
+    return time.perf_counter() - wall, time.process_time() - cpu
+
+
+def main():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/v1/callbacks'
+
+    try:
+        # CPU time includes the server, which runs in the same process
+        print(f'{REQUESTS} callbacks')
+        for name, send in [('fresh', _fresh_session), ('pooled', _pooled_session)]:
+            wall, cpu = _measure(send, url)
+            print(f'{name:>8}: {wall / REQUESTS * 1e6:7.0f} us/request, cpu {cpu * 1000:7.1f} ms')
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
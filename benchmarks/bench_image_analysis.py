@@ -0,0 +1,57 @@
+"""
+Times decoding and each analysis stage on every demo PNG, then compares
+analysing a batch of them on a thread pool, where they contend for the GIL,
+against the process pool used by Document Verification, with and without
+its cache of earlier analyses.
+
+    python -m benchmarks.bench_image_analysis
+"""
+import glob
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.image_analysis import AnalysisPool, analyse
+
+WORKERS = min(4, os.cpu_count() or 1)
+BATCH = 40
+
+
+def _time(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    images = {}
+    for path in sorted(glob.glob('static/*/*.png')):
+        with open(path, 'rb') as f:
+            images[os.path.basename(path)] = f.read()
+
+    for name, data in images.items():
+        analysis = analyse(data)
+        timings = ', '.join(f'{stage} {seconds * 1000:6.1f} ms' for stage, seconds in analysis.timings.items())
+        print(f'{name:>32}: {timings}')
+        for stage, result in analysis.results.items():
+            print(f'{"":>34}{stage}: {result}')
+
+    batch = list(itertools.islice(itertools.cycle(images.values()), BATCH))
+    print(f'\n{BATCH} images on {WORKERS} workers')
+
+    with ThreadPoolExecutor(WORKERS) as threads:
+        elapsed = _time(lambda: list(threads.map(analyse, batch)))
+    print(f'{"threads":>10}: {BATCH / elapsed:6.1f} images/s')
+
+    for name, cache_size in (('processes', 0), ('cached', BATCH)):
+        pool = AnalysisPool(WORKERS, cache_size=cache_size)
+        # Start the workers before timing
+        list(pool.submit(data).result() for data in batch[:WORKERS])
+        elapsed = _time(lambda: [future.result() for future in [pool.submit(data) for data in batch]])
+        pool.close()
+        print(f'{name:>10}: {BATCH / elapsed:6.1f} images/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Matches large batches of extracted personal details against the entity's,
+with the normalized names cached and with the cache cleared before each
+comparison, then the time to match an address against long histories.
+
+    python -m benchmarks.bench_matching
+"""
+import random
+import string
+import sys
+import time
+
+import tests.startup
+
+sys.modules['app.startup'] = tests.startup
+
+from app import address_matching, matching  # noqa: E402
+from app.address_matching import match_address  # noqa: E402
+from app.api import Address, DatedAddress, PersonalDetails  # noqa: E402
+from app.matching import match_personal_details  # noqa: E402
+
+BATCH_SIZES = (1000, 10000, 100000)
+# Distinct entities in a batch, each checked against many documents
+ENTITIES = 100
+ACCENTED = 'àáâäçèéêëìíîïñòóôöùúûüýßøł'
+HISTORY_LENGTHS = (1, 10, 50)
+ADDRESS_CHECKS = 1000
+
+
+def _name(rng: random.Random) -> str:
+    letters = string.ascii_lowercase + ACCENTED
+    return ''.join(rng.choice(letters) for _ in range(rng.randrange(4, 12))).capitalize()
+
+
+def _typo(rng: random.Random, name: str) -> str:
+    position = rng.randrange(len(name))
+    return name[:position] + rng.choice(string.ascii_lowercase) + name[position + 1:]
+
+
+def _details(rng: random.Random):
+    return {
+        'name': {'family_name': _name(rng), 'given_names': [_name(rng) for _ in range(rng.randrange(1, 4))]},
+        'dob': f'{rng.randrange(1940, 2005)}-{rng.randrange(1, 13):02}-{rng.randrange(1, 29):02}',
+    }
+
+
+def _batch(size: int):
+    rng = random.Random(size)
+    entities = [_details(rng) for _ in range(ENTITIES)]
+    batch = []
+    for _ in range(size):
+        expected = rng.choice(entities)
+        extracted = {
+            'name': {
+                'family_name': _typo(rng, expected['name']['family_name']).upper(),
+                'given_names': list(reversed(expected['name']['given_names'])),
+            },
+            'dob': expected['dob'],
+        }
+        batch.append((PersonalDetails(expected), PersonalDetails(extracted)))
+    return batch
+
+
+def _measure(batch, cached: bool) -> float:
+    start = time.perf_counter()
+    for expected, extracted in batch:
+        if not cached:
+            matching._normalized_names.clear()
+        match_personal_details(expected, extracted)
+    return len(batch) / (time.perf_counter() - start)
+
+
+def _address(rng: random.Random):
+    return Address({
+        'type': 'STRUCTURED',
+        'country': 'GBR',
+        'street_number': str(rng.randrange(1, 200)),
+        'route': f'{_name(rng)} {rng.choice(("Road", "Street", "Lane"))}',
+        'locality': _name(rng),
+        'postal_code': f'{rng.choice(("SW", "E", "LS"))}{rng.randrange(1, 20)} {rng.randrange(10)}AA',
+    })
+
+
+def _free_form(address: Address) -> Address:
+    return Address({'type': 'STRUCTURED', 'address_lines': [
+        f'{address.street_number} {address.route.replace("Street", "St").replace("Road", "Rd")}',
+        f'{address.locality} {address.postal_code}',
+    ]})
+
+
+def _measure_addresses(length: int) -> float:
+    rng = random.Random(length)
+    checks = []
+    for _ in range(ADDRESS_CHECKS):
+        entity = _address(rng)
+        # The entity's address is the oldest in the document's history
+        history = [_free_form(entity)] + [_address(rng) for _ in range(length - 1)]
+        checks.append((entity, [DatedAddress({'address': address}) for address in reversed(history)]))
+
+    address_matching._normalized_addresses.clear()
+    start = time.perf_counter()
+    for entity, history in checks:
+        match_address(entity, history)
+    return (time.perf_counter() - start) / ADDRESS_CHECKS * 1e6
+
+
+def main():
+    for size in BATCH_SIZES:
+        batch = _batch(size)
+        print(f'{size} documents')
+        print(f'{"cached":>10}: {_measure(batch, cached=True):10.0f} documents/s')
+        print(f'{"uncached":>10}: {_measure(batch, cached=False):10.0f} documents/s')
+
+    for length in HISTORY_LENGTHS:
+        print(f'{length:>4} addresses: {_measure_addresses(length):8.1f} us/check')
+
+
+if __name__ == '__main__':
+    main()
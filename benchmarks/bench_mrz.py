@@ -0,0 +1,88 @@
+"""
+Parses large synthetic corpora of valid and corrupted MRZs, comparing the
+batch check digit validation with NumPy against one document at a time.
+
+    python -m benchmarks.bench_mrz
+"""
+import random
+import string
+import sys
+import time
+
+import tests.startup
+
+sys.modules['app.startup'] = tests.startup
+
+from app import mrz  # noqa: E402
+from app.mrz import check_digit, parse_batch  # noqa: E402
+
+CORPUS_SIZES = (1000, 10000, 100000)
+# Fraction of documents with one character changed
+CORRUPTED = 0.1
+
+
+def _field(rng: random.Random, length: int, alphabet: str = string.ascii_uppercase + string.digits) -> str:
+    return ''.join(rng.choice(alphabet) for _ in range(length))
+
+
+def _date(rng: random.Random) -> str:
+    return f'{rng.randrange(100):02}{rng.randrange(1, 13):02}{rng.randrange(1, 29):02}'
+
+
+def _td3(rng: random.Random):
+    name = f'{_field(rng, 8, string.ascii_uppercase)}<<{_field(rng, 6, string.ascii_uppercase)}'
+    line1 = f'P<UTO{name}'.ljust(44, '<')
+    number, dob, expiry, optional = _field(rng, 9), _date(rng), _date(rng), _field(rng, 14)
+    line2 = f'{number}{check_digit(number)}UTO{dob}{check_digit(dob)}{rng.choice("MF")}' \
+            f'{expiry}{check_digit(expiry)}{optional}{check_digit(optional)}'
+    composite = line2[0:10] + line2[13:20] + line2[21:43]
+    return line1, line2 + str(check_digit(composite))
+
+
+def _td1(rng: random.Random):
+    number, optional = _field(rng, 9), '<' * 15
+    line1 = f'I<UTO{number}{check_digit(number)}{optional}'
+    dob, expiry = _date(rng), _date(rng)
+    line2 = f'{dob}{check_digit(dob)}{rng.choice("MF")}{expiry}{check_digit(expiry)}UTO' + '<' * 11
+    composite = line1[5:30] + line2[0:7] + line2[8:15] + line2[18:29]
+    line3 = f'{_field(rng, 8, string.ascii_uppercase)}<<{_field(rng, 6, string.ascii_uppercase)}'.ljust(30, '<')
+    return line1, line2 + str(check_digit(composite)), line3
+
+
+def _corpus(size: int):
+    rng = random.Random(size)
+    corpus = []
+    for _ in range(size):
+        lines = list(rng.choice((_td1, _td3))(rng))
+        if rng.random() < CORRUPTED:
+            line = rng.randrange(len(lines))
+            position = rng.randrange(len(lines[line]))
+            lines[line] = lines[line][:position] + rng.choice(string.digits) + lines[line][position + 1:]
+        corpus.append(lines)
+    return corpus
+
+
+def _measure(corpus) -> float:
+    start = time.perf_counter()
+    parse_batch(corpus)
+    return len(corpus) / (time.perf_counter() - start)
+
+
+def main():
+    numpy = mrz.np
+    for size in CORPUS_SIZES:
+        corpus = _corpus(size)
+        valid = sum(result is not None and result.valid for result in parse_batch(corpus))
+        print(f'{size} documents, {valid} valid')
+
+        if numpy is not None:
+            print(f'{"numpy":>10}: {_measure(corpus):10.0f} documents/s')
+        mrz.np = None
+        try:
+            print(f'{"python":>10}: {_measure(corpus):10.0f} documents/s')
+        finally:
+            mrz.np = numpy
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Compares callback throughput of the old thread-per-callback path against
+recording callbacks in the outbox and sending them from the scheduler, with
+many request threads queueing callbacks at once.
+
+    python -m benchmarks.bench_outbox
+"""
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os import path
+from threading import Semaphore, Thread
+
+import tests.startup
+
+sys.modules['app.startup'] = tests.startup
+
+from app.dispatch import CallbackDispatcher  # noqa: E402
+from app.outbox import Outbox  # noqa: E402
+from app.scheduler import Scheduler  # noqa: E402
+
+CALLBACKS = 2000
+REQUEST_THREADS = 16
+# Delay the old path slept for before sending each callback
+THREAD_DELAY = 0.1
+
+
+def _thread_per_callback(sent: Semaphore):
+    def task():
+        time.sleep(THREAD_DELAY)
+        sent.release()
+
+    def queue(_):
+        Thread(target=task).start()
+
+    return queue
+
+
+def _outbox(sent: Semaphore, directory: str):
+    outbox = Outbox(path.join(directory, 'outbox.db'))
+    scheduler = Scheduler(CallbackDispatcher(workers=4, queue_size=256))
+
+    def deliver(callback_id):
+        sent.release()
+        outbox.delivered(callback_id)
+
+    def queue(i):
+        scheduler.call_later(0, deliver, outbox.record('provider', f'DEMODATA-{i}'))
+
+    return queue
+
+
+def _measure(queue, sent: Semaphore) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(REQUEST_THREADS) as pool:
+        list(pool.map(queue, range(CALLBACKS)))
+    for _ in range(CALLBACKS):
+        sent.acquire()
+    return CALLBACKS / (time.perf_counter() - start)
+
+
+def main():
+    print(f'{CALLBACKS} callbacks from {REQUEST_THREADS} request threads')
+
+    sent = Semaphore(0)
+    threads = _measure(_thread_per_callback(sent), sent)
+    print(f'{"thread per callback":>20}: {threads:8.0f} callbacks/s')
+
+    with tempfile.TemporaryDirectory() as directory:
+        sent = Semaphore(0)
+        outbox = _measure(_outbox(sent, directory), sent)
+        print(f'{"outbox":>20}: {outbox:8.0f} callbacks/s')
+
+
+if __name__ == '__main__':
+    main()
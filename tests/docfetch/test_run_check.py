@@ -1,7 +1,8 @@
 from uuid import uuid4
 from unittest.mock import patch
+from app.shared import scheduler
 
-@patch('app.shared.task_thread')
+@patch('app.shared.send_callback')
 def test_run_check_smoke(cbmock, session, auth):
     # Start the check
     r = session.post('http://app/docfetch/checks', json={
@@ -39,9 +40,10 @@ def test_run_check_smoke(cbmock, session, auth):
     res = r.json()
 
     assert res['errors'] == []
+    scheduler.join(5)
     assert cbmock.called
 
-@patch('app.shared.task_thread')
+@patch('app.shared.send_callback')
 def test_retrieve_demo_from_finish_endpoint(cbmock, session, auth):
     check_id = str(uuid4())
     provider_config = {
@@ -77,6 +79,7 @@ def test_retrieve_demo_from_finish_endpoint(cbmock, session, auth):
     }, auth=auth())
     assert initial_request.status_code == 200
     assert initial_request.headers['content-type'] == 'application/json'
+    scheduler.join(5)
     assert cbmock.called
 
     initial_result = initial_request.json()
@@ -100,7 +103,7 @@ def test_retrieve_demo_from_finish_endpoint(cbmock, session, auth):
     assert len(complete_result['check_output']['documents']) == 1
     assert complete_result['check_output']['documents'][0]['verification_result']['all_passed']
 
-@patch('app.shared.task_thread')
+@patch('app.shared.send_callback')
 def test_download_files(cbmock, session, auth):
     check_id = str(uuid4())
     provider_config = {
@@ -136,6 +139,7 @@ def test_download_files(cbmock, session, auth):
     }, auth=auth())
     assert initial_request.status_code == 200
     assert initial_request.headers['content-type'] == 'application/json'
+    scheduler.join(5)
     assert cbmock.called
 
     initial_result = initial_request.json()
@@ -225,3 +229,31 @@ def test_download_files(cbmock, session, auth):
     frame_data = download_frame_request.content
 
     assert len(frame_data) > 0
+
+
+@patch('app.shared.send_callback')
+def test_invalid_documents_are_rejected(cbmock, session, auth):
+    # Documents aren't read by Document Fetch, but must still be valid
+    r = session.post('http://app/docfetch/checks', json={
+        'id': str(uuid4()),
+        'check_input': {
+            'entity_type': 'INDIVIDUAL',
+            'personal_details': {
+                'name': {
+                    'given_names': ['Henry'],
+                    'family_name': 'Gnarglefoot'
+                },
+            },
+            'address_history': [{'address': {'country': 'GBR'}}],
+            'documents': [{'category': 'BOGUS', 'images': [{'id': 'not-a-uuid'}]}],
+        },
+        'commercial_relationship': 'DIRECT',
+        'provider_config': {
+            'require_dob': False,
+            'require_address': False,
+        },
+        'demo_result': 'DOCUMENT_ALL_PASS'
+    }, auth=auth())
+
+    assert r.status_code == 400
+    assert not cbmock.called
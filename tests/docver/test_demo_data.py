@@ -93,3 +93,17 @@ def test_image_quality_demo_result():
     result = _synthesize_demo_result(document, entity_data, DemoResultType.DOCUMENT_IMAGE_CHECK_FAILURE)
 
     assert not result.verification_result.image_checks_passed
+
+
+def test_demo_results_share_templates():
+    first = _synthesize_demo_result(_make_document(), _make_entity(), DemoResultType.DOCUMENT_DOB_FIELD_DIFFERENT)
+    second = _synthesize_demo_result(_make_document(), _make_entity(), DemoResultType.DOCUMENT_DOB_FIELD_DIFFERENT)
+
+    assert first.verification_result is second.verification_result
+    assert not first.verification_result.all_passed
+
+
+def test_every_demo_result_serializes():
+    for demo_result in DemoResultType.variants:
+        document = _synthesize_demo_result(_make_document(), _make_entity(), demo_result)
+        assert IndividualData({'documents': [document]}).serialize()['documents']
@@ -1,10 +1,16 @@
 from uuid import uuid4
 from unittest.mock import patch
 
-def mock_download_image(_image_id):
-    return b'An image'
+import pytest
 
-@patch('app.docver.task_thread')
+from app.check_state import CheckState
+from app.images import DownloadedImage, ImageRejected
+from app.shared import scheduler
+
+def mock_download_image(_image_id, budget):
+    return DownloadedImage.from_bytes(b'\x89PNG\r\n\x1a\nAn image')
+
+@patch('app.docver.send_callback')
 @patch('app.docver._download_image', mock_download_image)
 def test_run_check_smoke(cbmock, session, auth):
     r = session.post('http://app/docver/checks', json={
@@ -51,9 +57,10 @@ def test_run_check_smoke(cbmock, session, auth):
     res = r.json()
 
     assert res['errors'] == []
+    scheduler.join(5)
     assert cbmock.called
 
-@patch('app.docver.task_thread')
+@patch('app.docver.send_callback')
 @patch('app.docver._download_image', mock_download_image)
 def test_retrieve_demo_from_finish_endpoint(cbmock, session, auth):
     check_id = str(uuid4())
@@ -99,6 +106,7 @@ def test_retrieve_demo_from_finish_endpoint(cbmock, session, auth):
     }, auth=auth())
     assert initial_request.status_code == 200
     assert initial_request.headers['content-type'] == 'application/json'
+    scheduler.join(5)
     assert cbmock.called
 
     initial_result = initial_request.json()
@@ -122,3 +130,208 @@ def test_retrieve_demo_from_finish_endpoint(cbmock, session, auth):
     assert complete_result['check_output']['documents'][0]['verification_result']['all_passed']
 
 
+
+
+def mock_download_html(_image_id, budget):
+    raise ImageRejected('Image is not a PNG, JPEG or PDF')
+
+
+@patch('app.docver.send_callback')
+@patch('app.docver._download_image', mock_download_html)
+def test_run_check_rejects_invalid_image(cbmock, session, auth):
+    r = session.post('http://app/docver/checks', json={
+        'id': str(uuid4()),
+        'check_input': {
+            'entity_type': 'INDIVIDUAL',
+            'personal_details': {
+                'name': {
+                    'given_names': ['Henry'],
+                    'family_name': 'Gnarglefoot'
+                },
+            },
+            'address_history': [{'address': {'country': 'GBR'}}],
+            'documents': [
+                {
+                    'category': 'PROOF_OF_IDENTITY',
+                    'document_type': 'PASSPORT',
+                    'id': str(uuid4()),
+                    'images': [{'id': str(uuid4())}]
+                }
+            ]
+        },
+        'commercial_relationship': 'DIRECT',
+        'provider_config': {
+            'require_dob': False,
+            'require_address': False,
+        },
+        'demo_result': 'DOCUMENT_ALL_PASS'
+    }, auth=auth())
+    assert r.status_code == 200
+
+    errors = r.json()['errors']
+    assert errors[0]['type'] == 'INVALID_CHECK_INPUT'
+    assert errors[0]['message'] == 'Image is not a PNG, JPEG or PDF'
+    assert not cbmock.called
+
+
+def _run_and_finish(session, auth):
+    check_id = str(uuid4())
+    provider_config = {
+        'require_dob': False,
+        'require_address': False,
+    }
+
+    initial_request = session.post('http://app/docver/checks', json={
+        'id': check_id,
+        'check_input': {
+            'entity_type': 'INDIVIDUAL',
+            'personal_details': {
+                'name': {
+                    'given_names': ['Henry'],
+                    'family_name': 'Gnarglefoot'
+                },
+            },
+            'address_history': [{'address': {'country': 'GBR'}}],
+            'documents': [
+                {
+                    'category': 'PROOF_OF_IDENTITY',
+                    'document_type': 'PASSPORT',
+                    'id': str(uuid4()),
+                    'images': [{'id': str(uuid4())}]
+                }
+            ]
+        },
+        'commercial_relationship': 'DIRECT',
+        'provider_config': provider_config,
+        'demo_result': 'DOCUMENT_ALL_PASS'
+    }, auth=auth())
+    assert initial_request.status_code == 200
+    initial_result = initial_request.json()
+    assert initial_result['errors'] == []
+    assert scheduler.join(5)
+
+    return session.post(f'http://app/docver/checks/{check_id}/complete', json={
+        'id': check_id,
+        'provider_id': initial_result['provider_id'],
+        'reference': initial_result['reference'],
+        'commercial_relationship': 'DIRECT',
+        'provider_config': provider_config,
+        'custom_data': initial_result['custom_data']
+    }, auth=auth()).json()
+
+
+@pytest.fixture
+def background_downloads(monkeypatch, tmp_path):
+    monkeypatch.setattr('app.docver.download_in_background', True)
+    monkeypatch.setattr('app.docver.CHECK_STATE', CheckState(str(tmp_path / 'state.db'), 60))
+
+
+@patch('app.docver.send_callback')
+@patch('app.docver._download_image', mock_download_image)
+def test_background_downloads(cbmock, background_downloads, session, auth):
+    complete_result = _run_and_finish(session, auth)
+
+    assert cbmock.called
+    assert complete_result['errors'] == []
+    assert complete_result['check_output']['documents'][0]['verification_result']['all_passed']
+
+
+@patch('app.docver.send_callback')
+@patch('app.docver._download_image', mock_download_html)
+def test_background_download_failure_is_reported_at_finish(cbmock, background_downloads, session, auth):
+    complete_result = _run_and_finish(session, auth)
+
+    assert cbmock.called
+    assert complete_result['errors'][0]['message'] == 'Image is not a PNG, JPEG or PDF'
+
+
+def mock_download_demo_image(_image_id, budget):
+    with open('static/docfetch/demo_image.png', 'rb') as f:
+        return DownloadedImage.from_bytes(f.read())
+
+
+@patch('app.docver.send_callback')
+@patch('app.docver._download_image', mock_download_demo_image)
+def test_image_and_forgery_checks_are_measured(cbmock, session, auth):
+    pytest.importorskip('numpy')
+    complete_result = _run_and_finish(session, auth)
+
+    verification_result = complete_result['check_output']['documents'][0]['verification_result']
+    assert [check['type'] for check in verification_result['image_checks']] == \
+        ['IMAGE_SHARPNESS', 'IMAGE_BRIGHTNESS', 'IMAGE_GLARE']
+    assert verification_result['image_checks_passed']
+    assert verification_result['forgery_checks'] == [
+        {'category': 'FORGERY_CHECK', 'result': 'PASS', 'type': 'IMAGE_TAMPERING'},
+    ]
+    assert verification_result['all_passed']
+
+
+@patch('app.docver.send_callback')
+@patch('app.docver._download_image', mock_download_demo_image)
+def test_identical_images_are_analysed_once(cbmock, session, auth):
+    pytest.importorskip('numpy')
+    from app.docver import IMAGE_ANALYSIS
+
+    first = _run_and_finish(session, auth)
+    hits = IMAGE_ANALYSIS.stats()['analysis_cache_hits']
+
+    # The same image in another check
+    second = _run_and_finish(session, auth)
+    assert second['check_output']['documents'][0]['verification_result'] == \
+        first['check_output']['documents'][0]['verification_result']
+    assert IMAGE_ANALYSIS.stats()['analysis_cache_hits'] == hits + 1
+
+    metrics = session.get('http://app/metrics/images', auth=auth()).json()
+    assert metrics['analysis_cache_hit_ratio'] > 0
+
+
+@patch('app.docver.send_callback')
+@patch('app.docver._download_image', mock_download_image)
+def test_mrz_is_checked(cbmock, session, auth):
+    def document(mrz2):
+        return {
+            'category': 'PROOF_OF_IDENTITY',
+            'document_type': 'PASSPORT',
+            'id': str(uuid4()),
+            'images': [{'id': str(uuid4())}],
+            'extracted_data': {
+                'mrz1': 'P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<',
+                'mrz2': mrz2,
+            },
+        }
+
+    r = session.post('http://app/docver/checks', json={
+        'id': str(uuid4()),
+        'check_input': {
+            'entity_type': 'INDIVIDUAL',
+            'personal_details': {
+                'name': {
+                    'given_names': ['Henry'],
+                    'family_name': 'Gnarglefoot'
+                },
+            },
+            'address_history': [{'address': {'country': 'GBR'}}],
+            'documents': [
+                document('L898902C36UTO7408122F1204159ZE184226B<<<<<10'),
+                document('L898902C46UTO7408122F1204159ZE184226B<<<<<10'),
+            ]
+        },
+        'commercial_relationship': 'DIRECT',
+        'provider_config': {
+            'require_dob': False,
+            'require_address': False,
+        },
+        'demo_result': 'DOCUMENT_ALL_PASS'
+    }, auth=auth())
+    assert r.status_code == 200
+    scheduler.join(5)
+
+    valid, invalid = r.json()['custom_data']['check_output']['documents']
+    assert {'field': 'FIELD_MRZ', 'result': 'CHECK_VALID'} in valid['verification_result']['field_checks']
+    assert valid['verification_result']['all_passed']
+    assert valid['extracted_data']['number'] == 'L898902C3'
+    assert valid['extracted_data']['personal_details']['name']['family_name'] == 'Gnarglefoot'
+    assert valid['extracted_data']['personal_details']['gender'] == 'F'
+
+    assert {'field': 'FIELD_MRZ', 'result': 'CHECK_INVALID'} in invalid['verification_result']['field_checks']
+    assert not invalid['verification_result']['all_passed']
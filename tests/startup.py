@@ -7,3 +7,40 @@ integration_key_store = {
 }
 integration_key_id = 'dummykey'
 passfort_base_url = 'http://localhost/'
+
+http_pool_size = 4
+http_connect_timeout = 1.0
+http_read_timeout = 5.0
+http_warm_up = False
+http_async = False
+
+download_workers = 4
+download_concurrency = 2
+download_hedging = True
+download_retries = 3
+download_retry_base_delay = 0.01
+download_retry_max_delay = 0.05
+download_retry_budget = 0.1
+image_spool_size = 1024
+image_max_bytes = 64 * 1024
+check_max_image_bytes = 128 * 1024
+image_cache_bytes = 256 * 1024
+image_cache_ttl = None
+image_disk_cache_dir = None
+image_disk_cache_bytes = 1024 * 1024
+image_analysis_workers = 1
+image_analysis_cache_size = 64
+
+download_in_background = False
+check_state_path = None
+check_state_ttl = 60.0
+
+callback_workers = 2
+callback_queue_size = 16
+callback_overflow_policy = 'BLOCK'
+callback_block_timeout = 1.0
+callback_retries = 3
+callback_retry_base_delay = 0.01
+callback_retry_max_delay = 0.1
+callback_outbox_path = None
+shutdown_drain_timeout = 1.0
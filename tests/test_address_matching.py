@@ -0,0 +1,92 @@
+from app.address_matching import match_address, normalize_address, similarity, _normalized_addresses
+from app.api import Address, CheckedDocumentFieldResult, DatedAddress, DemoResultType, IndividualData
+from app.scenarios import ExtractedDataBuilder, ScenarioEngine
+
+VALID = CheckedDocumentFieldResult.CHECK_VALID
+INVALID = CheckedDocumentFieldResult.CHECK_INVALID
+UNCERTAIN = CheckedDocumentFieldResult.CHECK_UNCERTAIN
+
+
+def _address(**fields):
+    return Address({'type': 'STRUCTURED', 'country': 'GBR', **fields})
+
+
+def _history(*addresses):
+    return [DatedAddress({'address': address}) for address in addresses]
+
+
+ENTITY = _address(street_number='12', route='High Street', locality='London', postal_code='SW1A 1AA')
+
+
+def test_structured_and_free_form_addresses_match():
+    lines = _address(address_lines=['12 High St.', 'Westminster', 'London SW1A1AA'])
+
+    normalized = normalize_address(lines)
+    assert normalized.postcode == 'SW1A1AA'
+    assert normalized.numbers == {'12'}
+    assert normalized.words == {'high', 'street', 'westminster', 'london'}
+    assert similarity(normalize_address(ENTITY), normalized) > 0.8
+    assert match_address(ENTITY, _history(lines)) == VALID
+
+
+def test_normalized_addresses_are_cached():
+    normalize_address(ENTITY)
+    hits = _normalized_addresses.hits
+    normalize_address(_address(street_number='12', route='High Street', locality='London', postal_code='SW1A 1AA'))
+    assert _normalized_addresses.hits == hits + 1
+
+
+def test_country_rules():
+    entity = Address({'type': 'STRUCTURED', 'country': 'DEU', 'route': 'Hauptstraße', 'street_number': '5',
+                      'locality': 'Berlin', 'postal_code': '10115'})
+    document = Address({'type': 'STRUCTURED', 'address_lines': ['Hauptstr. 5', '10115 Berlin']})
+    assert match_address(entity, _history(document)) == VALID
+
+    entity = Address({'type': 'STRUCTURED', 'country': 'USA', 'street_number': '1600',
+                      'route': 'Pennsylvania Ave NW', 'locality': 'Washington', 'postal_code': '20500-0003'})
+    document = Address({'type': 'STRUCTURED', 'country': 'USA',
+                        'address_lines': ['1600 Pennsylvania Avenue N.W.', 'Washington, DC 20500']})
+    assert match_address(entity, _history(document)) == VALID
+
+
+def test_different_addresses():
+    assert match_address(ENTITY, _history(_address(
+        street_number='14', route='High Street', locality='London', postal_code='SW1A 1AA'
+    ))) == INVALID
+    assert match_address(ENTITY, _history(_address(
+        street_number='12', route='High Street', locality='London', postal_code='E1 6AN'
+    ))) == INVALID
+    assert match_address(ENTITY, _history(Address({
+        'type': 'STRUCTURED', 'country': 'IRL', 'street_number': '12', 'route': 'High Street', 'locality': 'London',
+    }))) == INVALID
+
+
+def test_typos_and_partial_addresses():
+    assert match_address(ENTITY, _history(_address(
+        street_number='12', route='Hihg Street', locality='London', postal_code='SW1A 1AA'
+    ))) == VALID
+    # Half the words are missing
+    assert match_address(ENTITY, _history(_address(route='High Street', locality='Westminster'))) == UNCERTAIN
+
+
+def test_closest_address_in_history():
+    old = _address(street_number='3', route='Low Road', locality='Leeds', postal_code='LS1 4AP')
+    assert match_address(ENTITY, _history(old, ENTITY)) == VALID
+    assert match_address(ENTITY, _history(old)) == INVALID
+    assert match_address(ENTITY, []) == UNCERTAIN
+
+
+def test_country_only_addresses_are_not_checked():
+    assert match_address(_address(), _history(ENTITY)) is None
+
+
+def test_scenarios_check_the_address():
+    outcome = ScenarioEngine('Test', DemoResultType.DOCUMENT_ALL_PASS).lookup(DemoResultType.ANY).outcome(None)
+    data = ExtractedDataBuilder(IndividualData({
+        'entity_type': 'INDIVIDUAL',
+        'address_history': [{'address': ENTITY.to_primitive()}],
+    })).build(outcome)
+
+    assert {'field': 'FIELD_ADDRESS', 'result': VALID} in data.result.to_primitive()['field_checks']
+    # Agreeing with the demo result, which is still shared
+    assert data.result is outcome.result
@@ -0,0 +1,75 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+pytest.importorskip('aiohttp')
+
+from app.aio_client import AsyncClient  # noqa: E402
+from app.auth import outbound_auth  # noqa: E402
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    authorizations = []
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.authorizations.append(self.headers.get('Authorization'))
+        status = 500 if self.path == '/fail' else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+def _client_threads():
+    # The stand-in server starts a thread per connection
+    return {t for t in threading.enumerate() if 'process_request_thread' not in t.name}
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+
+
+def test_requests_are_signed(base_url):
+    client = AsyncClient()
+    try:
+        res = client.request('POST', f'{base_url}/v1/callbacks', json={}, auth=outbound_auth()).result(5)
+    finally:
+        client.close()
+
+    assert res.status_code == 200
+    assert res.content == b'ok'
+    assert _Handler.authorizations[-1].startswith('Signature keyId="dummykey"')
+
+
+def test_error_status_fails_future(base_url):
+    client = AsyncClient()
+    try:
+        with pytest.raises(requests.HTTPError) as e:
+            client.request('POST', f'{base_url}/fail', json={}).result(5)
+        assert e.value.response.status_code >= 400
+    finally:
+        client.close()
+
+
+def test_concurrent_requests_share_one_thread(base_url):
+    client = AsyncClient()
+    try:
+        client.request('POST', f'{base_url}/v1/callbacks').result(5)
+        threads = _client_threads()
+
+        futures = [client.request('POST', f'{base_url}/v1/callbacks') for _ in range(50)]
+        assert all(f.result(10).status_code == 200 for f in futures)
+        assert _client_threads() == threads
+    finally:
+        client.close()
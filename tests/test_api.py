@@ -0,0 +1,103 @@
+import pytest
+from schematics.exceptions import DataError
+
+from app.api import DemoFailure, DemoResultType, DemoScope, DocumentCategory, RunCheckRequest, \
+    describe_demo_result
+
+
+def test_enum_values_are_frozensets():
+    assert isinstance(DemoResultType.variants, frozenset)
+    assert isinstance(DocumentCategory.choices, frozenset)
+    assert DocumentCategory.PROOF_OF_TAX_STATUS in DocumentCategory.choices
+
+
+def test_every_demo_result_is_described():
+    for variant in DemoResultType.variants:
+        assert describe_demo_result(variant) is not None
+
+    assert describe_demo_result('NOT_A_DEMO_RESULT') is None
+    assert describe_demo_result(None) is None
+
+
+def test_describe_document_capture_demo_result():
+    descriptor = describe_demo_result(DemoResultType.DOCUMENT_SINGLE_CATEGORY_IDENTITY_DOB_FIELD_DIFFERENT)
+
+    assert descriptor.scope == DemoScope.SINGLE_CATEGORY
+    assert descriptor.category == DocumentCategory.PROOF_OF_IDENTITY
+    assert descriptor.failure == DemoFailure.DOB_FIELD_DIFFERENT
+
+
+def test_describe_document_verification_demo_result():
+    descriptor = describe_demo_result(DemoResultType.DOCUMENT_IMAGE_CHECK_FAILURE)
+
+    assert descriptor.scope is None
+    assert descriptor.category is None
+    assert descriptor.failure == DemoFailure.IMAGE_CHECK_FAILURE
+
+
+def test_imported_demo_result_is_interned():
+    raw = ''.join(['DOCUMENT_', 'ALL_PASS'])
+    req = RunCheckRequest({'demo_result': raw})
+
+    assert req.demo_result is DemoResultType.DOCUMENT_ALL_PASS
+
+
+def _make_lazy_request():
+    req = RunCheckRequest({
+        'id': '899e952b-dccc-463c-b442-b0a31d5553d9',
+        'commercial_relationship': 'DIRECT',
+        'provider_config': {
+            'require_dob': False,
+            'require_address': False,
+        },
+        'check_input': {
+            'entity_type': 'INDIVIDUAL',
+            'address_history': [{'address': {'country': 'GBR'}}],
+            'documents': [{'images': [{'id': 'not-a-uuid'}]}],
+        },
+    })
+    req.validate()
+    return req
+
+
+def test_individual_data_sub_trees_are_deferred():
+    req = _make_lazy_request()
+
+    assert req.check_input.get_current_address().country == 'GBR'
+    assert 'documents' in req.check_input._deferred
+    assert 'address_history' not in req.check_input._deferred
+
+
+def test_invalid_deferred_sub_tree_raises_on_access():
+    req = _make_lazy_request()
+
+    with pytest.raises(DataError):
+        req.check_input.get_documents()
+
+
+def test_explicit_validate_resolves_deferred_sub_trees():
+    req = _make_lazy_request()
+
+    with pytest.raises(DataError):
+        req.check_input.validate()
+
+
+def test_provider_config_is_interned_and_read_only():
+    first = _make_lazy_request()
+    second = _make_lazy_request()
+
+    assert first.provider_config is second.provider_config
+
+    with pytest.raises(TypeError):
+        first.provider_config.require_dob = True
+
+
+def test_invalid_provider_config_is_not_interned():
+    req = RunCheckRequest({
+        'provider_config': {
+            'require_dob': False,
+        },
+    })
+
+    with pytest.raises(DataError):
+        req.validate()
@@ -0,0 +1,40 @@
+import time
+
+from app.cache import LRUCache
+
+
+def test_evicts_least_recently_used_by_weight():
+    cache = LRUCache(max_weight=10, weigh=len)
+    cache.put('a', b'1234')
+    cache.put('b', b'1234')
+    cache.get('a')
+    cache.put('c', b'1234')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == b'1234'
+    assert cache.weight == 8
+
+
+def test_values_heavier_than_the_cache_are_not_kept():
+    cache = LRUCache(max_weight=4, weigh=len)
+    cache.put('a', b'12345')
+
+    assert len(cache) == 0
+
+
+def test_entries_expire():
+    cache = LRUCache(maxsize=4, ttl=0.01)
+    cache.put('a', 1)
+    time.sleep(0.02)
+
+    assert cache.get('a') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_hit_ratio():
+    cache = LRUCache(maxsize=4)
+    cache.put('a', 1)
+    cache.get('a')
+    cache.get('b')
+
+    assert cache.stats()['hit_ratio'] == 0.5
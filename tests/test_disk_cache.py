@@ -0,0 +1,55 @@
+import os
+from uuid import uuid4
+
+from app.disk_cache import DiskImageCache
+from app.images import DownloadedImage
+
+PNG = b'\x89PNG\r\n\x1a\n'
+
+
+def _image(size):
+    return DownloadedImage.from_bytes(PNG + bytes(size - len(PNG)))
+
+
+def test_cached_images_survive_restarts(tmp_path):
+    image_id = uuid4()
+    DiskImageCache(str(tmp_path), 1024 * 1024).put(image_id, _image(100))
+
+    image = DiskImageCache(str(tmp_path), 1024 * 1024).get(image_id)
+    assert image.size == 100
+    assert image.media_type == 'image/png'
+    assert image.read() == PNG + bytes(92)
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    cache = DiskImageCache(str(tmp_path), 1024 * 1024)
+    cache.put(uuid4(), _image(100))
+    cache.put(uuid4(), _image(100))
+
+    assert len(os.listdir(tmp_path / 'objects')) == 1
+    assert len(os.listdir(tmp_path / 'ids')) == 2
+    assert [name for name in os.listdir(tmp_path) if name.startswith('.tmp-')] == []
+
+
+def test_least_recently_read_images_are_evicted(tmp_path):
+    cache = DiskImageCache(str(tmp_path), 250)
+    first, second, third = uuid4(), uuid4(), uuid4()
+
+    cache.put(first, _image(100))
+    cache.put(second, _image(101))
+    os.utime(tmp_path / 'objects' / os.listdir(tmp_path / 'objects')[0], (0, 0))
+    os.utime(tmp_path / 'objects' / os.listdir(tmp_path / 'objects')[1], (0, 0))
+    cache.get(first)
+    cache.put(third, _image(102))
+
+    assert cache.get(first) is not None
+    assert cache.get(second) is None
+    assert cache.get(third) is not None
+    assert len(os.listdir(tmp_path / 'ids')) == 2
+
+
+def test_missing_image(tmp_path):
+    cache = DiskImageCache(str(tmp_path), 1024)
+
+    assert cache.get(uuid4()) is None
+    assert cache.stats()['disk_misses'] == 1
@@ -0,0 +1,70 @@
+from threading import Event
+
+from app.dispatch import CallbackDispatcher, OverflowPolicy
+
+
+def _blocked_dispatcher(policy, **kwargs):
+    release = Event()
+    started = Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    dispatcher = CallbackDispatcher(workers=1, queue_size=1, policy=policy, **kwargs)
+    assert dispatcher.submit(block)
+    assert started.wait(5)
+    # Fill the queue behind the busy worker
+    assert dispatcher.submit(lambda: None)
+    return dispatcher, release
+
+
+def test_shed_rejects_when_full():
+    dispatcher, release = _blocked_dispatcher(OverflowPolicy.SHED)
+
+    assert not dispatcher.submit(lambda: None)
+    stats = dispatcher.stats()
+    assert stats['rejected'] == 1
+    assert stats['queue_depth'] == 1
+    assert stats['utilization'] == 1.0
+
+    release.set()
+    assert dispatcher.join(5)
+
+
+def test_block_rejects_after_timeout():
+    dispatcher, release = _blocked_dispatcher(OverflowPolicy.BLOCK, block_timeout=0.01)
+
+    assert not dispatcher.submit(lambda: None)
+    assert dispatcher.stats()['rejected'] == 1
+
+    release.set()
+    assert dispatcher.join(5)
+
+
+def test_spill_runs_every_callback_in_order():
+    dispatcher, release = _blocked_dispatcher(OverflowPolicy.SPILL)
+    calls = []
+
+    for i in range(3):
+        assert dispatcher.submit(calls.append, i)
+
+    stats = dispatcher.stats()
+    assert stats['spilled'] == 3
+    assert stats['overflow_depth'] == 3
+
+    release.set()
+    assert dispatcher.join(5)
+    assert calls == [0, 1, 2]
+    assert dispatcher.stats()['active'] == 0
+
+
+def test_failing_callback_does_not_stop_worker():
+    dispatcher = CallbackDispatcher(workers=1, queue_size=4)
+    calls = []
+
+    dispatcher.submit(lambda: 1 / 0)
+    dispatcher.submit(calls.append, 'after')
+
+    assert dispatcher.join(5)
+    assert calls == ['after']
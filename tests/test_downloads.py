@@ -0,0 +1,63 @@
+import time
+from threading import Lock
+
+import pytest
+
+from app.downloads import DownloadPool
+
+
+def test_downloads_run_concurrently():
+    pool = DownloadPool(max_workers=4, per_request=3)
+
+    def download(key):
+        time.sleep(0.1)
+        return key * 2
+
+    start = time.perf_counter()
+    assert pool.download_all(download, [1, 2, 3]) == {1: 2, 2: 4, 3: 6}
+    assert time.perf_counter() - start < 0.25
+
+
+def test_per_request_limit():
+    pool = DownloadPool(max_workers=8, per_request=2)
+    lock = Lock()
+    running = []
+    most = []
+
+    def download(key):
+        with lock:
+            running.append(key)
+            most.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(key)
+
+    pool.download_all(download, range(6))
+    assert max(most) == 2
+
+
+def test_failure_cancels_remaining_downloads():
+    pool = DownloadPool(max_workers=1, per_request=4)
+    started = []
+
+    def download(key):
+        started.append(key)
+        if key == 0:
+            raise ConnectionError()
+        time.sleep(0.05)
+
+    with pytest.raises(ConnectionError):
+        pool.download_all(download, range(8))
+
+    time.sleep(0.1)
+    assert len(started) < 8
+
+
+def test_downloads_may_return_futures():
+    pool = DownloadPool(max_workers=1, per_request=2)
+
+    def download(key):
+        # Only runs once this thread is free
+        return pool.submit(lambda: key * 2)
+
+    assert pool.download_all(download, [1, 2, 3]) == {1: 2, 2: 4, 3: 6}
@@ -0,0 +1,48 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from app.forgery import STRIP_ROWS, score  # noqa: E402
+from app.shared import create_forgery_checks  # noqa: E402
+
+
+def _textured(rng, noise=3.0, size=512):
+    y, x = np.mgrid[0:size, 0:size]
+    base = 128 + 60 * np.sin(x / 20) * np.cos(y / 25)
+    return base, (base + rng.normal(0, noise, base.shape)).astype(np.float32)
+
+
+def _passed(luma):
+    return create_forgery_checks(score(luma))[0].result == 'PASS'
+
+
+def test_consistent_image_passes():
+    _, luma = _textured(np.random.default_rng(0))
+
+    assert score(luma).noise_inconsistency < 0.05
+    assert _passed(luma)
+
+
+def test_region_with_different_noise_fails():
+    rng = np.random.default_rng(0)
+    base, luma = _textured(rng)
+    luma[128:384, 64:448] = base[128:384, 64:448] + rng.normal(0, 15, (256, 384))
+
+    assert score(luma).noise_inconsistency > 0.3
+    assert not _passed(luma)
+
+
+def test_requantised_region_fails():
+    rng = np.random.default_rng(0)
+    luma = rng.normal(128, 20, (512, 512)).astype(np.float32)
+    luma[128:384, 64:448] = np.round(luma[128:384, 64:448] / 8) * 8
+
+    assert score(luma).error_level > 0.3
+    assert not _passed(luma)
+
+
+def test_scans_are_analysed_in_strips():
+    rng = np.random.default_rng(0)
+    luma = rng.normal(128, 20, (STRIP_ROWS * 3 + 40, 128)).astype(np.float32)
+
+    assert score(luma) == (0.0, 0.0)
@@ -0,0 +1,161 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+
+import pytest
+import requests
+
+from app.hedging import Hedger, LatencyTracker, RetryBudget
+from app.http_client import is_transient
+from app.scheduler import RetryPolicy
+
+
+EXECUTOR = ThreadPoolExecutor(4)
+
+
+def _hedger(budget=None, attempts=3, latencies=None):
+    return Hedger(
+        retry=RetryPolicy(attempts, 0.001, 0.01),
+        budget=budget or RetryBudget(0.1),
+        retryable=is_transient,
+        latencies=latencies,
+    )
+
+
+def _fast_latencies():
+    latencies = LatencyTracker(min_samples=5)
+    for _ in range(5):
+        latencies.record(0.01)
+    return latencies
+
+
+def test_p95_needs_enough_samples():
+    latencies = LatencyTracker(min_samples=20)
+    for i in range(19):
+        latencies.record(i / 100)
+    assert latencies.p95() is None
+
+    for i in range(81):
+        latencies.record(1.0 if i >= 76 else 0.01)
+    assert latencies.p95() == 1.0
+
+
+def test_retry_budget_is_a_fraction_of_calls():
+    budget = RetryBudget(0.5, max_tokens=1)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+
+
+def test_transient_failures_are_retried():
+    hedger = _hedger()
+    attempts = []
+
+    def call(cancelled):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise requests.ConnectionError()
+        return 'image'
+
+    assert hedger.call(EXECUTOR, call) == 'image'
+    assert hedger.stats()['retried'] == 2
+
+
+def test_permanent_failures_are_not_retried():
+    hedger = _hedger()
+    attempts = []
+
+    def call(cancelled):
+        attempts.append(1)
+        response = requests.Response()
+        response.status_code = 404
+        raise requests.HTTPError(response=response)
+
+    with pytest.raises(requests.HTTPError):
+        hedger.call(EXECUTOR, call)
+    assert len(attempts) == 1
+
+
+def test_retries_stop_when_budget_is_spent():
+    hedger = _hedger(budget=RetryBudget(0.1, max_tokens=1), attempts=10)
+    attempts = []
+
+    def call(cancelled):
+        attempts.append(1)
+        raise requests.Timeout()
+
+    with pytest.raises(requests.Timeout):
+        hedger.call(EXECUTOR, call)
+    assert len(attempts) == 2
+
+
+def test_slow_calls_are_hedged():
+    hedger = _hedger(latencies=_fast_latencies())
+    calls = []
+    discarded = []
+    first_cancelled = Event()
+
+    def call(cancelled):
+        calls.append(cancelled)
+        if len(calls) == 1:
+            # Finishes after the hedged call, and should be discarded
+            time.sleep(0.2)
+            if cancelled.is_set():
+                first_cancelled.set()
+            return 'slow'
+        return 'fast'
+
+    start = time.perf_counter()
+    assert hedger.call(EXECUTOR, call, discard=discarded.append) == 'fast'
+    assert time.perf_counter() - start < 0.15
+    assert hedger.stats()['hedged'] == 1
+
+    assert first_cancelled.wait(1)
+    time.sleep(0.05)
+    assert discarded == ['slow']
+
+
+def test_hedging_can_be_disabled():
+    hedger = _hedger(latencies=_fast_latencies())
+    hedger.hedge = False
+    calls = []
+
+    def call(cancelled):
+        calls.append(1)
+        time.sleep(0.05)
+        return 'image'
+
+    assert hedger.call(EXECUTOR, call) == 'image'
+    assert len(calls) == 1
+
+
+def test_losing_calls_which_have_not_started_are_cancelled():
+    hedger = _hedger(latencies=_fast_latencies())
+    calls = []
+    discarded = []
+
+    def call(cancelled):
+        calls.append(cancelled)
+        time.sleep(0.05)
+        return 'image'
+
+    # The hedged call is queued behind the first, which wins
+    assert hedger.call(ThreadPoolExecutor(1), call, discard=discarded.append) == 'image'
+    assert hedger.stats()['hedged'] == 1
+
+    time.sleep(0.1)
+    assert len(calls) == 1
+    assert discarded == []
+
+
+def test_calls_leave_the_thread_free():
+    hedger = _hedger()
+    executor = ThreadPoolExecutor(1)
+
+    # The only thread submits a call to itself, which it could never wait for
+    future = executor.submit(hedger.submit, executor, lambda cancelled: 'image').result(1)
+    assert future.result(1) == 'image'
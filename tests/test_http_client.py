@@ -0,0 +1,39 @@
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+
+from app import http_client
+
+
+class _RecordingAdapter(HTTPAdapter):
+    def __init__(self):
+        super().__init__()
+        self.timeouts = []
+
+    def send(self, request, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        response = Response()
+        response.status_code = 200
+        response.request = request
+        return response
+
+
+def test_session_is_shared():
+    assert http_client.session() is http_client.session()
+
+
+def test_default_timeouts_are_applied():
+    session = http_client._create_session()
+    adapter = _RecordingAdapter()
+    session.mount('http://', adapter)
+
+    session.get('http://localhost/v1/images/1')
+    session.get('http://localhost/v1/images/2', timeout=1)
+
+    assert adapter.timeouts == [(1.0, 5.0), 1]
+
+
+def test_session_is_recreated_after_fork():
+    parent = http_client.session()
+    http_client._reset_after_fork()
+
+    assert http_client.session() is not parent
@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from app.image_analysis import STAGES, AnalysisPool, Stage, analyse  # noqa: E402
+
+DEMO_IMAGE = 'static/docfetch/demo_image.png'
+
+
+def _demo_image():
+    with open(DEMO_IMAGE, 'rb') as f:
+        return f.read()
+
+
+def test_runs_every_stage():
+    analysis = analyse(_demo_image())
+
+    assert set(analysis.results) == {'quality', 'forgery'}
+    assert set(analysis.timings) == {'decode', 'quality', 'forgery'}
+
+
+def test_stages_are_pluggable():
+    analysis = analyse(_demo_image(), [Stage('shape', lambda luma: luma.shape)])
+    assert analysis.results == {'shape': (790, 640)}
+
+
+def test_undecodable_images_are_skipped():
+    assert analyse(b'\xff\xd8\xff\xe0 a JPEG') is None
+
+
+def test_pool_analyses_in_another_process():
+    pool = AnalysisPool(1)
+    try:
+        analysis = pool.submit(_demo_image()).result(30)
+    finally:
+        pool.close()
+
+    assert set(analysis.results) == {stage.name for stage in STAGES}
+    # Timings are recorded by a callback which may run just after the result is set
+    deadline = time.monotonic() + 1
+    while pool.stats()['images_analysed'] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stats = pool.stats()
+    assert stats['images_analysed'] == 1
+    assert stats['forgery_seconds'] > 0
+
+
+def _wait_for(condition):
+    # Results are cached by a callback which may run just after they are set
+    deadline = time.monotonic() + 1
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_identical_images_are_analysed_once():
+    pool = AnalysisPool(1, cache_size=4)
+    try:
+        first = pool.submit(_demo_image())
+        # Shares the analysis in flight
+        assert pool.submit(_demo_image()) is first
+        analysis = first.result(30)
+        _wait_for(lambda: len(pool.cache) == 1)
+        # And then the cached analysis
+        assert pool.submit(_demo_image()).result(0) == analysis
+
+        assert pool.submit(b'\xff\xd8\xff\xe0 a JPEG').result(30) is None
+        _wait_for(lambda: len(pool.cache) == 2)
+        assert pool.submit(b'\xff\xd8\xff\xe0 a JPEG').result(0) is None
+    finally:
+        pool.close()
+
+    stats = pool.stats()
+    assert stats['images_analysed'] == 1
+    assert stats['analysis_cache_entries'] == 2
+    assert stats['analysis_cache_hits'] == 3
+    assert stats['analysis_cache_misses'] == 2
+    assert stats['analysis_cache_hit_ratio'] == 0.6
+
+
+def test_cache_is_bounded():
+    pool = AnalysisPool(1, cache_size=1)
+    pool.cache.put(b'other', 'analysis')
+    try:
+        pool.submit(_demo_image()).result(30)
+    finally:
+        pool.close()
+
+    _wait_for(lambda: pool.cache.get(b'other') is None)
+    assert len(pool.cache) == 1
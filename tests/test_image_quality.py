@@ -0,0 +1,70 @@
+import struct
+import zlib
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from app.image_quality import UnsupportedImage, decode_png, measure  # noqa: E402
+from app.shared import create_image_checks  # noqa: E402
+
+DEMO_IMAGE = 'static/docfetch/demo_image.png'
+
+
+def _png(pixels, colour_type=0, filter_type=0):
+    """
+    Encodes an 8-bit PNG, filtering every row with `filter_type` (0 or 2)
+    """
+    height, width = pixels.shape[:2]
+    rows = pixels.reshape(height, -1).astype(np.int16)
+    if filter_type == 2:
+        rows = (rows - np.vstack([np.zeros_like(rows[:1]), rows[:-1]])) & 0xFF
+    raw = b''.join(bytes([filter_type]) + row.astype(np.uint8).tobytes() for row in rows)
+
+    def chunk(chunk_type, data):
+        return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, colour_type, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b'')
+
+
+def test_decodes_greyscale_and_rgb():
+    grey = np.arange(48, dtype=np.uint8).reshape(6, 8)
+    assert (decode_png(_png(grey, filter_type=2)) == grey).all()
+
+    rgb = np.zeros((2, 2, 3), dtype=np.uint8)
+    rgb[:, :, 1] = 100
+    assert decode_png(_png(rgb, colour_type=2)) == pytest.approx(np.full((2, 2), 58.7), abs=0.01)
+
+
+def test_decodes_demo_image():
+    with open(DEMO_IMAGE, 'rb') as f:
+        luma = decode_png(f.read())
+    assert luma.shape == (790, 640)
+    assert 0 <= luma.min() and luma.max() <= 255
+
+
+def test_rejects_other_formats():
+    with pytest.raises(UnsupportedImage):
+        decode_png(b'\xff\xd8\xff\xe0 a JPEG')
+    with pytest.raises(UnsupportedImage):
+        decode_png(b'\x89PNG\r\n\x1a\ntruncated')
+
+
+def test_blur_lowers_sharpness():
+    rng = np.random.default_rng(0)
+    sharp = rng.integers(0, 256, (64, 64)).astype(np.float32)
+    blurred = (sharp[:-2, :-2] + sharp[1:-1, 1:-1] + sharp[2:, 2:]) / 3
+
+    assert measure(blurred).sharpness < measure(sharp).sharpness / 2
+
+
+def test_brightness_and_glare():
+    luma = np.full((10, 10), 255, dtype=np.float32)
+    luma[:5] = 0
+    quality = measure(luma)
+
+    assert quality.brightness == pytest.approx(0.5)
+    assert quality.glare == pytest.approx(0.5)
+    checks = {check.type: check.result for check in create_image_checks(quality)}
+    assert checks == {'IMAGE_SHARPNESS': 'PASS', 'IMAGE_BRIGHTNESS': 'PASS', 'IMAGE_GLARE': 'FAIL'}
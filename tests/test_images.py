@@ -0,0 +1,175 @@
+import io
+from concurrent.futures import Future
+from threading import Event
+from uuid import uuid4
+
+import pytest
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+
+from app import docver, http_client
+from app.images import ByteBudget, DownloadedImage, ImageCharge, ImageRejected, ImageWriter, sniff_media_type
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(100)
+
+
+def test_sniff_media_type():
+    assert sniff_media_type(PNG) == 'image/png'
+    assert sniff_media_type(b'\xff\xd8\xff\xe0') == 'image/jpeg'
+    assert sniff_media_type(b'%PDF-1.7') == 'application/pdf'
+    assert sniff_media_type(b'GIF89a') is None
+
+
+def test_rejects_unknown_format_from_first_chunk():
+    writer = ImageWriter()
+
+    with pytest.raises(ImageRejected):
+        writer.write(b'<html></html>')
+
+
+def test_rejects_empty_image():
+    with pytest.raises(ImageRejected):
+        ImageWriter().finish()
+
+
+def test_large_images_spill_to_disk():
+    small = DownloadedImage.from_bytes(PNG)
+    large = DownloadedImage.from_bytes(PNG + bytes(2048))
+
+    assert not small.file._rolled
+    assert large.file._rolled
+    assert large.read() == PNG + bytes(2048)
+    assert large.media_type == 'image/png'
+
+
+def test_per_image_cap():
+    writer = ImageWriter(max_bytes=200)
+    writer.write(PNG)
+
+    with pytest.raises(ImageRejected):
+        writer.write(PNG)
+
+
+def test_per_request_cap_is_shared():
+    budget = ByteBudget(150)
+    ImageWriter(budget).write(PNG)
+
+    with pytest.raises(ImageRejected):
+        ImageWriter(budget).write(PNG)
+
+
+def test_cancelled_budget_stops_download():
+    budget = ByteBudget(1000)
+    budget.cancel()
+
+    with pytest.raises(ImageRejected):
+        ImageWriter(budget).write(PNG)
+
+
+def test_cancelled_writer_stops_download():
+    cancelled = Event()
+    writer = ImageWriter(cancelled=cancelled)
+    writer.write(PNG[:8])
+    cancelled.set()
+
+    with pytest.raises(ImageRejected):
+        writer.write(PNG[8:])
+
+
+def test_discarded_writer_releases_budget():
+    budget = ByteBudget(1000)
+    writer = ImageWriter(budget)
+    writer.write(PNG)
+    writer.discard()
+
+    assert budget.used == 0
+
+
+def test_hedged_attempts_are_charged_once():
+    budget = ByteBudget(150)
+    charge = ImageCharge(budget)
+    first, second = ImageWriter(charge.attempt()), ImageWriter(charge.attempt())
+    first.write(PNG)
+    second.write(PNG)
+    assert budget.used == len(PNG)
+
+    # The loser is released, and the budget is charged for the winner alone
+    first.discard()
+    charge.settle(second.finish().size)
+    assert budget.used == len(PNG)
+
+
+class _ImageAdapter(HTTPAdapter):
+    def __init__(self, content, failures=0):
+        super().__init__()
+        self.content = content
+        self.failures = failures
+        self.requests = 0
+
+    def send(self, request, stream=False, **kwargs):
+        self.requests += 1
+        response = Response()
+        if self.requests <= self.failures:
+            response.status_code = 503
+            response.raw = io.BytesIO(b'')
+            response.request = request
+            return response
+
+        response.status_code = 200
+        response.headers['Content-Length'] = str(len(self.content))
+        response.raw = io.BytesIO(self.content)
+        response.request = request
+        return response
+
+
+@pytest.fixture
+def passfort_images(monkeypatch):
+    def serve(content, failures=0):
+        adapter = _ImageAdapter(content, failures)
+        session = http_client._create_session()
+        session.mount('http://', adapter)
+        monkeypatch.setattr(http_client, '_session', session)
+        return adapter
+
+    return serve
+
+
+def _download(image_id, budget):
+    image = docver._download_image(image_id, budget)
+    return image.result() if isinstance(image, Future) else image
+
+
+def test_download_image_streams_to_buffer(passfort_images):
+    passfort_images(PNG)
+
+    image = _download(uuid4(), ByteBudget(1000))
+    assert image.size == len(PNG)
+    assert image.read() == PNG
+
+
+def test_download_image_rejects_declared_length(passfort_images):
+    passfort_images(PNG + bytes(64 * 1024))
+
+    with pytest.raises(ImageRejected):
+        _download(uuid4(), ByteBudget(1024 * 1024))
+
+
+def test_repeated_downloads_are_cached(passfort_images):
+    adapter = passfort_images(PNG)
+    image_id = uuid4()
+
+    _download(image_id, ByteBudget(1000))
+    image = _download(image_id, ByteBudget(1000))
+
+    assert adapter.requests == 1
+    assert image.read() == PNG
+
+
+def test_failed_downloads_are_retried(passfort_images):
+    adapter = passfort_images(PNG, failures=1)
+    budget = ByteBudget(1000)
+
+    image = _download(uuid4(), budget)
+    assert adapter.requests == 2
+    assert image.read() == PNG
+    assert budget.used == len(PNG)
@@ -0,0 +1,100 @@
+from app.api import CheckedDocumentFieldResult, DemoResultType, IndividualData, PersonalDetails
+from app.matching import match_dob, match_family_name, match_given_names, match_personal_details, \
+    normalize_name, within_edits, _normalized_names
+from app.scenarios import ExtractedDataBuilder, ScenarioEngine
+
+VALID = CheckedDocumentFieldResult.CHECK_VALID
+INVALID = CheckedDocumentFieldResult.CHECK_INVALID
+UNCERTAIN = CheckedDocumentFieldResult.CHECK_UNCERTAIN
+
+
+def test_names_are_normalized():
+    assert normalize_name('Zoë Ångström') == ('zoe', 'angstrom')
+    assert normalize_name('Straße') == ('strasse',)
+    assert normalize_name('Łukasz') == ('lukasz',)
+    assert normalize_name("O'Brien") == ('obrien',)
+    assert normalize_name('Smith-Jones') == ('smith', 'jones')
+    assert _normalized_names.get('Smith-Jones') == ('smith', 'jones')
+
+
+def test_within_edits():
+    assert within_edits('johnson', 'jonson', 1)
+    assert within_edits('johnson', 'jhonson', 2)
+    assert not within_edits('johnson', 'jhonson', 1)
+    assert not within_edits('smith', 'smithson', 2)
+    assert within_edits('', 'ab', 2)
+
+
+def test_family_names():
+    assert match_family_name('Müller', 'MULLER') == VALID
+    assert match_family_name('Johnson', 'Jonson') == VALID
+    # No typos are tolerated in short names
+    assert match_family_name('Lee', 'Lea') == INVALID
+    assert match_family_name('Smith', None) == UNCERTAIN
+
+
+def test_given_names():
+    assert match_given_names(['Anna', 'Maria'], ['MARIA', 'ANNA']) == VALID
+    assert match_given_names(['Anna Maria'], ['Anna']) == VALID
+    assert match_given_names(['Anna', 'Maria'], ['A', 'Maria']) == VALID
+    # The initial can't take the name the full word needs
+    assert match_given_names(['Anna', 'Alice'], ['A', 'Anna']) == VALID
+    assert match_given_names(['Anna', 'Alice'], ['Alice', 'Bob']) == INVALID
+    assert match_given_names([], ['Anna']) == UNCERTAIN
+
+
+def test_partial_dates_of_birth():
+    assert match_dob('2000', '2000-01-31') == VALID
+    assert match_dob('2000-01', '2000-01-31') == VALID
+    assert match_dob('2000-02', '2000-01-31') == INVALID
+    assert match_dob('2000-01-31', 'unreadable') == UNCERTAIN
+
+
+def test_fields_the_entity_lacks_are_not_checked():
+    expected = PersonalDetails({'name': {'family_name': 'Smith'}})
+    extracted = PersonalDetails({'name': {'family_name': 'Smith', 'given_names': ['John']}, 'dob': '2000'})
+
+    assert match_personal_details(expected, extracted) == {'FIELD_FAMILY_NAME': VALID}
+
+
+def test_scenarios_are_checked():
+    engine = ScenarioEngine('Test', DemoResultType.DOCUMENT_ALL_PASS)
+    builder = ExtractedDataBuilder(IndividualData({
+        'entity_type': 'INDIVIDUAL',
+        'personal_details': {
+            'name': {'given_names': ['John'], 'family_name': 'Smith'},
+            'dob': '2000',
+        },
+    }))
+
+    def results(demo_result):
+        data = builder.build(engine.lookup(demo_result).outcome(None))
+        return data.result, {check.field: check.result for check in data.result.field_checks}
+
+    passed, checks = results(DemoResultType.DOCUMENT_ALL_PASS)
+    assert passed.all_passed
+    assert checks['FIELD_FAMILY_NAME'] == checks['FIELD_GIVEN_NAMES'] == checks['FIELD_DOB'] == VALID
+
+    different, checks = results(DemoResultType.DOCUMENT_NAME_FIELD_DIFFERENT)
+    assert not different.all_passed
+    assert checks['FIELD_FAMILY_NAME'] == checks['FIELD_GIVEN_NAMES'] == INVALID
+    assert checks['FIELD_DOB'] == VALID
+
+    unreadable, checks = results(DemoResultType.DOCUMENT_DOB_FIELD_UNREADABLE)
+    assert not unreadable.all_passed
+    assert checks['FIELD_DOB'] == UNCERTAIN
+
+
+def test_different_dob_never_matches():
+    engine = ScenarioEngine('Test', DemoResultType.DOCUMENT_ALL_PASS)
+    outcome = engine.lookup(DemoResultType.DOCUMENT_DOB_FIELD_DIFFERENT).outcome(None)
+
+    for dob in ('2000', '2000-05', '2000-05-01', '1999-12-31'):
+        data = ExtractedDataBuilder(IndividualData({
+            'entity_type': 'INDIVIDUAL',
+            'personal_details': {'name': {'given_names': ['John'], 'family_name': 'Smith'}, 'dob': dob},
+        })).build(outcome)
+        checks = {check.field: check.result for check in data.result.field_checks}
+
+        assert checks['FIELD_DOB'] == INVALID, dob
+        assert not data.result.all_passed
@@ -0,0 +1,73 @@
+from datetime import date
+
+import pytest
+
+from app import mrz
+from app.api import DocumentData
+from app.mrz import check_digit, parse_batch
+
+TODAY = date(2010, 1, 1)
+
+# Specimens from ICAO 9303
+TD1 = ('I<UTOD231458907<<<<<<<<<<<<<<<', '7408122F1204159UTO<<<<<<<<<<<6', 'ERIKSSON<<ANNA<MARIA<<<<<<<<<<')
+TD2 = ('I<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<', 'D231458907UTO7408122F1204159<<<<<<<6')
+TD3 = ('P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<', 'L898902C36UTO7408122F1204159ZE184226B<<<<<10')
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def engine(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(mrz, 'np', None)
+
+
+def test_check_digit():
+    assert check_digit('L898902C3') == 6
+    assert check_digit('740812') == 2
+    assert check_digit('<<<<<') == 0
+
+
+def test_parses_every_format(engine):
+    results = parse_batch([TD1, TD2, TD3], today=TODAY)
+
+    assert [result.format for result in results] == ['TD1', 'TD2', 'TD3']
+    for result in results:
+        assert result.valid
+        assert result.issuing_country == 'UTO'
+        assert result.family_name == 'ERIKSSON'
+        assert result.given_names == ['ANNA', 'MARIA']
+        assert result.dob == date(1974, 8, 12)
+        assert result.expiry == date(2012, 4, 15)
+        assert result.gender == 'F'
+    assert results[2].number == 'L898902C3'
+
+
+def test_wrong_check_digits_are_invalid(engine):
+    wrong_number = (TD3[0], TD3[1].replace('L898902C3', 'L898902C4'))
+    wrong_composite = (TD3[0], TD3[1][:-1] + '1')
+
+    results = parse_batch([wrong_number, wrong_composite, TD3], today=TODAY)
+    assert [result.valid for result in results] == [False, False, True]
+
+
+def test_unrecognised_lines_are_skipped(engine):
+    results = parse_batch([(), (None, None, None), ('TOO SHORT', 'TOO SHORT'), (TD3[0], TD3[1].lower()),
+                           (TD3[0], TD3[1][:-1] + '!')])
+    assert results[:3] == [None, None, None]
+    assert results[3].valid
+    assert results[4] is None
+
+
+def test_fill_keeps_extracted_values():
+    result = parse_batch([TD3], today=TODAY)[0]
+    data = DocumentData({'personal_details': {'name': {'family_name': 'Gnarglefoot', 'given_names': ['Henry']}}})
+
+    result.fill(data)
+
+    assert data.number == 'L898902C3'
+    assert data.expiry == date(2012, 4, 15)
+    assert data.issuing_country == 'UTO'
+    assert data.personal_details.name.family_name == 'Gnarglefoot'
+    assert data.personal_details.dob == '1974-08-12'
+    assert data.personal_details.gender == 'F'
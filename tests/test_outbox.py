@@ -0,0 +1,50 @@
+import sqlite3
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from app.outbox import Outbox
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_delivered_callbacks_are_removed(tmp_path):
+    outbox = Outbox(str(tmp_path / 'outbox.db'))
+
+    first = outbox.record('provider', 'DEMODATA-1')
+    outbox.record('provider', 'DEMODATA-2')
+    outbox.delivered(first)
+    assert outbox.flush(5)
+
+    with sqlite3.connect(str(tmp_path / 'outbox.db')) as connection:
+        assert connection.execute('SELECT reference FROM callbacks').fetchall() == [('DEMODATA-2',)]
+
+
+def test_concurrent_records_share_commits(tmp_path):
+    outbox = Outbox(str(tmp_path / 'outbox.db'))
+
+    with ThreadPoolExecutor(16) as pool:
+        ids = list(pool.map(lambda i: outbox.record('provider', f'DEMODATA-{i}'), range(200)))
+
+    assert len(set(ids)) == 200
+    assert outbox.stats()['outbox_writes'] == 200
+    assert outbox.stats()['outbox_commits'] < 200
+
+
+def test_claims_callbacks_of_dead_processes(tmp_path):
+    path = str(tmp_path / 'outbox.db')
+    outbox = Outbox(path)
+    outbox.record('provider', 'DEMODATA-mine')
+
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "INSERT INTO callbacks (provider_id, reference, owner, created_at) VALUES ('provider', 'DEMODATA-orphan', ?, 0)",
+            (_dead_pid(),),
+        )
+
+    assert [c.reference for c in outbox.claim_orphans()] == ['DEMODATA-orphan']
+    assert outbox.claim_orphans() == []
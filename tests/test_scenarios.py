@@ -0,0 +1,77 @@
+from app.api import DemoResultType, DocumentCategory, IndividualData
+from app.scenarios import ExtractedDataBuilder, ScenarioEngine, create_extracted_data
+
+
+def _make_entity():
+    return IndividualData({
+        'entity_type': 'INDIVIDUAL',
+        'personal_details': {
+            'name': {
+                'given_names': ['John'],
+                'family_name': 'Smith'
+            },
+            'dob': '2000',
+        },
+        'address_history': [{'address': {'country': 'GBR'}}],
+    })
+
+
+def test_engine_covers_every_category():
+    engine = ScenarioEngine('Test', DemoResultType.DOCUMENT_ALL_CATEGORIES_ALL_PASS, DocumentCategory.choices)
+    scenario = engine.lookup(DemoResultType.ANY)
+
+    assert set(scenario.categories) == DocumentCategory.choices
+    for category in DocumentCategory.choices:
+        assert scenario.outcome(category).result.all_passed
+
+
+def test_failure_only_applies_to_its_category():
+    engine = ScenarioEngine('Test', DemoResultType.DOCUMENT_ALL_PASS)
+    scenario = engine.lookup(DemoResultType.DOCUMENT_ALL_CATEGORIES_IDENTITY_FORGERY_CHECK_FAILURE)
+
+    identity = scenario.outcome(DocumentCategory.PROOF_OF_IDENTITY)
+    assert not identity.result.forgery_checks_passed
+    assert identity.file_reference == 'DUMMY_FILE_IDENTITY_FAIL'
+
+    address = scenario.outcome(DocumentCategory.PROOF_OF_ADDRESS)
+    assert address.result.all_passed
+    assert address.file_reference == 'DUMMY_FILE_ADDRESS_PASS'
+
+
+def test_unknown_demo_result():
+    engine = ScenarioEngine('Test', DemoResultType.DOCUMENT_ALL_PASS)
+
+    assert engine.lookup('NOT_A_DEMO_RESULT') is None
+    assert engine.lookup('NOT_A_DEMO_RESULT', default=DemoResultType.ANY).outcome(None).result.all_passed
+
+
+def test_extracted_data_overrides():
+    engine = ScenarioEngine('Test', DemoResultType.DOCUMENT_ALL_PASS)
+    entity = _make_entity()
+
+    different_dob = engine.lookup(DemoResultType.DOCUMENT_DOB_FIELD_DIFFERENT).outcome(None)
+    assert create_extracted_data(entity, different_dob).personal_details.dob == '2001-01-01'
+
+    different_name = engine.lookup(DemoResultType.DOCUMENT_NAME_FIELD_DIFFERENT).outcome(None)
+    assert create_extracted_data(entity, different_name).personal_details.name.family_name != 'Smith'
+
+    assert entity.personal_details.dob == '2000'
+    assert entity.personal_details.name.family_name == 'Smith'
+
+
+def test_extracted_data_shares_unmodified_details():
+    engine = ScenarioEngine('Test', DemoResultType.DOCUMENT_ALL_PASS)
+    entity = _make_entity()
+    builder = ExtractedDataBuilder(entity)
+
+    different_name = builder.build(engine.lookup(DemoResultType.DOCUMENT_NAME_FIELD_DIFFERENT).outcome(None))
+    different_dob = builder.build(engine.lookup(DemoResultType.DOCUMENT_DOB_FIELD_DIFFERENT).outcome(None))
+    passed = builder.build(engine.lookup(DemoResultType.DOCUMENT_ALL_PASS).outcome(None))
+
+    assert different_name.personal_details.dob == '2000'
+    assert different_name.personal_details.name.family_name != 'Smith'
+    assert different_dob.personal_details.dob == '2001-01-01'
+    assert different_dob.personal_details.name.family_name == 'Smith'
+    assert passed.personal_details.to_primitive() == entity.personal_details.to_primitive()
+    assert builder._base_details['name']['family_name'] == 'Smith'
+    assert builder._base_details['dob'] == '2000'
@@ -0,0 +1,89 @@
+from concurrent.futures import Future
+
+from app.dispatch import CallbackDispatcher
+from app.scheduler import RetryPolicy, Scheduler
+
+
+def _scheduler():
+    return Scheduler(CallbackDispatcher(workers=1, queue_size=16))
+
+
+def test_calls_run_in_order_of_due_time():
+    scheduler = _scheduler()
+    calls = []
+
+    scheduler.call_later(0.05, calls.append, 'late')
+    scheduler.call_later(0.0, calls.append, 'early')
+
+    assert scheduler.join(5)
+    assert calls == ['early', 'late']
+
+
+def test_failed_call_is_retried():
+    scheduler = _scheduler()
+    attempts = []
+
+    def flaky():
+        attempts.append(None)
+        if len(attempts) < 3:
+            raise ConnectionError()
+
+    scheduler.call_later(0.0, flaky, retry=RetryPolicy(attempts=5, base_delay=0.001, max_delay=0.01))
+
+    assert scheduler.join(5)
+    assert len(attempts) == 3
+    assert scheduler.stats() == {'scheduled': 0, 'in_flight': 0, 'retried': 2, 'failed': 0}
+
+
+def test_gives_up_after_last_attempt():
+    scheduler = _scheduler()
+    attempts = []
+
+    def failing():
+        attempts.append(None)
+        raise ConnectionError()
+
+    scheduler.call_later(0.0, failing, retry=RetryPolicy(attempts=2, base_delay=0.001, max_delay=0.01))
+
+    assert scheduler.join(5)
+    assert len(attempts) == 2
+    assert scheduler.stats()['failed'] == 1
+
+
+def test_backoff_is_capped():
+    policy = RetryPolicy(attempts=10, base_delay=1.0, max_delay=4.0)
+
+    assert all(0 <= policy.backoff(0) <= 1.0 for _ in range(100))
+    assert all(0 <= policy.backoff(8) <= 4.0 for _ in range(100))
+
+
+def test_failed_future_is_retried():
+    scheduler = _scheduler()
+    attempts = []
+
+    def in_flight():
+        future = Future()
+        attempts.append(future)
+        if len(attempts) < 2:
+            future.set_exception(ConnectionError())
+        else:
+            future.set_result(None)
+        return future
+
+    scheduler.call_later(0.0, in_flight, retry=RetryPolicy(attempts=3, base_delay=0.001, max_delay=0.01))
+
+    assert scheduler.join(5)
+    assert len(attempts) == 2
+    assert scheduler.stats()['retried'] == 1
+
+
+def test_close_makes_calls_due_and_rejects_new_ones():
+    scheduler = _scheduler()
+    calls = []
+
+    scheduler.call_later(60, calls.append, 'scheduled')
+    scheduler.close()
+
+    assert not scheduler.call_later(0, calls.append, 'new')
+    assert scheduler.join(5)
+    assert calls == ['scheduled']
@@ -0,0 +1,49 @@
+import sqlite3
+
+from flask import Flask
+
+from app import shared
+from app.outbox import Outbox
+from app.shared import call_after_response, queue_callback, scheduler
+
+
+def test_call_waits_for_response_to_close():
+    app = Flask(__name__)
+    calls = []
+
+    @app.route('/')
+    def index():
+        call_after_response(calls.append, 'sent')
+        return 'ok'
+
+    response = app.test_client().get('/', buffered=False)
+    assert scheduler.join(5)
+    assert calls == []
+
+    response.close()
+    assert scheduler.join(5)
+    assert calls == ['sent']
+
+
+def test_queued_callback_is_kept_in_outbox_until_delivered(tmp_path, monkeypatch):
+    path = str(tmp_path / 'outbox.db')
+    monkeypatch.setattr(shared, 'outbox', Outbox(path))
+    app = Flask(__name__)
+    calls = []
+
+    def pending():
+        with sqlite3.connect(path) as connection:
+            return connection.execute('SELECT reference FROM callbacks').fetchall()
+
+    @app.route('/')
+    def index():
+        queue_callback(lambda *args: calls.append(args), 'provider', 'DEMODATA-1')
+        assert pending() == [('DEMODATA-1',)]
+        return 'ok'
+
+    app.test_client().get('/').close()
+    assert scheduler.join(5)
+    assert shared.outbox.flush(5)
+
+    assert calls == [('provider', 'DEMODATA-1')]
+    assert pending() == []
@@ -0,0 +1,37 @@
+from threading import Event
+
+from app import shutdown
+from app.dispatch import CallbackDispatcher
+from app.scheduler import Scheduler
+
+
+def _use_scheduler(monkeypatch, workers=1):
+    callbacks = CallbackDispatcher(workers=workers, queue_size=16)
+    scheduler = Scheduler(callbacks)
+    monkeypatch.setattr(shutdown, 'callbacks', callbacks)
+    monkeypatch.setattr(shutdown, 'scheduler', scheduler)
+    return scheduler
+
+
+def test_drain_sends_pending_callbacks(monkeypatch):
+    scheduler = _use_scheduler(monkeypatch)
+    calls = []
+    scheduler.call_later(60, calls.append, 'DEMODATA-1')
+
+    assert shutdown.drain(5)
+    assert calls == ['DEMODATA-1']
+
+
+def test_drain_logs_left_over_callbacks(monkeypatch, caplog):
+    scheduler = _use_scheduler(monkeypatch)
+    calls = []
+    release = Event()
+    scheduler.call_later(0, release.wait, 5)
+    scheduler.call_later(0, calls.append, 'DEMODATA-2')
+
+    try:
+        assert not shutdown.drain(0.05)
+    finally:
+        release.set()
+
+    assert 'DEMODATA-2' in caplog.text